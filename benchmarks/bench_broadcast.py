@@ -0,0 +1,169 @@
+"""Broadcast fan-out against a local Bot API with Telegram's limits switched on.
+
+The bot is built with ``build_application`` on a ``benchmarks.dataset`` database and talks plain
+HTTP to ``benchmarks.fake_bot_api`` (``BOT_API_BASE_URL``), polling for updates like in production.
+An admin goes through the real "📢 Рассылка всем" conversation (button, text, confirmation) and the
+run ends when the bot edits its message to "Рассылка завершена".
+
+The fake API can refuse sends the way Telegram does:
+
+    --global-limit     sends per second across all chats (Telegram: about 30); past it every send
+                       gets 429 retry_after until the flood window is over
+    --throttle-ratio   share of sends refused with a random 429
+    --forbidden-ratio  share of users who blocked the bot (403)
+
+Reported: time to finish, messages per second, 429 and 403 answers, and recipients who never got
+the message although they did not block the bot ("lost") or got it more than once ("duplicates").
+
+Usage:
+    python -m benchmarks.bench_broadcast --users 2000 --api-latency 0.03
+    python -m benchmarks.bench_broadcast --users 2000 --global-limit 30 --forbidden-ratio 0.05
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from typing import Any, Dict
+
+from bot.logging_config import stop_logging
+from bot.main import build_application
+
+from .bench_repositories import environment
+from .dataset import DatasetSpec, build
+from .fake_bot_api import TOKEN, FakeBotApi, make_callback_update, make_message_update
+
+ADMIN_ID = 1
+DONE_PREFIX = "Рассылка завершена"
+TEXT = "Бенчмарк рассылки"
+
+
+def _recipients(path: str) -> list[int]:
+    conn = sqlite3.connect(path)
+    try:
+        return [row[0] for row in conn.execute("SELECT user_id FROM users ORDER BY user_id")]
+    finally:
+        conn.close()
+
+
+async def run(path: str, args: argparse.Namespace) -> Dict[str, Any]:
+    recipients = _recipients(path)
+    rng = random.Random(args.seed)
+    others = [uid for uid in recipients if uid != ADMIN_ID]
+    forbidden = set(rng.sample(others, int(len(others) * args.forbidden_ratio)))
+    api = FakeBotApi(
+        latency=args.api_latency,
+        global_limit=args.global_limit,
+        throttle_ratio=args.throttle_ratio,
+        retry_after=args.retry_after,
+        forbidden=forbidden,
+        seed=args.seed,
+    )
+    await api.start()
+    os.environ.update(
+        BOT_TOKEN=TOKEN,
+        ADMIN_IDS=str(ADMIN_ID),
+        ADMIN_PASSWORD="bench",
+        DATABASE_PATH=path,
+        LOG_FILE=os.path.join(os.path.dirname(path), "bench.log"),
+        LOG_LEVEL=args.log_level,
+        METRICS_ENABLED="false",
+        BOT_API_BASE_URL=api.base_url,
+    )
+    app = build_application()
+    await app.initialize()
+    if app.post_init is not None:
+        await app.post_init(app)
+    await app.start()
+    await app.updater.start_polling(timeout=10)
+    try:
+        # Per-user ordering keeps the three steps of the conversation in sequence.
+        api.push_updates(
+            [
+                make_callback_update(1, ADMIN_ID, "admin_broadcast_all"),
+                make_message_update(2, ADMIN_ID, TEXT),
+                make_callback_update(3, ADMIN_ID, "admin_broadcast_send"),
+            ]
+        )
+        started = time.perf_counter()
+        reported = await api.wait_for_edit(DONE_PREFIX, args.timeout)
+        elapsed = time.perf_counter() - started
+    finally:
+        await app.updater.stop()
+        await app.stop()
+        await app.shutdown()
+        if app.post_shutdown is not None:
+            await app.post_shutdown(app)
+        await api.stop()
+
+    copies = [api.delivered.get(uid, []).count(TEXT) for uid in recipients]
+    received = sum(1 for count in copies if count)
+    return {
+        "recipients": len(recipients),
+        "seconds": round(elapsed, 2),
+        "messages_per_second": round(received / elapsed, 1) if elapsed else 0.0,
+        "received": received,
+        "lost": len(recipients) - len(forbidden) - received,
+        "duplicates": sum(count - 1 for count in copies if count > 1),
+        "throttled_429": api.throttled,
+        "forbidden_403": api.blocked,
+        "bot_reported": reported,
+        "api_calls": dict(api.calls),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="dataset from benchmarks.dataset (copied, never modified)")
+    parser.add_argument("--users", type=int, default=1000, help="size of the dataset built when --db is not given")
+    parser.add_argument("--api-latency", type=float, default=0.03, help="one-way delay of every Bot API call, seconds")
+    parser.add_argument("--global-limit", type=float, default=0.0, help="sends per second before 429 (0: no limit)")
+    parser.add_argument("--throttle-ratio", type=float, default=0.0, help="share of sends refused with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="retry_after of a 429, seconds")
+    parser.add_argument("--forbidden-ratio", type=float, default=0.0, help="share of users who blocked the bot")
+    parser.add_argument("--timeout", type=float, default=3600.0, help="give up after this many seconds")
+    parser.add_argument("--log-level", default="ERROR")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        if args.db:
+            shutil.copyfile(args.db, path)
+        else:
+            spec = DatasetSpec(
+                users=args.users, events=10, registrations=args.users, staff=2, node_depth=1, seed=args.seed
+            )
+            build(path, spec)
+        meta = dict(
+            environment(path),
+            api_latency=args.api_latency,
+            global_limit=args.global_limit,
+            throttle_ratio=args.throttle_ratio,
+            retry_after=args.retry_after,
+            forbidden_ratio=args.forbidden_ratio,
+        )
+        try:
+            results = asyncio.run(run(path, args))
+        finally:
+            stop_logging()
+
+    for key, value in results.items():
+        if key != "api_calls":
+            print(f"{key:<22}{value}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, **results}, f, ensure_ascii=False, indent=2)
+        print(f"results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
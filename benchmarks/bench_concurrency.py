@@ -0,0 +1,151 @@
+"""Mixed traffic latency: sequential update handling vs KeyedUpdateProcessor.
+
+A real PTB Application runs against the local fake Bot API (benchmarks.fake_bot_api). One admin
+starts a broadcast (--broadcast messages sent one by one, like the admin "Рассылка"), while
+--users users keep pressing buttons, each press answered with one sendMessage. Updates go straight
+into ``app.update_queue`` at their arrival time, so only processing is measured, not ingress.
+
+Reported per mode: button latency from arrival to handler end (p50/p95/max), broadcast duration,
+and whether every user's updates were handled in arrival order.
+
+Usage:
+    python -m benchmarks.bench_concurrency --users 50 --presses 10 --api-latency 0.03
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+from telegram import Update
+from telegram.ext import Application, ApplicationBuilder, CommandHandler
+
+from bot.update_processor import KeyedUpdateProcessor
+
+from .fake_bot_api import FakeBotApi, make_message_update
+
+ADMIN_ID = 1
+
+
+class _Traffic:
+    def __init__(self, broadcast_size: int):
+        self.broadcast_size = broadcast_size
+        self.arrived: Dict[int, float] = {}
+        self.handled: Dict[int, float] = {}
+        self.order: Dict[int, List[int]] = {}
+        self.broadcast_seconds = 0.0
+        self.expected = 0
+        self.done = asyncio.Event()
+
+    def _finish(self, update: Update) -> None:
+        self.handled[update.update_id] = time.perf_counter()
+        if len(self.handled) >= self.expected:
+            self.done.set()
+
+    async def press(self, update: Update, context) -> None:
+        self.order.setdefault(update.effective_user.id, []).append(update.update_id)
+        await update.effective_message.reply_text("ok")
+        self._finish(update)
+
+    async def broadcast(self, update: Update, context) -> None:
+        started = time.perf_counter()
+        for idx in range(self.broadcast_size):
+            await context.bot.send_message(chat_id=1000 + idx, text="Анонс")
+        self.broadcast_seconds = time.perf_counter() - started
+        self._finish(update)
+
+    def press_latencies_ms(self) -> List[float]:
+        return [
+            (self.handled[uid] - arrived) * 1000
+            for uid, arrived in self.arrived.items()
+            if uid in self.handled and uid != 1
+        ]
+
+    def in_order(self) -> bool:
+        return all(ids == sorted(ids) for ids in self.order.values())
+
+
+def _schedule(users: int, presses: int, window: float, seed: int) -> List[Tuple[float, dict]]:
+    """Update 1 is the admin's broadcast at t=0; button presses are spread over ``window`` seconds."""
+    rng = random.Random(seed)
+    arrivals = sorted(rng.uniform(0.01, window) for _ in range(users * presses))
+    plan = [(0.0, make_message_update(1, ADMIN_ID, "/broadcast"))]
+    for idx, at in enumerate(arrivals, start=2):
+        plan.append((at, make_message_update(idx, 100 + rng.randrange(users), "/press")))
+    return plan
+
+
+async def bench(mode: str, plan: List[Tuple[float, dict]], args: argparse.Namespace) -> dict:
+    api = FakeBotApi(latency=args.api_latency)
+    await api.start()
+    builder = ApplicationBuilder().token(api.token).base_url(api.base_url).updater(None)
+    if mode == "keyed":
+        builder = builder.concurrent_updates(KeyedUpdateProcessor(args.max_concurrent))
+    app: Application = builder.build()
+    traffic = _Traffic(args.broadcast)
+    traffic.expected = len(plan)
+    app.add_handler(CommandHandler("broadcast", traffic.broadcast))
+    app.add_handler(CommandHandler("press", traffic.press))
+    await app.initialize()
+    await app.start()
+
+    started = time.perf_counter()
+    for at, data in plan:
+        delay = started + at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        traffic.arrived[data["update_id"]] = time.perf_counter()
+        await app.update_queue.put(Update.de_json(data, app.bot))
+    await traffic.done.wait()
+    elapsed = time.perf_counter() - started
+
+    await app.stop()
+    await app.shutdown()
+    await api.stop()
+    return {
+        "mode": mode,
+        "seconds": elapsed,
+        "latencies": traffic.press_latencies_ms(),
+        "broadcast": traffic.broadcast_seconds,
+        "in_order": traffic.in_order(),
+    }
+
+
+def _percentile(values: List[float], share: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * share))] if values else 0.0
+
+
+def _print(results: List[dict]) -> None:
+    print(f"{'mode':<12}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>10}{'broadcast s':>13}{'total s':>9}{'ordered':>9}")
+    for r in results:
+        lat = sorted(r["latencies"])
+        p50 = statistics.median(lat) if lat else 0.0
+        print(
+            f"{r['mode']:<12}{p50:>9.1f}{_percentile(lat, 0.95):>9.1f}{(lat[-1] if lat else 0):>10.1f}"
+            f"{r['broadcast']:>13.2f}{r['seconds']:>9.2f}{str(r['in_order']):>9}"
+        )
+
+
+async def run(args: argparse.Namespace) -> None:
+    plan = _schedule(args.users, args.presses, args.window, args.seed)
+    _print([await bench("sequential", plan, args), await bench("keyed", plan, args)])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--presses", type=int, default=10, help="button presses per user")
+    parser.add_argument("--window", type=float, default=3.0, help="seconds over which presses arrive")
+    parser.add_argument("--broadcast", type=int, default=100, help="messages in the admin broadcast")
+    parser.add_argument("--api-latency", type=float, default=0.03, help="one-way Bot API delay, seconds")
+    parser.add_argument("--max-concurrent", type=int, default=16, help="MAX_CONCURRENT_UPDATES for keyed mode")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Compare export formats on a synthetic dataset.
+
+Usage:
+    python -m benchmarks.bench_export --rows 500000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+
+from bot.constants import EXPORT_FORMATS
+from bot.services.exports import ExportService
+from bot.storage.db import Database
+from bot.storage.repositories.registrations import RegistrationRepository
+from bot.storage.repositories.users import UserRepository
+
+
+def build_dataset(path: str, rows: int, events: int = 200) -> None:
+    users = max(1, rows // 5)
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE users (user_id INTEGER PRIMARY KEY, username TEXT, full_name TEXT, email TEXT,
+                            consent INTEGER DEFAULT 0, consent_time TEXT, created_at TEXT, updated_at TEXT);
+        CREATE TABLE events (event_id TEXT PRIMARY KEY, name TEXT NOT NULL, datetime_str TEXT NOT NULL,
+                             description TEXT, max_seats INTEGER NOT NULL);
+        CREATE TABLE registrations (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL,
+                                    event_id TEXT NOT NULL, status TEXT DEFAULT 'registered', reg_time TEXT);
+        """
+    )
+    conn.executemany(
+        "INSERT INTO users (user_id, username, full_name, email, consent) VALUES (?, ?, ?, ?, 1)",
+        ((uid, f"user{uid}", f"Пользователь {uid}", f"user{uid}@example.com") for uid in range(1, users + 1)),
+    )
+    conn.executemany(
+        "INSERT INTO events VALUES (?, ?, ?, ?, ?)",
+        ((f"event_{i:05d}", f"Мероприятие {i}", f"2099-01-{1 + i % 28:02d} 10:00", "", rows) for i in range(events)),
+    )
+    conn.executemany(
+        "INSERT INTO registrations (user_id, event_id, status, reg_time) VALUES (?, ?, ?, ?)",
+        (
+            (1 + i % users, f"event_{i % events:05d}", "confirmed" if i % 3 else "registered", "2026-01-01 12:00:00")
+            for i in range(rows)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+async def run(path: str, formats: list[str], max_part_bytes: int) -> None:
+    db = Database(path)
+    service = ExportService(UserRepository(db), RegistrationRepository(db), max_part_bytes=max_part_bytes)
+    print(f"{'format':<8}{'seconds':>10}{'bytes':>14}{'parts':>7}")
+    for fmt in formats:
+        started = time.perf_counter()
+        parts = await service.export_registrations(fmt)
+        elapsed = time.perf_counter() - started
+        print(f"{fmt:<8}{elapsed:>10.2f}{sum(p.size for p in parts):>14}{len(parts):>7}")
+    await db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--formats", default=",".join(EXPORT_FORMATS))
+    parser.add_argument("--max-part-bytes", type=int, default=45 * 1024 * 1024)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        started = time.perf_counter()
+        build_dataset(path, args.rows)
+        print(f"dataset: {args.rows} registrations built in {time.perf_counter() - started:.1f}s")
+        asyncio.run(run(path, args.formats.split(","), args.max_part_bytes))
+
+
+if __name__ == "__main__":
+    main()
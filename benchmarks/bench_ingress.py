@@ -0,0 +1,209 @@
+"""Compare update ingress: long polling vs the webhook listener.
+
+Both modes run a real PTB Application against a local fake Bot API (benchmarks.fake_bot_api).
+--api-latency is a one-way network delay: added to every API response for polling and to every
+delivery for the webhook. Two scenarios are measured:
+
+- burst: all updates arrive at once, how fast does the bot drain them (updates/s);
+- trickle: one update every --interval seconds, time from arrival to handler (p50/p95).
+
+Usage:
+    python -m benchmarks.bench_ingress --updates 5000 --api-latency 0.05
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Dict, List
+
+from telegram import Update
+from telegram.ext import Application, ApplicationBuilder, TypeHandler
+
+from bot.webhook import SECRET_HEADER, WebhookServer
+
+from .fake_bot_api import FakeBotApi, make_message_update
+
+SECRET = "bench-secret"
+
+
+def _updates(count: int, users: int = 500) -> List[dict]:
+    return [make_message_update(i, 1 + i % users) for i in range(1, count + 1)]
+
+
+class _Recorder:
+    def __init__(self, expected: int):
+        self.expected = expected
+        self.sent: Dict[int, float] = {}
+        self.handled: Dict[int, float] = {}
+        self.done = asyncio.Event()
+
+    async def __call__(self, update: Update, context) -> None:
+        self.handled[update.update_id] = time.perf_counter()
+        if len(self.handled) >= self.expected:
+            self.done.set()
+
+    def latencies_ms(self) -> List[float]:
+        return [(self.handled[uid] - sent) * 1000 for uid, sent in self.sent.items() if uid in self.handled]
+
+
+async def _start_app(api: FakeBotApi, recorder: _Recorder) -> Application:
+    app = ApplicationBuilder().token(api.token).base_url(api.base_url).build()
+    app.add_handler(TypeHandler(Update, recorder))
+    await app.initialize()
+    await app.start()
+    return app
+
+
+async def _stop_app(app: Application) -> None:
+    if app.updater and app.updater.running:
+        await app.updater.stop()
+    await app.stop()
+    await app.shutdown()
+
+
+class _WebhookClient:
+    """Raw keep-alive HTTP client: keeps client-side overhead out of the measurement."""
+
+    def __init__(self, port: int, latency: float):
+        self.port = port
+        self.latency = latency
+        self.rejected = 0
+
+    async def __aenter__(self) -> "_WebhookClient":
+        self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.writer.close()
+
+    async def deliver(self, update: dict) -> None:
+        body = json.dumps(update).encode("utf-8")
+        request = (
+            f"POST /telegram HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+            f"{SECRET_HEADER}: {SECRET}\r\nContent-Length: {len(body)}\r\n\r\n"
+        ).encode("latin-1") + body
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        # Like Telegram: retry until the bot accepts the update (503 = backpressure).
+        while True:
+            self.writer.write(request)
+            await self.writer.drain()
+            status = int((await self.reader.readline()).split()[1])
+            length = 0
+            while (line := await self.reader.readline()) != b"\r\n":
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":")[1])
+            await self.reader.readexactly(length)
+            if status == 200:
+                return
+            self.rejected += 1
+            await asyncio.sleep(0.05)
+
+
+async def bench_polling(updates: List[dict], latency: float, interval: float) -> dict:
+    api = FakeBotApi(latency=latency)
+    await api.start()
+    recorder = _Recorder(len(updates))
+    app = await _start_app(api, recorder)
+    await app.updater.start_polling(timeout=10)
+    started = time.perf_counter()
+    if interval:
+        for update in updates:
+            recorder.sent[update["update_id"]] = time.perf_counter()
+            api.push_updates([update])
+            await asyncio.sleep(interval)
+    else:
+        now = time.perf_counter()
+        recorder.sent = {u["update_id"]: now for u in updates}
+        api.push_updates(updates)
+    await recorder.done.wait()
+    elapsed = time.perf_counter() - started
+    await _stop_app(app)
+    await api.stop()
+    return {"mode": "polling", "seconds": elapsed, "requests": api.calls.get("getUpdates", 0),
+            "rejected": 0, "latencies": recorder.latencies_ms()}
+
+
+async def bench_webhook(updates: List[dict], latency: float, interval: float, connections: int, max_queue: int) -> dict:
+    api = FakeBotApi(latency=latency)
+    await api.start()
+    recorder = _Recorder(len(updates))
+    app = await _start_app(api, recorder)
+    server = WebhookServer(app, secret_token=SECRET, port=0, max_queue=max_queue)
+    await server.start()
+    started = time.perf_counter()
+    clients = [_WebhookClient(server.port, latency) for _ in range(connections)]
+    if interval:
+        # One connection delivering serially, like Telegram does for a single chat.
+        async with clients[0] as client:
+            for update in updates:
+                recorder.sent[update["update_id"]] = time.perf_counter()
+                await client.deliver(update)
+                await asyncio.sleep(interval)
+    else:
+        queue: asyncio.Queue = asyncio.Queue()
+        now = time.perf_counter()
+        for update in updates:
+            recorder.sent[update["update_id"]] = now
+            queue.put_nowait(update)
+
+        async def sender(client: _WebhookClient) -> None:
+            async with client:
+                while not queue.empty():
+                    await client.deliver(queue.get_nowait())
+
+        await asyncio.gather(*(sender(c) for c in clients))
+    await recorder.done.wait()
+    elapsed = time.perf_counter() - started
+    await server.stop()
+    await _stop_app(app)
+    await api.stop()
+    return {"mode": "webhook", "seconds": elapsed, "requests": server.accepted + server.rejected,
+            "rejected": sum(c.rejected for c in clients), "latencies": recorder.latencies_ms()}
+
+
+def _print(title: str, count: int, results: List[dict]) -> None:
+    print(title)
+    print(f"{'mode':<9}{'updates':>9}{'seconds':>10}{'upd/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'requests':>10}{'503s':>7}")
+    for r in results:
+        lat = sorted(r["latencies"]) or [0.0]
+        p50 = statistics.median(lat)
+        p95 = lat[min(len(lat) - 1, int(len(lat) * 0.95))]
+        rate = count / r["seconds"] if r["seconds"] else 0
+        print(
+            f"{r['mode']:<9}{count:>9}{r['seconds']:>10.2f}{rate:>10.0f}{p50:>9.1f}{p95:>9.1f}"
+            f"{r['requests']:>10}{r['rejected']:>7}"
+        )
+
+
+async def run(args: argparse.Namespace) -> None:
+    burst = _updates(args.updates)
+    _print("burst", args.updates, [
+        await bench_polling(burst, args.api_latency, 0),
+        await bench_webhook(burst, args.api_latency, 0, args.connections, args.max_queue),
+    ])
+    trickle = _updates(args.trickle)
+    _print("trickle", args.trickle, [
+        await bench_polling(trickle, args.api_latency, args.interval),
+        await bench_webhook(trickle, args.api_latency, args.interval, 1, args.max_queue),
+    ])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=5000, help="burst size")
+    parser.add_argument("--trickle", type=int, default=200, help="updates in the trickle scenario")
+    parser.add_argument("--interval", type=float, default=0.02, help="seconds between trickle updates")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="seconds, one way")
+    parser.add_argument("--connections", type=int, default=40, help="parallel webhook deliveries (Telegram max_connections)")
+    parser.add_argument("--max-queue", type=int, default=1000, help="webhook backpressure threshold")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
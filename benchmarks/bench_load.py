@@ -0,0 +1,320 @@
+"""End-to-end load: the real handler graph from ``build_application`` under a replayed traffic mix.
+
+The application is built exactly as in production (config from the environment, services,
+handlers, instrumentation, load shedder, persistence) on a copy of a ``benchmarks.dataset``
+database. Only the Bot is replaced: ``FakeBot`` answers every Bot API call in-process after
+--api-latency. Updates are real ``telegram.Update`` objects handed to ``Application.process_update``
+through the app's update processor, the way PTB's update fetcher does it.
+
+Traffic is open-loop: sessions arrive at each of --rates per second (Poisson), --duration seconds
+per rate, whether or not the bot keeps up. A session is one action of the --mix:
+
+    start     /start
+    events    "📅 Мероприятия" (the catalog)
+    my        "📝 Мои записи"
+    event     an event card
+    register  "📝 Записаться", then "✅ Подтвердить" on an active event
+    menu      a main menu section by its title
+    node      a content node
+    admin     "📊 Статистика" from an admin
+
+Latency runs from an update's arrival to the end of its handling, so queueing is included.
+Other settings (MAX_CONCURRENT_UPDATES, PERSISTENCE_ENABLED, LOAD_SHED_LAG_MS...) are read from the
+environment as usual.
+
+Usage:
+    python -m benchmarks.bench_load --scale 0.05 --rates 20,50,100 --duration 10
+    python -m benchmarks.bench_load --db /tmp/bench.db --mix event=5,register=1 --out load.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+from telegram import Update
+from telegram.ext import Application, ExtBot
+
+from bot.logging_config import stop_logging
+from bot.main import build_application
+from bot.utils.tracing import note_api_call
+
+from .bench_repositories import environment
+from .dataset import DatasetSpec, build
+from .fake_bot_api import TOKEN, bot_user, make_callback_update, make_message_update, sent_message
+
+DEFAULT_MIX = "start=1,events=3,my=2,event=4,register=1,menu=2,node=3,admin=0.1"
+# Methods that answer with the Message they sent or edited; everything else answers ``True``.
+MESSAGE_METHODS = {"sendMessage", "sendDocument", "sendPhoto", "editMessageText", "editMessageReplyMarkup"}
+
+
+class FakeBot(ExtBot):
+    """An ExtBot whose requests never leave the process; counts calls per Bot API method."""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__(TOKEN)
+        # Bot objects are frozen after __init__ like every TelegramObject.
+        with self._unfrozen():
+            self.latency = latency
+            self.calls: collections.Counter[str] = collections.Counter()
+            self._message_ids = itertools.count(1)
+
+    async def _do_post(self, endpoint: str, data: Dict[str, Any], **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        self.calls[endpoint] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        # What InstrumentedRequest reports for real calls: keeps api_calls per handler meaningful.
+        note_api_call(time.perf_counter() - started)
+        if endpoint == "getMe":
+            return bot_user()
+        if endpoint in MESSAGE_METHODS:
+            return sent_message(next(self._message_ids), data.get("chat_id", 1), str(data.get("text", "")))
+        if endpoint == "getUpdates":
+            return []
+        return True
+
+
+class _Traffic:
+    """Ids the sessions draw from, read from the dataset before the bot opens it."""
+
+    def __init__(self, path: str, rng: random.Random):
+        self.rng = rng
+        now = datetime.now().strftime("%Y-%m-%d %H:%M")
+        conn = sqlite3.connect(path)
+        try:
+            # Consented users with a complete profile: registering never stops to ask for a name.
+            self.users = [
+                row[0]
+                for row in conn.execute(
+                    "SELECT user_id FROM users WHERE consent = 1 AND email != '' AND full_name != '' "
+                    "ORDER BY RANDOM() LIMIT 5000"
+                )
+            ]
+            self.events = [row[0] for row in conn.execute("SELECT event_id FROM events WHERE datetime_str > ?", (now,))]
+            self.sections = [row[0] for row in conn.execute("SELECT title FROM nodes WHERE is_main_menu = 1")]
+            self.nodes = [row[0] for row in conn.execute("SELECT id FROM nodes")]
+        finally:
+            conn.close()
+        if len(self.users) < 2 or not self.events:
+            raise SystemExit("dataset has no consented users or no upcoming events")
+        self.admin_id = self.users.pop()
+        self.update_ids = itertools.count(1)
+
+    def sessions(self) -> Dict[str, Callable[[], Tuple[int, List[str]]]]:
+        """action -> () -> (user id, the updates it sends, as ``text`` or ``cb:<callback data>``)."""
+        rng = self.rng
+        return {
+            "start": lambda: (rng.choice(self.users), ["/start"]),
+            "events": lambda: (rng.choice(self.users), ["📅 Мероприятия"]),
+            "my": lambda: (rng.choice(self.users), ["📝 Мои записи"]),
+            "event": lambda: (rng.choice(self.users), [f"cb:event_view_{rng.choice(self.events)}"]),
+            "register": self._register,
+            "menu": lambda: (rng.choice(self.users), [rng.choice(self.sections) if self.sections else "/start"]),
+            "node": lambda: (rng.choice(self.users), [f"cb:node_{rng.choice(self.nodes)}" if self.nodes else "/start"]),
+            "admin": lambda: (self.admin_id, ["cb:admin_stats"]),
+        }
+
+    def _register(self) -> Tuple[int, List[str]]:
+        event_id = self.rng.choice(self.events)
+        return self.rng.choice(self.users), [f"cb:event_register_{event_id}", f"cb:event_confirm_{event_id}"]
+
+    def update(self, user_id: int, step: str, bot: ExtBot) -> Update:
+        update_id = next(self.update_ids)
+        if step.startswith("cb:"):
+            data = make_callback_update(update_id, user_id, step[3:])
+        else:
+            data = make_message_update(update_id, user_id, step)
+        return Update.de_json(data, bot)
+
+
+def _parse_mix(text: str, known: List[str]) -> Dict[str, float]:
+    mix: Dict[str, float] = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in known:
+            raise SystemExit(f"unknown action {name!r}; known: {', '.join(known)}")
+        mix[name] = float(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def _percentile(ordered: List[float], share: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))] if ordered else 0.0
+
+
+def _latency(seconds: List[float]) -> Dict[str, float]:
+    ordered = sorted(seconds)
+    return {
+        "count": len(ordered),
+        "p50_ms": round(_percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(ordered, 0.99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000 if ordered else 0.0, 2),
+    }
+
+
+class _Errors:
+    def __init__(self):
+        self.count = 0
+
+    async def __call__(self, update: object, context: Any) -> None:
+        self.count += 1
+
+
+async def _step(
+    app: Application, bot: FakeBot, traffic: _Traffic, mix: Dict[str, float], rate: float, duration: float
+) -> Dict[str, Any]:
+    sessions = traffic.sessions()
+    names, weights = list(mix), list(mix.values())
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    rng = traffic.rng
+
+    async def session(action: str, arrived: float) -> None:
+        user_id, steps = sessions[action]()
+        for step in steps:
+            update = traffic.update(user_id, step, bot)
+            await app.update_processor.process_update(update, app.process_update(update))
+            done = time.perf_counter()
+            latencies[action].append(done - arrived)
+            # The next button is pressed as soon as the answer is there.
+            arrived = done
+
+    monitor = app.bot_data.get("loop_monitor")
+    if monitor is not None:
+        monitor.max_lag = 0.0
+    errors: _Errors = app.bot_data["bench_errors"]
+    errors_before, api_before = errors.count, sum(bot.calls.values())
+    tasks = []
+    started = arrival = time.perf_counter()
+    while True:
+        arrival += rng.expovariate(rate)
+        if arrival - started >= duration:
+            break
+        delay = arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        # A blocked loop makes the sleep late: the update still counts as arrived on schedule.
+        tasks.append(asyncio.create_task(session(rng.choices(names, weights)[0], arrival)))
+    offered = time.perf_counter() - started
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    handled = sum(len(values) for values in latencies.values())
+    return {
+        "rate": rate,
+        "sessions": len(tasks),
+        "updates": handled,
+        "offered_seconds": round(offered, 2),
+        "seconds": round(elapsed, 2),
+        "updates_per_second": round(handled / elapsed, 1) if elapsed else 0.0,
+        "errors": errors.count - errors_before,
+        "api_calls": sum(bot.calls.values()) - api_before,
+        "loop_lag_max_ms": round(monitor.max_lag * 1000, 1) if monitor is not None else None,
+        "latency": _latency([s for values in latencies.values() for s in values]),
+        "actions": {name: _latency(values) for name, values in latencies.items() if values},
+    }
+
+
+async def run(path: str, args: argparse.Namespace, traffic: _Traffic, mix: Dict[str, float]) -> Dict[str, Any]:
+    os.environ.update(
+        BOT_TOKEN=TOKEN,
+        ADMIN_IDS=str(traffic.admin_id),
+        ADMIN_PASSWORD="bench",
+        DATABASE_PATH=path,
+        LOG_FILE=os.path.join(os.path.dirname(path), "bench.log"),
+        LOG_LEVEL=args.log_level,
+        METRICS_ENABLED="false",
+        BOT_API_BASE_URL="",
+    )
+    app = build_application()
+    bot = FakeBot(latency=args.api_latency)
+    app.bot = bot
+    # Updates are handed in directly: no polling, and no Updater holding on to the real bot.
+    app.updater = None
+    if app.persistence is not None:
+        app.persistence.set_bot(bot)
+    errors = app.bot_data["bench_errors"] = _Errors()
+    app.add_error_handler(errors)
+
+    await app.initialize()
+    if app.post_init is not None:
+        await app.post_init(app)
+    await app.start()
+    steps = []
+    try:
+        print(
+            f"{'rate/s':>7}{'sessions':>9}{'upd/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+            f"{'errors':>7}{'lag ms':>8}"
+        )
+        for rate in args.rates:
+            step = await _step(app, bot, traffic, mix, rate, args.duration)
+            steps.append(step)
+            lat = step["latency"]
+            print(
+                f"{rate:>7g}{step['sessions']:>9}{step['updates_per_second']:>8}{lat['p50_ms']:>9.1f}"
+                f"{lat['p95_ms']:>9.1f}{lat['p99_ms']:>9.1f}{lat['max_ms']:>9.1f}{step['errors']:>7}"
+                f"{step['loop_lag_max_ms'] or 0:>8.0f}"
+            )
+    finally:
+        await app.stop()
+        await app.shutdown()
+        if app.post_shutdown is not None:
+            await app.post_shutdown(app)
+
+    handlers = dict(app.bot_data["instrumentation"].report(limit=50))
+    print(f"\n{'handler':<40}{'calls':>7}{'p50 ms':>9}{'p95 ms':>9}{'db/call':>9}{'api/call':>9}")
+    for name, row in handlers.items():
+        print(
+            f"{name:<40}{row['calls']:>7}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}"
+            f"{row['db_avg']:>9.1f}{row['api_avg']:>9.1f}"
+        )
+    return {"steps": steps, "handlers": handlers, "api_calls": dict(bot.calls)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="dataset from benchmarks.dataset (copied, never modified)")
+    parser.add_argument("--scale", type=float, default=0.05, help="size of the dataset built when --db is not given")
+    parser.add_argument("--rates", default="20,50,100", help="sessions per second, one step each")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per rate")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="action=weight,...")
+    parser.add_argument("--api-latency", type=float, default=0.03, help="time every Bot API call takes, seconds")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write results as JSON")
+    args = parser.parse_args()
+    args.rates = [float(rate) for rate in args.rates.split(",")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        if args.db:
+            shutil.copyfile(args.db, path)
+        else:
+            build(path, DatasetSpec().scaled(args.scale))
+        meta = dict(environment(path), rates=args.rates, duration=args.duration, api_latency=args.api_latency)
+        traffic = _Traffic(path, random.Random(args.seed))
+        mix = _parse_mix(args.mix, list(traffic.sessions()))
+        meta["mix"] = mix
+        try:
+            results = asyncio.run(run(path, args, traffic, mix))
+        finally:
+            stop_logging()
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, **results}, f, ensure_ascii=False, indent=2)
+        print(f"results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Handler latency under heavy logging: records written on the event loop vs the queued pipeline.
+
+Each simulated update logs --lines records (the way broadcasts and registrations do) between
+awaits, --concurrency at a time. Log sinks are the real ones from ``setup_logging``: a rotating
+file in a temp dir and "stdout", redirected to a sink that takes --sink-delay-ms per write to model
+a slow disk or a backed-up journald/docker pipe.
+
+Reported per mode: handler latency (p50/p95/max) and the worst event-loop stall seen by a probe.
+
+Usage:
+    python -m benchmarks.bench_logging --updates 2000 --lines 20 --sink-delay-ms 0.2
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import List, Tuple
+
+from bot.logging_config import setup_logging, stop_logging
+from bot.utils.tracing import begin_trace, end_trace
+
+MODES = {
+    "direct/text": {"queued": False, "fmt": "text"},
+    "queued/text": {"queued": True, "fmt": "text"},
+    "queued/json": {"queued": True, "fmt": "json"},
+}
+
+log = logging.getLogger("bot.bench")
+
+
+class _SlowSink(io.TextIOBase):
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.chars = 0
+
+    def write(self, text: str) -> int:
+        if self.delay:
+            time.sleep(self.delay)
+        self.chars += len(text)
+        return len(text)
+
+
+async def _update(update_id: int, lines: int) -> float:
+    started = time.perf_counter()
+    begin_trace(update_id, update_id % 500)
+    for n in range(lines):
+        log.info("registration user_id=%s event_id=event_%05d status=%s step=%s", update_id % 500, n, "confirmed", n)
+        await asyncio.sleep(0)
+    end_trace()
+    return time.perf_counter() - started
+
+
+async def _probe(stop: asyncio.Event, interval: float = 0.005) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - expected)
+    return worst
+
+
+async def _run(updates: int, lines: int, concurrency: int) -> Tuple[List[float], float, float]:
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(update_id: int) -> float:
+        async with slots:
+            return await _update(update_id, lines)
+
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(stop))
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(one(i) for i in range(updates)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    return list(latencies), elapsed, await probe
+
+
+def _quantile(values: List[float], q: float) -> float:
+    return statistics.quantiles(values, n=100)[int(q * 100) - 1] if len(values) > 1 else values[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=20, help="log records per update")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--sink-delay-ms", type=float, default=0.2, help="time each stdout write takes")
+    parser.add_argument("--modes", default=",".join(MODES))
+    args = parser.parse_args()
+
+    print(
+        f"{args.updates} updates x {args.lines} records, concurrency {args.concurrency}, "
+        f"stdout write {args.sink_delay_ms}ms"
+    )
+    print(f"{'mode':<13}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'stall ms':>10}{'updates/s':>11}{'drain s':>9}")
+    for mode in args.modes.split(","):
+        with tempfile.TemporaryDirectory() as tmp:
+            stdout, sys.stdout = sys.stdout, _SlowSink(args.sink_delay_ms / 1000)
+            try:
+                setup_logging("INFO", log_file=os.path.join(tmp, "bench.log"), **MODES[mode])
+                latencies, elapsed, stall = asyncio.run(_run(args.updates, args.lines, args.concurrency))
+                # Queued modes still owe the sinks their backlog; shown separately from latency.
+                drain_started = time.perf_counter()
+                stop_logging()
+                drain = time.perf_counter() - drain_started
+            finally:
+                for handler in logging.getLogger().handlers:
+                    handler.close()
+                logging.getLogger().handlers.clear()
+                sys.stdout = stdout
+        print(
+            f"{mode:<13}{_quantile(latencies, 0.5) * 1000:>9.1f}{_quantile(latencies, 0.95) * 1000:>9.1f}"
+            f"{max(latencies) * 1000:>9.1f}{stall * 1000:>10.1f}{args.updates / elapsed:>11.0f}{drain:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
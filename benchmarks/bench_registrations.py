@@ -0,0 +1,215 @@
+"""Stress registrations and seat limits with many simultaneous operations.
+
+Thousands of ``register_user`` / ``confirm_or_register`` / ``cancel_registration`` calls are fired
+at once across --events events with a few seats each, on a file-backed WAL database through the
+bot's own ``Database`` and ``EventService``. With --processes > 1 every process opens its own
+connection to the same file, like ``WORKERS`` mode does.
+
+After the run the database is checked:
+
+- no event has more active (not cancelled) registrations than ``max_seats``;
+- no user holds two registrations for one event.
+
+Reported: operations per second, outcomes (ok / refused with a ValidationError / failed with
+anything else), latency p50/p95, and lock wait, summed over operations: queueing for the
+connection's write lock, plus backing off from "database is locked" when another process holds
+the file (``Database.locked_retries``). SQLite's own busy_timeout waits add to the latency.
+Exit code 1 when an invariant is violated or an operation failed unexpectedly.
+
+Usage:
+    python -m benchmarks.bench_registrations --ops 5000 --events 20 --seats 5
+    python -m benchmarks.bench_registrations --ops 5000 --processes 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from bot.models import Event
+from bot.services.events import EventService
+from bot.storage.db import Database
+from bot.storage.repositories.events import EventRepository
+from bot.storage.repositories.registrations import RegistrationRepository
+from bot.utils.errors import ValidationError
+
+OPERATIONS = ("register", "confirm", "cancel")
+CANCELLED = ("cancelled", "canceled")
+
+
+class _TimedLock(asyncio.Lock):
+    """The connection's write lock, keeping a tally of how long callers queued for it."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.waited = 0.0
+
+    async def acquire(self) -> bool:
+        started = time.perf_counter()
+        try:
+            return await super().acquire()
+        finally:
+            self.waited += time.perf_counter() - started
+
+
+def _prepare(path: str, events: int, seats: int, users: int) -> None:
+    async def schema() -> None:
+        db = Database(path)
+        await db.init_db()
+        await EventRepository(db).add_many(
+            Event(f"stress_{i:04d}", f"Stress {i}", "2099-01-01 10:00", "", seats) for i in range(events)
+        )
+        await db.close()
+
+    asyncio.run(schema())
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO users (user_id, username, full_name, created_at, updated_at) VALUES (?, '', '', '', '')",
+            ((uid,) for uid in range(1, users + 1)),
+        )
+    conn.close()
+
+
+async def _worker(path: str, ops: int, events: int, users: int, seed: int) -> Dict[str, Any]:
+    db = Database(path)
+    lock = db._write_lock = _TimedLock()  # noqa: SLF001
+    service = EventService(EventRepository(db), RegistrationRepository(db))
+    rng = random.Random(seed)
+    outcomes = {"ok": 0, "refused": 0, "failed": 0}
+    errors: Dict[str, int] = {}
+    latencies: List[float] = []
+
+    async def one(kind: str, user_id: int, event_id: str) -> None:
+        started = time.perf_counter()
+        try:
+            if kind == "register":
+                await service.register_user(user_id, event_id)
+            elif kind == "confirm":
+                await service.confirm_or_register(user_id, event_id)
+            else:
+                await service.cancel_registration(user_id, event_id)
+            outcomes["ok"] += 1
+        except ValidationError:
+            outcomes["refused"] += 1
+        except Exception as exc:  # noqa: BLE001
+            outcomes["failed"] += 1
+            name = f"{exc.__class__.__name__}: {exc}"
+            errors[name] = errors.get(name, 0) + 1
+        latencies.append(time.perf_counter() - started)
+
+    await db.connect()
+    plan = [
+        (rng.choices(OPERATIONS, (5, 3, 2))[0], rng.randint(1, users), f"stress_{rng.randrange(events):04d}")
+        for _ in range(ops)
+    ]
+    started = time.perf_counter()
+    await asyncio.gather(*(one(*op) for op in plan))
+    elapsed = time.perf_counter() - started
+    await db.close()
+    return {
+        "seconds": elapsed,
+        "outcomes": outcomes,
+        "errors": errors,
+        "latencies": latencies,
+        "lock_wait": lock.waited,
+        "locked_retries": db.locked_retries,
+        "locked_wait": db.locked_wait_seconds,
+    }
+
+
+def _run_worker(args: tuple) -> Dict[str, Any]:
+    return asyncio.run(_worker(*args))
+
+
+def check(path: str) -> List[str]:
+    """Invariant violations found in the database, empty when it is consistent."""
+    conn = sqlite3.connect(path)
+    try:
+        overbooked = conn.execute(
+            f"""
+            SELECT e.event_id, e.max_seats, COUNT(r.id)
+              FROM events e JOIN registrations r ON r.event_id = e.event_id
+             WHERE r.status NOT IN {CANCELLED}
+             GROUP BY e.event_id
+            HAVING COUNT(r.id) > e.max_seats
+            """
+        ).fetchall()
+        duplicates = conn.execute(
+            "SELECT user_id, event_id, COUNT(*) FROM registrations GROUP BY user_id, event_id HAVING COUNT(*) > 1"
+        ).fetchall()
+    finally:
+        conn.close()
+    problems = [f"{event_id}: {taken} active registrations for {seats} seats" for event_id, seats, taken in overbooked]
+    problems += [f"user {user_id} has {count} registrations for {event_id}" for user_id, event_id, count in duplicates]
+    return problems
+
+
+def run(args: argparse.Namespace, path: str) -> Dict[str, Any]:
+    _prepare(path, args.events, args.seats, args.users)
+    per_process = args.ops // args.processes
+    jobs = [(path, per_process, args.events, args.users, args.seed + i) for i in range(args.processes)]
+    started = time.perf_counter()
+    if args.processes == 1:
+        results = [_run_worker(jobs[0])]
+    else:
+        with multiprocessing.get_context("spawn").Pool(args.processes) as pool:
+            results = pool.map(_run_worker, jobs)
+    elapsed = time.perf_counter() - started
+
+    outcomes = {key: sum(r["outcomes"][key] for r in results) for key in ("ok", "refused", "failed")}
+    errors: Dict[str, int] = {}
+    for r in results:
+        for name, count in r["errors"].items():
+            errors[name] = errors.get(name, 0) + count
+    latencies = sorted(s * 1000 for r in results for s in r["latencies"])
+    return {
+        "ops": sum(outcomes.values()),
+        "processes": args.processes,
+        "seconds": round(elapsed, 2),
+        "ops_per_second": round(sum(outcomes.values()) / max(r["seconds"] for r in results)),
+        "outcomes": outcomes,
+        "p50_ms": round(statistics.median(latencies), 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 1),
+        "lock_wait_s": round(sum(r["lock_wait"] for r in results), 2),
+        "locked_retries": sum(r["locked_retries"] for r in results),
+        "locked_wait_s": round(sum(r["locked_wait"] for r in results), 2),
+        "errors": errors,
+        "violations": check(path),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=5000, help="operations in total, all started at once")
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--seats", type=int, default=5, help="seats per event")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--processes", type=int, default=1, help="processes sharing the database file")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = run(args, os.path.join(tmp, "stress.db"))
+    for key, value in results.items():
+        if key not in ("errors", "violations"):
+            print(f"{key:<20}{value}")
+    for name, count in results["errors"].items():
+        print(f"error x{count}: {name}")
+    for problem in results["violations"]:
+        print(f"VIOLATION: {problem}")
+    if results["violations"] or results["outcomes"]["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
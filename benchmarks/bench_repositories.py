@@ -0,0 +1,427 @@
+"""Time every repository method and the hot service calls on a generated dataset.
+
+Runs against a copy of ``--db`` (writes are timed too), or builds a ``--scale``d dataset in a temp
+dir when no file is given. Each case is called ``--calls`` times with seeded random arguments
+(full scans and exports ``--scan-calls`` times) after one untimed warm-up call. Reported per case:
+latency percentiles, rows returned and SQL statements issued per call.
+
+``--out`` writes the results as JSON together with the git commit, Python/SQLite versions and the
+dataset's row counts; ``--compare`` diffs two such files by p50 and exits with 1 when something
+got slower than ``--threshold``.
+
+Usage:
+    python -m benchmarks.dataset --out /tmp/bench.db
+    python -m benchmarks.bench_repositories --db /tmp/bench.db --out bench-$(git rev-parse --short HEAD).json
+    python -m benchmarks.bench_repositories --scale 0.01 --only registrations,service.events
+    python -m benchmarks.bench_repositories --compare bench-old.json bench-new.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from benchmarks.dataset import META_KEY, DatasetSpec, build, table_counts
+from bot.constants import Role
+from bot.models import ContentSection, Event, MenuItem, Node, Registration, Template, User
+from bot.services.events import EventService
+from bot.services.exports import ExportService
+from bot.services.nodes import NodeService
+from bot.storage.db import Database
+from bot.storage.repositories.content import ContentRepository
+from bot.storage.repositories.events import EventRepository
+from bot.storage.repositories.nodes import NodeRepository
+from bot.storage.repositories.registrations import RegistrationRepository
+from bot.storage.repositories.roles import RoleRepository
+from bot.storage.repositories.users import UserRepository
+from bot.utils.errors import ValidationError
+
+RESULTS_VERSION = 1
+BATCH = 100
+
+
+@dataclass
+class Case:
+    name: str
+    call: Callable[[], Awaitable[Any]]
+    scan: bool = False
+    # Untimed, after the last call: undo what would skew the cases that follow.
+    cleanup: Optional[Callable[[], Awaitable[Any]]] = None
+
+
+class _Fixture:
+    """Repositories, services and the ids random arguments are drawn from."""
+
+    def __init__(self, db: Database, rng: random.Random):
+        self.db = db
+        self.rng = rng
+        self.users = UserRepository(db)
+        self.roles = RoleRepository(db)
+        self.events = EventRepository(db)
+        self.regs = RegistrationRepository(db)
+        self.nodes = NodeRepository(db)
+        self.content = ContentRepository(db)
+        self.event_service = EventService(self.events, self.regs)
+        self.node_service = NodeService(self.nodes)
+        self.export_service = ExportService(self.users, self.regs)
+        self.seq = itertools.count(1)
+
+    async def load(self, pool: int) -> None:
+        db = self.db
+        self.max_user = (await db.fetchone("SELECT MAX(user_id) FROM users"))[0]
+        self.max_reg = (await db.fetchone("SELECT MAX(id) FROM registrations"))[0]
+        self.event_list = await self.events.list_events()
+        self.event_ids = [e.event_id for e in self.event_list]
+        self.active_ids = [e.event_id for e in await self.event_service.list_active_events()] or self.event_ids
+        rows = await db.fetchall("SELECT id, key FROM nodes")
+        self.node_ids = [row["id"] for row in rows]
+        self.node_keys = [row["key"] for row in rows]
+        self.parent_ids = [row[0] for row in await db.fetchall("SELECT DISTINCT parent_id FROM nodes")]
+        rows = await db.fetchall("SELECT user_id, event_id FROM registrations ORDER BY RANDOM() LIMIT 1000")
+        self.reg_pairs = [(row["user_id"], row["event_id"]) for row in rows]
+        # Users with no registrations yet, for the cases that register someone.
+        first = self.max_user + 1_000_000
+        await self.users.upsert_many(
+            User(user_id=uid, username=f"fresh{uid}", full_name=f"Новый {uid}") for uid in range(first, first + pool)
+        )
+        self.fresh_users = iter(range(first, first + pool))
+        self.new_user_ids = itertools.count(first + pool)
+        self.doomed = list(self.event_ids)
+        self.rng.shuffle(self.doomed)
+        self.new_nodes: List[int] = []
+        self.new_keys: List[str] = []
+        self.new_menu_keys: List[str] = []
+
+    def user(self) -> int:
+        return self.rng.randint(1, self.max_user)
+
+    def event(self) -> str:
+        return self.rng.choice(self.event_ids)
+
+
+def _cases(fx: _Fixture) -> List[Case]:
+    rng = fx.rng
+
+    async def upsert_many():
+        first = fx.user()
+        return await fx.users.upsert_many(
+            User(user_id=uid, username=f"user{uid}", full_name=f"Пользователь {uid}")
+            for uid in range(first, min(first + BATCH, fx.max_user + 1))
+        )
+
+    async def iterate(rows):
+        return range(sum([len(batch) async for batch in rows]))
+
+    async def add_event():
+        return await fx.events.add(Event(f"bench_{next(fx.seq)}", "Новое", "2099-01-01 10:00", "", 100))
+
+    async def add_events():
+        return await fx.events.add_many(
+            Event(f"bench_{next(fx.seq)}", "Новое", "2099-01-01 10:00", "", 100) for _ in range(BATCH)
+        )
+
+    async def drop_new_events():
+        # Thousands of extra events would otherwise dominate the catalog cases.
+        await fx.db.execute("DELETE FROM events WHERE event_id LIKE 'bench\\_%' ESCAPE '\\'")
+
+    async def create_registration():
+        return await fx.regs.create(Registration(None, next(fx.fresh_users), fx.event()))
+
+    async def add_registrations():
+        user_id = next(fx.fresh_users)
+        event_ids = rng.sample(fx.event_ids, min(BATCH, len(fx.event_ids)))
+        return await fx.regs.add_many(Registration(None, user_id, event_id) for event_id in event_ids)
+
+    async def upsert_node():
+        node = Node(None, rng.choice(fx.parent_ids), f"bench_{next(fx.seq)}", "Новый", "Текст", order_index=99)
+        node_id = await fx.nodes.upsert_node(node)
+        fx.new_nodes.append(node_id)
+        return node_id
+
+    async def delete_node():
+        return await fx.nodes.delete_node(fx.new_nodes.pop())
+
+    async def upsert_section():
+        key = f"bench_{next(fx.seq)}"
+        fx.new_keys.append(key)
+        return await fx.content.upsert_section(ContentSection(key, "Раздел", "Текст " * 50))
+
+    async def upsert_menu_item():
+        key = f"bench_{next(fx.seq)}"
+        fx.new_menu_keys.append(key)
+        return await fx.content.upsert_menu_item(MenuItem(key, "Пункт", 99))
+
+    async def register_user():
+        try:
+            return await fx.event_service.register_user(next(fx.fresh_users), rng.choice(fx.active_ids))
+        except ValidationError:
+            # Sold out: still the full check, just no insert.
+            return None
+
+    async def list_active_cold():
+        fx.event_service.invalidate_cache()
+        return await fx.event_service.list_active_events()
+
+    async def card_cold():
+        fx.event_service.invalidate_cache()
+        return await fx.event_service.get_event_card(fx.event(), fx.user())
+
+    async def children_cold():
+        fx.node_service.invalidate_cache()
+        return await fx.node_service.get_children(rng.choice(fx.parent_ids))
+
+    async def export(kind: str):
+        method = getattr(fx.export_service, f"export_{kind}")
+        return await method("csv")
+
+    async def delete_by_event():
+        # Real, populated events: run last, everything after this sees fewer rows.
+        return await fx.regs.delete_by_event(fx.doomed.pop())
+
+    async def delete_event():
+        # Registrations go with it (ON DELETE CASCADE).
+        return await fx.events.delete(fx.doomed.pop())
+
+    def event_update():
+        event = rng.choice(fx.event_list)
+        return fx.events.update(event)
+
+    return [
+        Case("repo.users.get_user", lambda: fx.users.get_user(fx.user())),
+        Case("repo.users.upsert_user", lambda: fx.users.upsert_user(fx.user(), "name", "Имя Фамилия")),
+        Case("repo.users.upsert_user.new", lambda: fx.users.upsert_user(next(fx.new_user_ids), "new", "Новый")),
+        Case("repo.users.upsert_many", upsert_many),
+        Case("repo.users.update_profile", lambda: fx.users.update_profile(fx.user(), "Имя Фамилия", None)),
+        Case("repo.users.set_email", lambda: fx.users.set_email(fx.user(), "bench@example.com")),
+        Case("repo.users.set_full_name", lambda: fx.users.set_full_name(fx.user(), "Имя Фамилия")),
+        Case("repo.users.set_consent", lambda: fx.users.set_consent(fx.user(), True)),
+        Case("repo.users.list_users", fx.users.list_users, scan=True),
+        Case("repo.users.iter_export_rows", lambda: iterate(fx.users.iter_export_rows()), scan=True),
+        Case("repo.roles.get_role", lambda: fx.roles.get_role(fx.user())),
+        Case("repo.roles.set_role", lambda: fx.roles.set_role(fx.user(), Role.USER)),
+        Case("repo.roles.list_roles", fx.roles.list_roles, scan=True),
+        Case("repo.roles.list_elevated", fx.roles.list_elevated),
+        Case("repo.roles.get_roles", lambda: fx.roles.get_roles(fx.user() for _ in range(BATCH))),
+        Case("repo.events.list_events", fx.events.list_events),
+        Case("repo.events.get", lambda: fx.events.get(fx.event())),
+        Case("repo.events.get_card", lambda: fx.events.get_card(fx.event(), fx.user())),
+        Case("repo.events.add", add_event, cleanup=drop_new_events),
+        Case("repo.events.add_many", add_events, cleanup=drop_new_events),
+        Case("repo.events.update", event_update),
+        Case("repo.registrations.list_by_event", lambda: fx.regs.list_by_event(fx.event())),
+        Case("repo.registrations.list_by_user", lambda: fx.regs.list_by_user(fx.user())),
+        Case("repo.registrations.get", lambda: fx.regs.get(*rng.choice(fx.reg_pairs))),
+        Case(
+            "repo.registrations.list_upcoming_by_user",
+            lambda: fx.regs.list_upcoming_by_user(fx.user(), datetime.now().strftime("%Y-%m-%d %H:%M")),
+        ),
+        Case("repo.registrations.create", create_registration),
+        Case("repo.registrations.add_many", add_registrations),
+        Case(
+            "repo.registrations.update_status",
+            lambda: fx.regs.update_status(rng.randint(1, fx.max_reg), rng.choice(("registered", "confirmed"))),
+        ),
+        Case("repo.registrations.iter_export_rows", lambda: iterate(fx.regs.iter_export_rows()), scan=True),
+        Case("repo.nodes.get_node", lambda: fx.nodes.get_node(rng.choice(fx.node_ids))),
+        Case("repo.nodes.get_node_by_key", lambda: fx.nodes.get_node_by_key(rng.choice(fx.node_keys))),
+        Case("repo.nodes.get_children", lambda: fx.nodes.get_children(rng.choice(fx.parent_ids))),
+        Case("repo.nodes.upsert_node", upsert_node),
+        Case("repo.nodes.delete_node", delete_node),
+        Case("repo.nodes.list_all_nodes", fx.nodes.list_all_nodes, scan=True),
+        Case("repo.nodes.get_main_menu_nodes", fx.nodes.get_main_menu_nodes),
+        Case("repo.content.list_sections", fx.content.list_sections),
+        Case("repo.content.get_section", lambda: fx.content.get_section(f"section_{rng.randrange(20)}")),
+        Case("repo.content.upsert_section", upsert_section),
+        Case("repo.content.delete_section", lambda: fx.content.delete_section(fx.new_keys.pop())),
+        Case("repo.content.list_menu_items", fx.content.list_menu_items),
+        Case("repo.content.upsert_menu_item", upsert_menu_item),
+        Case("repo.content.delete_menu_item", lambda: fx.content.delete_menu_item(fx.new_menu_keys.pop())),
+        Case("repo.content.list_templates", fx.content.list_templates),
+        Case("repo.content.get_template", lambda: fx.content.get_template(f"template_{rng.randrange(10)}")),
+        Case(
+            "repo.content.upsert_template",
+            lambda: fx.content.upsert_template(Template(f"template_{rng.randrange(10)}", "Здравствуйте, {name}!")),
+        ),
+        Case("service.events.list_active_events.cold", list_active_cold),
+        Case("service.events.list_active_events.warm", fx.event_service.list_active_events),
+        Case("service.events.get_event_card.cold", card_cold),
+        Case(
+            "service.events.get_event_card.warm",
+            lambda: fx.event_service.get_event_card(rng.choice(fx.active_ids[:5]), fx.user()),
+        ),
+        Case("service.events.register_user", register_user),
+        Case("service.events.list_user_registrations", lambda: fx.event_service.list_user_registrations(fx.user())),
+        Case(
+            "service.events.list_upcoming_registrations",
+            lambda: fx.event_service.list_upcoming_registrations(fx.user()),
+        ),
+        Case("service.nodes.get_children.cold", children_cold),
+        Case("service.nodes.get_children.warm", lambda: fx.node_service.get_children(rng.choice(fx.parent_ids))),
+        Case("service.exports.export_registrations.csv", lambda: export("registrations"), scan=True),
+        Case("service.exports.export_users.csv", lambda: export("users"), scan=True),
+        Case("repo.registrations.delete_by_event", delete_by_event, scan=True),
+        Case("repo.events.delete", delete_event, scan=True),
+    ]
+
+
+def _statements(db: Database) -> int:
+    return sum(stat.calls for stat in db.query_stats.entries.values()) + db.query_stats.dropped
+
+
+def _rows(result: Any) -> int:
+    if isinstance(result, (list, dict, range)):
+        return len(result)
+    # Row ids and change counts returned by writes are not result rows.
+    return 0 if result is None or isinstance(result, int) else 1
+
+
+def _summary(timings: List[float], rows: int, statements: int) -> Dict[str, float]:
+    ms = sorted(t * 1000 for t in timings)
+    return {
+        "calls": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 4),
+        "p50_ms": round(ms[len(ms) // 2], 4),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 4),
+        "max_ms": round(ms[-1], 4),
+        "rows": round(rows / len(ms), 1),
+        "statements": round(statements / len(ms), 2),
+    }
+
+
+async def run(path: str, calls: int, scan_calls: int, only: List[str], seed: int) -> Dict[str, Dict[str, float]]:
+    db = Database(path)
+    fx = _Fixture(db, random.Random(seed))
+    # Every registering case takes a fresh user per call, the warm-up call included.
+    await fx.load(pool=4 * (calls + 1))
+    results: Dict[str, Dict[str, float]] = {}
+    print(f"{'case':<46}{'calls':>6}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'rows':>10}{'stmts':>7}")
+    for case in _cases(fx):
+        if only and not any(part in case.name for part in only):
+            continue
+        n = scan_calls if case.scan else calls
+        await case.call()
+        timings: List[float] = []
+        rows = 0
+        statements = _statements(db)
+        for _ in range(n):
+            started = time.perf_counter()
+            result = await case.call()
+            timings.append(time.perf_counter() - started)
+            rows += _rows(result)
+        result = results[case.name] = _summary(timings, rows, _statements(db) - statements)
+        if case.cleanup is not None:
+            await case.cleanup()
+        print(
+            f"{case.name:<46}{result['calls']:>6}{result['p50_ms']:>10.3f}{result['p95_ms']:>10.3f}"
+            f"{result['max_ms']:>10.3f}{result['rows']:>10}{result['statements']:>7}"
+        )
+    await db.close()
+    return results
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        out = subprocess.run(["git", *args], capture_output=True, text=True, timeout=10, check=True)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip()
+
+
+def environment(path: str) -> Dict[str, Any]:
+    """What a result was measured on: commit, versions and the dataset at ``path``."""
+    conn = sqlite3.connect(path)
+    try:
+        row = conn.execute("SELECT value FROM app_meta WHERE key = ?", (META_KEY,)).fetchone()
+        counts = table_counts(conn)
+    finally:
+        conn.close()
+    return {
+        "version": RESULTS_VERSION,
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "started_at": datetime.now().astimezone().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "dataset": {"spec": json.loads(row[0]) if row else None, "rows": counts},
+    }
+
+
+def compare(old_path: str, new_path: str, threshold: float) -> int:
+    """Print p50 per case side by side; returns how many cases got slower than ``threshold``."""
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"old: {old['meta'].get('commit')}  new: {new['meta'].get('commit')}")
+    if old["meta"]["dataset"]["rows"] != new["meta"]["dataset"]["rows"]:
+        print("warning: the runs used different datasets")
+    print(f"{'case':<46}{'old p50':>10}{'new p50':>10}{'change':>9}{'stmts':>12}")
+    slower = 0
+    for name in sorted(set(old["results"]) | set(new["results"])):
+        a, b = old["results"].get(name), new["results"].get(name)
+        if a is None or b is None:
+            print(f"{name:<46}{'-' if a is None else a['p50_ms']:>10}{'-' if b is None else b['p50_ms']:>10}")
+            continue
+        change = (b["p50_ms"] - a["p50_ms"]) / a["p50_ms"] if a["p50_ms"] else 0.0
+        # Sub-0.05ms differences are timer noise, whatever the ratio.
+        flag = ""
+        if abs(b["p50_ms"] - a["p50_ms"]) >= 0.05 and abs(change) >= threshold:
+            flag = "  slower" if change > 0 else "  faster"
+            slower += change > 0
+        stmts = f"{a['statements']:g}->{b['statements']:g}"
+        print(f"{name:<46}{a['p50_ms']:>10.3f}{b['p50_ms']:>10.3f}{change:>+9.0%}{stmts:>12}{flag}")
+    return slower
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="dataset from benchmarks.dataset (copied, never modified)")
+    parser.add_argument("--scale", type=float, default=0.1, help="size of the dataset built when --db is not given")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--scan-calls", type=int, default=3, help="calls for full scans and exports")
+    parser.add_argument("--only", default="", help="comma-separated substrings of case names")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="diff two result files and exit")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p50 change reported by --compare")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        started = time.perf_counter()
+        if args.db:
+            shutil.copyfile(args.db, path)
+        else:
+            build(path, DatasetSpec().scaled(args.scale))
+        print(f"dataset ready in {time.perf_counter() - started:.1f}s")
+        meta = dict(environment(path), calls=args.calls, scan_calls=args.scan_calls, seed=args.seed)
+        only = [part for part in args.only.split(",") if part]
+        results = asyncio.run(run(path, args.calls, args.scan_calls, only, args.seed))
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""Generate a realistic SQLite dataset for the benchmarks, using the bot's real schema and indexes.
+
+Shape of the data, not just its size:
+
+* events are spread a year back and a year forward, so about half are still "active";
+* registrations per event follow a long tail (a few events take tens of thousands of users,
+  most take a few hundred), some events are sold out, ~10% of registrations are cancelled;
+* a few dozen moderators/admins among ordinary users;
+* a node tree of ``--main-menu`` roots, each ``--node-depth`` levels deep with ``--node-fanout``
+  children per node, plus content sections, menu items and templates.
+
+The same ``--seed`` gives the same data, with dates relative to the day it is built. The spec is stored in ``app_meta`` under
+``bench_dataset`` so results can say what they ran against.
+
+Usage:
+    python -m benchmarks.dataset --out data/bench.db                   # 100k users, 2k events, 1M registrations
+    python -m benchmarks.dataset --out /tmp/bench-small.db --scale 0.01
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import time
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Tuple
+
+from bot.storage.db import Database
+
+META_KEY = "bench_dataset"
+STATUSES = (("registered", 60), ("confirmed", 30), ("cancelled", 10))
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+@dataclass
+class DatasetSpec:
+    users: int = 100_000
+    events: int = 2_000
+    registrations: int = 1_000_000
+    staff: int = 40
+    main_menu: int = 6
+    node_depth: int = 5
+    node_fanout: int = 4
+    seed: int = 42
+
+    def scaled(self, factor: float) -> "DatasetSpec":
+        """Same shape, ``factor`` times the rows; the node tree keeps its depth."""
+        if factor == 1:
+            return self
+        return replace(
+            self,
+            users=max(10, int(self.users * factor)),
+            events=max(5, int(self.events * factor)),
+            registrations=max(20, int(self.registrations * factor)),
+            staff=max(2, int(self.staff * factor)),
+        )
+
+
+async def _create_schema(path: str) -> None:
+    db = Database(path)
+    await db.init_db()
+    await db.close()
+
+
+def _event_sizes(rng: random.Random, spec: DatasetSpec) -> List[int]:
+    """Registrations per event: Zipf-like weights, shuffled so popularity is not tied to the id."""
+    weights = [1 / (rank + 1) ** 0.9 for rank in range(spec.events)]
+    rng.shuffle(weights)
+    total = sum(weights)
+    return [min(spec.users, max(1, round(spec.registrations * w / total))) for w in weights]
+
+
+def _events(rng: random.Random, spec: DatasetSpec, sizes: List[int], now: datetime) -> Iterator[Tuple]:
+    for i, taken in enumerate(sizes):
+        starts = now + timedelta(days=rng.uniform(-365, 365), minutes=rng.randrange(0, 24 * 60, 15))
+        active = round(taken * 0.9)
+        # A quarter sold out exactly, the rest with 10..100% room to spare.
+        seats = active if rng.random() < 0.25 else max(20, int(active * rng.uniform(1.1, 2.0)))
+        yield (
+            f"event_{i:05d}",
+            f"Мероприятие {i}",
+            starts.strftime("%Y-%m-%d %H:%M"),
+            f"Описание мероприятия {i}. " * rng.randint(1, 8),
+            seats,
+        )
+
+
+def _registrations(
+    rng: random.Random, spec: DatasetSpec, sizes: List[int], starts: List[str]
+) -> Iterator[Tuple]:
+    statuses = [name for name, _ in STATUSES]
+    status_weights = [weight for _, weight in STATUSES]
+    population = range(1, spec.users + 1)
+    order = list(range(spec.events))
+    # Events in random order so rows of one event are not all neighbours in the table.
+    rng.shuffle(order)
+    for i in order:
+        event_id = f"event_{i:05d}"
+        start = datetime.strptime(starts[i], "%Y-%m-%d %H:%M")
+        users = rng.sample(population, sizes[i])
+        picked = rng.choices(statuses, status_weights, k=len(users))
+        for user_id, status in zip(users, picked):
+            reg_time = start - timedelta(days=rng.uniform(0, 60))
+            yield user_id, event_id, status, reg_time.strftime(TIME_FORMAT)
+
+
+def _nodes(spec: DatasetSpec) -> Iterator[Tuple]:
+    """Breadth-first with explicit ids, so children can point at parents without lookups."""
+    next_id = 1
+    level: List[int] = []
+    for order in range(spec.main_menu):
+        yield next_id, None, f"menu_{order}", f"Раздел {order}", f"Текст раздела {order}", None, order, 1
+        level.append(next_id)
+        next_id += 1
+    for depth in range(1, spec.node_depth + 1):
+        below: List[int] = []
+        for parent in level:
+            for order in range(spec.node_fanout):
+                url = f"https://example.com/n/{next_id}" if depth == spec.node_depth else None
+                yield (
+                    next_id,
+                    parent,
+                    f"node_{next_id}",
+                    f"Пункт {depth}.{order}",
+                    f"Содержимое пункта {next_id} " * 4,
+                    url,
+                    order,
+                    0,
+                )
+                below.append(next_id)
+                next_id += 1
+        level = below
+
+
+def build(path: str, spec: DatasetSpec) -> Dict[str, int]:
+    """Write the dataset to a new file at ``path``; returns row counts per table."""
+    if os.path.exists(path):
+        raise FileExistsError(path)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    asyncio.run(_create_schema(os.path.abspath(path)))
+
+    rng = random.Random(spec.seed)
+    now = datetime.now().replace(second=0, microsecond=0)
+    created = (now - timedelta(days=400)).strftime(TIME_FORMAT)
+    sizes = _event_sizes(rng, spec)
+    events = list(_events(rng, spec, sizes, now))
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA synchronous = OFF")
+    with conn:
+        conn.executemany(
+            "INSERT INTO users (user_id, username, full_name, email, consent, consent_time, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    uid,
+                    f"user{uid}" if uid % 7 else "",
+                    f"Пользователь Номер {uid}",
+                    f"user{uid}@example.com" if uid % 3 else "",
+                    1 if uid % 3 else 0,
+                    created if uid % 3 else None,
+                    created,
+                    created,
+                )
+                for uid in range(1, spec.users + 1)
+            ),
+        )
+        staff = set(rng.sample(range(1, spec.users + 1), min(spec.staff, spec.users)))
+        conn.executemany(
+            "INSERT INTO roles (user_id, role) VALUES (?, ?)",
+            (
+                (uid, ("admin" if uid % 4 == 0 else "moderator") if uid in staff else "user")
+                for uid in range(1, spec.users + 1)
+            ),
+        )
+        conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?)", events)
+        conn.executemany(
+            "INSERT INTO registrations (user_id, event_id, status, reg_time) VALUES (?, ?, ?, ?)",
+            _registrations(rng, spec, sizes, [e[2] for e in events]),
+        )
+        conn.executemany(
+            "INSERT INTO nodes (id, parent_id, key, title, content, url, order_index, is_main_menu) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            _nodes(spec),
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO content_sections VALUES (?, ?, ?)",
+            ((f"section_{i}", f"Раздел {i}", f"Текст раздела {i}. " * 20) for i in range(20)),
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO menu_items VALUES (?, ?, ?)",
+            ((f"item_{i}", f"Пункт меню {i}", i) for i in range(10)),
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO templates VALUES (?, ?)",
+            ((f"template_{i}", f"Здравствуйте, {{name}}! Шаблон {i}.") for i in range(10)),
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO app_meta (key, value) VALUES (?, ?)", (META_KEY, json.dumps(asdict(spec)))
+        )
+    conn.execute("ANALYZE")
+    counts = table_counts(conn)
+    conn.close()
+    return counts
+
+
+def table_counts(conn: sqlite3.Connection) -> Dict[str, int]:
+    tables = ("users", "roles", "events", "registrations", "nodes", "content_sections", "menu_items", "templates")
+    return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables}
+
+
+def main() -> None:
+    defaults = DatasetSpec()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True, help="path of the new SQLite file")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply users/events/registrations")
+    parser.add_argument("--users", type=int, default=defaults.users)
+    parser.add_argument("--events", type=int, default=defaults.events)
+    parser.add_argument("--registrations", type=int, default=defaults.registrations)
+    parser.add_argument("--staff", type=int, default=defaults.staff, help="moderators and admins")
+    parser.add_argument("--main-menu", type=int, default=defaults.main_menu, help="root nodes")
+    parser.add_argument("--node-depth", type=int, default=defaults.node_depth)
+    parser.add_argument("--node-fanout", type=int, default=defaults.node_fanout)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--force", action="store_true", help="overwrite --out if it exists")
+    args = parser.parse_args()
+
+    spec = DatasetSpec(
+        users=args.users,
+        events=args.events,
+        registrations=args.registrations,
+        staff=args.staff,
+        main_menu=args.main_menu,
+        node_depth=args.node_depth,
+        node_fanout=args.node_fanout,
+        seed=args.seed,
+    ).scaled(args.scale)
+    if args.force:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.out + suffix):
+                os.remove(args.out + suffix)
+    started = time.perf_counter()
+    counts = build(args.out, spec)
+    size = os.path.getsize(args.out) / 1024 / 1024
+    print(f"{args.out}: built in {time.perf_counter() - started:.1f}s, {size:.0f} MiB")
+    for table, count in counts.items():
+        print(f"  {table:<18}{count:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""A local stand-in for api.telegram.org good enough to drive a real PTB Application.
+
+Point the bot at it with ``ApplicationBuilder().base_url(api.base_url)`` (or ``BOT_API_BASE_URL`` for
+``bot.main.build_application``). Latency, flood control (429 with ``retry_after``) and users who blocked
+the bot (403) can be switched on, so fan-out and retry behaviour can be measured offline.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import math
+import random
+import time
+from collections import deque
+from email.parser import BytesParser
+from typing import Any, Deque, Dict, Iterable, List, Optional
+from urllib.parse import parse_qs
+
+from bot.utils.http import HttpRequest, HttpResponse, HttpServer
+
+TOKEN = "123456:BENCHMARK"
+# Telegram's own cap on documents sent by bots.
+MAX_UPLOAD = 50 * 1024 * 1024
+SEND_METHODS = ("sendMessage", "sendDocument")
+CHAT_METHODS = SEND_METHODS + ("editMessageText", "editMessageReplyMarkup")
+METHODS = CHAT_METHODS + ("getMe", "getUpdates", "deleteWebhook", "setWebhook", "answerCallbackQuery", "deleteMessage")
+
+
+def make_message_update(update_id: int, user_id: int, text: str = "/ping") -> Dict[str, Any]:
+    message: Dict[str, Any] = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"},
+        "text": text,
+    }
+    if text.startswith("/"):
+        # Telegram marks commands with an entity; CommandHandler only matches those.
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": update_id, "message": message}
+
+
+def make_callback_update(update_id: int, user_id: int, data: str, message_id: int = 1) -> Dict[str, Any]:
+    """A button press under one of the bot's earlier messages."""
+    user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": user,
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "text": "…",
+            },
+        },
+    }
+
+
+def bot_user(token: str = TOKEN) -> Dict[str, Any]:
+    return {"id": int(token.split(":")[0]), "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+
+def sent_message(message_id: int, chat_id: Any, text: str = "") -> Dict[str, Any]:
+    return {
+        "message_id": message_id,
+        "date": int(time.time()),
+        "chat": {"id": int(chat_id), "type": "private"},
+        "text": text,
+    }
+
+
+class FakeBotApi:
+    """Serves the Bot API methods the bot uses, with Telegram's failure modes on demand.
+
+    * ``latency`` — one-way network delay added to every response;
+    * ``global_limit`` — sends per second across all chats (Telegram allows about 30); past it the
+      server answers 429 with ``retry_after`` and keeps refusing sends until that time is up;
+    * ``throttle_ratio`` — share of sends refused with a 429 at random, on top of the limit;
+    * ``forbidden`` — chat ids that blocked the bot: sends and edits to them fail with 403.
+
+    The text of every accepted message is recorded per chat, so a benchmark can tell delivered
+    from lost from duplicated.
+    """
+
+    def __init__(
+        self,
+        token: str = TOKEN,
+        latency: float = 0.0,
+        global_limit: float = 0.0,
+        throttle_ratio: float = 0.0,
+        retry_after: int = 1,
+        forbidden: Iterable[int] = (),
+        seed: int = 0,
+    ):
+        self.token = token
+        self.latency = latency
+        self.global_limit = global_limit
+        self.throttle_ratio = throttle_ratio
+        self.retry_after = retry_after
+        self.forbidden = set(forbidden)
+        self.calls: Dict[str, int] = {}
+        self.delivered: Dict[int, List[str]] = {}
+        self.documents: List[Dict[str, Any]] = []
+        self.edits: List[str] = []
+        self.throttled = 0
+        self.blocked = 0
+        self._rng = random.Random(seed)
+        self._recent_sends: Deque[float] = deque()
+        self._flood_until = 0.0
+        self._pending: List[Dict[str, Any]] = []
+        self._new_updates = asyncio.Event()
+        self._message_ids = itertools.count(1)
+        self.http = HttpServer("127.0.0.1", 0, max_body=MAX_UPLOAD)
+        for method in METHODS:
+            self.http.add_route("POST", f"/bot{token}/{method}", self._handler(method))
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.http.port}/bot"
+
+    async def start(self) -> None:
+        await self.http.start()
+
+    async def stop(self) -> None:
+        await self.http.stop()
+
+    def push_updates(self, updates: List[Dict[str, Any]]) -> None:
+        self._pending.extend(updates)
+        self._new_updates.set()
+
+    async def wait_for_edit(self, prefix: str, timeout: float) -> str:
+        """The first message text edited to start with ``prefix``; raises TimeoutError after ``timeout``."""
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            for text in self.edits:
+                if text.startswith(prefix):
+                    return text
+            await asyncio.sleep(0.05)
+        raise asyncio.TimeoutError(f"no message edited to {prefix!r} in {timeout:g}s")
+
+    def _handler(self, method: str):
+        async def handle(request: HttpRequest) -> HttpResponse:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            params = _parse_params(request)
+            refusal = self._refuse(method, params)
+            if refusal is None:
+                response = HttpResponse.json({"ok": True, "result": await getattr(self, f"_{method}")(params)})
+            else:
+                response = HttpResponse.json({"ok": False, **refusal}, status=refusal["error_code"])
+            # One-way network delay on the way back, like a response crossing the internet.
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return response
+
+        return handle
+
+    def _refuse(self, method: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The error Telegram would answer with instead of the result, if any."""
+        if method not in CHAT_METHODS:
+            return None
+        if _chat_id(params) in self.forbidden:
+            self.blocked += 1
+            return {"error_code": 403, "description": "Forbidden: bot was blocked by the user"}
+        if method not in SEND_METHODS:
+            return None
+        now = time.perf_counter()
+        if now < self._flood_until:
+            return self._too_many(self._flood_until - now)
+        if self.throttle_ratio and self._rng.random() < self.throttle_ratio:
+            return self._too_many(self.retry_after)
+        if self.global_limit:
+            while self._recent_sends and now - self._recent_sends[0] >= 1.0:
+                self._recent_sends.popleft()
+            if len(self._recent_sends) >= self.global_limit:
+                self._flood_until = now + self.retry_after
+                return self._too_many(self.retry_after)
+            self._recent_sends.append(now)
+        return None
+
+    def _too_many(self, wait: float) -> Dict[str, Any]:
+        self.throttled += 1
+        retry_after = max(1, math.ceil(wait))
+        return {
+            "error_code": 429,
+            "description": f"Too Many Requests: retry after {retry_after}",
+            "parameters": {"retry_after": retry_after},
+        }
+
+    async def _getMe(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return bot_user(self.token)
+
+    async def _deleteWebhook(self, params: Dict[str, Any]) -> bool:
+        return True
+
+    async def _setWebhook(self, params: Dict[str, Any]) -> bool:
+        return True
+
+    async def _answerCallbackQuery(self, params: Dict[str, Any]) -> bool:
+        return True
+
+    async def _deleteMessage(self, params: Dict[str, Any]) -> bool:
+        return True
+
+    async def _getUpdates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        # Confirmed updates are dropped like on the real API.
+        self._pending = [u for u in self._pending if u["update_id"] >= offset]
+        if not self._pending and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._pending[:limit]
+
+    async def _sendMessage(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        chat_id = _chat_id(params)
+        self.delivered.setdefault(chat_id, []).append(params.get("text", ""))
+        return sent_message(next(self._message_ids), chat_id, params.get("text", ""))
+
+    async def _sendDocument(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        chat_id = _chat_id(params)
+        document = params.get("document")
+        # PTB uploads the file as a multipart part and may reference it as attach://<name>.
+        if isinstance(document, str) and document.startswith("attach://"):
+            document = params.get(document[len("attach://"):])
+        if not isinstance(document, dict):
+            document = {"file_name": None, "file_size": 0, "file_id": str(document)}
+        self.documents.append(dict(document, chat_id=chat_id))
+        self.delivered.setdefault(chat_id, []).append(params.get("caption", ""))
+        message = sent_message(next(self._message_ids), chat_id)
+        del message["text"]
+        if params.get("caption"):
+            message["caption"] = params["caption"]
+        message["document"] = {
+            "file_id": document.get("file_id") or f"doc{message['message_id']}",
+            "file_unique_id": f"u{message['message_id']}",
+            "file_name": document.get("file_name"),
+            "file_size": document.get("file_size", 0),
+        }
+        return message
+
+    async def _editMessageText(self, params: Dict[str, Any]) -> Any:
+        text = params.get("text", "")
+        self.edits.append(text)
+        if "inline_message_id" in params:
+            return True
+        return sent_message(int(params.get("message_id") or 0), _chat_id(params), text)
+
+    async def _editMessageReplyMarkup(self, params: Dict[str, Any]) -> Any:
+        if "inline_message_id" in params:
+            return True
+        return sent_message(int(params.get("message_id") or 0), _chat_id(params))
+
+
+def _chat_id(params: Dict[str, Any]) -> int:
+    try:
+        return int(params.get("chat_id") or 0)
+    except (TypeError, ValueError):
+        # @channelusername: the bot never writes to those, any stable value will do.
+        return 0
+
+
+def _parse_params(request: HttpRequest) -> Dict[str, Any]:
+    if not request.body:
+        return {}
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("application/json"):
+        return request.json()
+    if content_type.startswith("multipart/form-data"):
+        return _parse_multipart(content_type, request.body)
+    # PTB sends form fields whose values are JSON-encoded when they are not plain strings.
+    return {key: _form_value(values[-1]) for key, values in parse_qs(request.body.decode("utf-8")).items()}
+
+
+def _parse_multipart(content_type: str, body: bytes) -> Dict[str, Any]:
+    """Fields of an upload (sendDocument); file parts become ``{file_name, file_size}``."""
+    message = BytesParser().parsebytes(b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body)
+    params: Dict[str, Any] = {}
+    for part in message.get_payload():
+        name = part.get_param("name", header="content-disposition")
+        payload = part.get_payload(decode=True) or b""
+        if part.get_filename() is not None:
+            params[name] = {"file_name": part.get_filename(), "file_size": len(payload)}
+        else:
+            params[name] = _form_value(payload.decode("utf-8"))
+    return params
+
+
+def _form_value(value: str) -> Any:
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
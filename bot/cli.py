@@ -0,0 +1,173 @@
+"""Offline maintenance commands for the bot database.
+
+Usage:
+    python -m bot.cli import-legacy [--events events.xlsx] [--force] [--live]
+    python -m bot.cli export registrations --format csv --out exports/
+    python -m bot.cli backup backups/bot-2026-01-01.db
+    python -m bot.cli stats
+
+The database runs in WAL mode, so every command is safe while the bot is running;
+use ``import-legacy --live`` to commit per chunk and keep write locks short.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from .config import resolve_database_path
+from .constants import EXPORT_FORMATS
+from .logging_config import setup_logging
+from .services.exports import DEFAULT_MAX_PART_BYTES, ExportService
+from .services.migrations import LEGACY_CHUNK_SIZE, MigrationService
+from .storage.db import Database
+from .storage.repositories.content import ContentRepository
+from .storage.repositories.events import EventRepository
+from .storage.repositories.registrations import RegistrationRepository
+from .storage.repositories.roles import RoleRepository
+from .storage.repositories.users import UserRepository
+
+STATS_TABLES = ("users", "roles", "events", "registrations", "nodes", "content_sections", "templates")
+
+
+async def _import_legacy(args: argparse.Namespace) -> int:
+    db = Database(args.db)
+    try:
+        await db.init_db()
+        event_repo = EventRepository(db)
+        migrator = MigrationService(
+            UserRepository(db),
+            RoleRepository(db),
+            event_repo,
+            RegistrationRepository(db),
+            ContentRepository(db),
+            chunk_size=args.chunk_size,
+        )
+        started = time.perf_counter()
+        ok = await migrator.migrate_from_files(
+            events_file=args.events,
+            registrations_file=args.registrations,
+            users_file=args.users,
+            force=args.force,
+            atomic=not args.live,
+        )
+    finally:
+        await db.close()
+    if not ok:
+        print("Nothing imported (no legacy files, already imported or errors; see log).")
+        return 1
+    print(f"Import finished in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+async def _export(args: argparse.Namespace) -> int:
+    db = Database(args.db)
+    try:
+        service = ExportService(UserRepository(db), RegistrationRepository(db), max_part_bytes=args.max_part_bytes)
+        if args.what == "users":
+            parts = await service.export_users(args.format)
+        else:
+            parts = await service.export_registrations(args.format)
+    finally:
+        await db.close()
+    os.makedirs(args.out, exist_ok=True)
+    for part in parts:
+        path = os.path.join(args.out, part.filename)
+        with open(path, "wb") as f:
+            f.write(part.data.getbuffer())
+        print(f"{path}: {part.rows} rows, {part.size} bytes")
+    return 0
+
+
+def _backup(args: argparse.Namespace) -> int:
+    out_dir = os.path.dirname(os.path.abspath(args.out))
+    os.makedirs(out_dir, exist_ok=True)
+    # The online backup API copies a consistent snapshot even while the bot keeps writing.
+    source = sqlite3.connect(args.db, timeout=5)
+    target = sqlite3.connect(args.out)
+    try:
+        with target:
+            source.backup(target, pages=1024)
+    finally:
+        target.close()
+        source.close()
+    print(f"Backup written to {args.out} ({os.path.getsize(args.out)} bytes)")
+    return 0
+
+
+def _stats(args: argparse.Namespace) -> int:
+    # Read-only URI: stats must never create an empty database by accident. as_uri() escapes
+    # "?", "#" and "%" in the path, which would otherwise end up in the query string.
+    conn = sqlite3.connect(Path(args.db).resolve().as_uri() + "?mode=ro", uri=True, timeout=5)
+    try:
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for table in STATS_TABLES:
+            if table in existing:
+                count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                print(f"{table:<18}{count:>10}")
+        if "registrations" in existing:
+            for status, count in conn.execute(
+                "SELECT status, COUNT(*) FROM registrations GROUP BY status ORDER BY status"
+            ):
+                print(f"  {status or '-':<16}{count:>10}")
+    finally:
+        conn.close()
+    size = sum(os.path.getsize(p) for p in (args.db, args.db + "-wal") if os.path.exists(p))
+    print(f"{'size (bytes)':<18}{size:>10}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m bot.cli", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--db", default=None, help="SQLite file (default: DATABASE_PATH from env/.env)")
+    parser.add_argument("--log-level", default="WARNING")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    imp = sub.add_parser("import-legacy", help="import events.xlsx/registrations.xlsx/bot_users.json")
+    imp.add_argument("--events", default="events.xlsx")
+    imp.add_argument("--registrations", default="registrations.xlsx")
+    imp.add_argument("--users", default="bot_users.json")
+    imp.add_argument("--force", action="store_true", help="ignore the migration marker")
+    imp.add_argument("--live", action="store_true", help="commit per chunk (bot is running)")
+    imp.add_argument("--chunk-size", type=int, default=LEGACY_CHUNK_SIZE)
+    imp.set_defaults(handler=_import_legacy)
+
+    exp = sub.add_parser("export", help="export registrations or users to files")
+    exp.add_argument("what", choices=("registrations", "users"))
+    exp.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    exp.add_argument("--out", default=".")
+    exp.add_argument("--max-part-bytes", type=int, default=DEFAULT_MAX_PART_BYTES, help="0 disables splitting")
+    exp.set_defaults(handler=_export)
+
+    bak = sub.add_parser("backup", help="consistent copy of the database")
+    bak.add_argument("out")
+    bak.set_defaults(handler=_backup)
+
+    st = sub.add_parser("stats", help="row counts and database size")
+    st.set_defaults(handler=_stats)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    args.db = args.db or resolve_database_path()
+    setup_logging(args.log_level.upper())
+    if args.command != "import-legacy" and not os.path.exists(args.db):
+        print(f"Database not found: {args.db}", file=sys.stderr)
+        return 2
+    result = args.handler(args)
+    if asyncio.iscoroutine(result):
+        result = asyncio.run(result)
+    return result
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import os
+import re
 from dataclasses import dataclass
 from typing import List
 
@@ -18,8 +19,39 @@ class Config:
     log_file: str = os.path.join("data", "bot.log")
     log_max_bytes: int = 5 * 1024 * 1024
     log_backup_count: int = 3
+    log_format: str = "text"
+    log_queue: bool = True
     restart_enabled: bool = True
     restart_exit_code: int = 1
+    restart_drain_timeout: int = 60
+    export_max_part_bytes: int = 45 * 1024 * 1024
+    warmup_enabled: bool = True
+    warmup_timeout: int = 10
+    webhook_enabled: bool = False
+    webhook_url: str = ""
+    webhook_listen: str = "127.0.0.1"
+    webhook_port: int = 8080
+    webhook_path: str = "/telegram"
+    webhook_secret: str = ""
+    webhook_max_queue: int = 1000
+    workers: int = 0
+    worker_queue_size: int = 1000
+    max_concurrent_updates: int = 16
+    slow_update_ms: int = 1000
+    slow_query_ms: int = 200
+    loop_stall_ms: int = 500
+    load_shed_lag_ms: int = 0
+    metrics_enabled: bool = False
+    metrics_listen: str = "127.0.0.1"
+    metrics_port: int = 9101
+    leader_election: bool = True
+    leader_lease_ttl: int = 10
+    persistence_enabled: bool = True
+    persistence_flush_interval: int = 10
+    persistence_idle_ttl: int = 1800
+    persistence_retention_days: int = 7
+    persistence_conversation_timeout: int = 3600
+    bot_api_base_url: str = ""
 
 
 def _parse_admin_ids(raw: str) -> List[int]:
@@ -64,8 +96,50 @@ def _resolve_path(path: str) -> str:
     return os.path.abspath(os.path.join(base_dir, path))
 
 
-def load_config() -> Config:
+def resolve_database_path() -> str:
+    """DATABASE_PATH from env/.env without requiring the bot secrets (used by offline tools)."""
     load_dotenv()
+    return _resolve_path(os.getenv("DATABASE_PATH", os.path.join("data", "bot.db")))
+
+
+# Read once at startup: changing these needs a real restart, a soft reload keeps the running values.
+RESTART_REQUIRED_FIELDS = frozenset(
+    {
+        "bot_token",
+        "database_path",
+        "log_file",
+        "log_max_bytes",
+        "log_backup_count",
+        "log_format",
+        "log_queue",
+        "webhook_enabled",
+        "webhook_url",
+        "webhook_listen",
+        "webhook_port",
+        "webhook_path",
+        "webhook_secret",
+        "webhook_max_queue",
+        "workers",
+        "worker_queue_size",
+        "max_concurrent_updates",
+        "leader_election",
+        "leader_lease_ttl",
+        "persistence_enabled",
+        "persistence_flush_interval",
+        "persistence_idle_ttl",
+        "persistence_retention_days",
+        "persistence_conversation_timeout",
+        "bot_api_base_url",
+        "metrics_enabled",
+        "metrics_listen",
+        "metrics_port",
+    }
+)
+
+
+def load_config(reload_env: bool = False) -> Config:
+    """``reload_env`` re-reads .env over values loaded earlier (soft reload)."""
+    load_dotenv(override=reload_env)
     token = os.getenv("BOT_TOKEN")
     if not token:
         raise RuntimeError("BOT_TOKEN is required. Set it in .env")
@@ -76,13 +150,59 @@ def load_config() -> Config:
         raise RuntimeError("ADMIN_PASSWORD is required. Set it in .env")
 
     personal_link = os.getenv("PERSONAL_DATA_LINK", "<ВСТАВЬТЕ_ССЫЛКУ_ТУТ>")
-    db_path = _resolve_path(os.getenv("DATABASE_PATH", os.path.join("data", "bot.db")))
+    db_path = resolve_database_path()
     log_level = os.getenv("LOG_LEVEL", "INFO").upper()
     log_file = os.getenv("LOG_FILE", os.path.join("data", "bot.log"))
     log_max_bytes = _parse_int(os.getenv("LOG_MAX_BYTES"), 5 * 1024 * 1024)
     log_backup_count = _parse_int(os.getenv("LOG_BACKUP_COUNT"), 3)
+    # "json": one object per line with update_id/user_id/correlation_id, for log shippers.
+    log_format = os.getenv("LOG_FORMAT", "text").strip().lower()
+    if log_format not in ("text", "json"):
+        log_format = "text"
+    # Hand records to a background thread instead of writing them on the event loop.
+    log_queue = _parse_bool(os.getenv("LOG_QUEUE", "true"), default=True)
     restart_enabled = _parse_bool(os.getenv("RESTART_ENABLED", "true"), default=True)
     restart_exit_code = _parse_int(os.getenv("RESTART_EXIT_CODE"), 1)
+    restart_drain_timeout = max(0, _parse_int(os.getenv("RESTART_DRAIN_TIMEOUT"), 60))
+    export_max_part_bytes = _parse_int(os.getenv("EXPORT_MAX_PART_BYTES"), 45 * 1024 * 1024)
+    warmup_enabled = _parse_bool(os.getenv("WARMUP_ENABLED", "true"), default=True)
+    warmup_timeout = _parse_int(os.getenv("WARMUP_TIMEOUT"), 10)
+    webhook_enabled = _parse_bool(os.getenv("WEBHOOK_ENABLED"), default=False)
+    webhook_secret = os.getenv("WEBHOOK_SECRET", "")
+    # Telegram echoes the secret in X-Telegram-Bot-Api-Secret-Token; it allows 1-256 of [A-Za-z0-9_-].
+    if webhook_enabled and not re.fullmatch(r"[A-Za-z0-9_-]{1,256}", webhook_secret):
+        raise RuntimeError("WEBHOOK_SECRET (1-256 chars: A-Z, a-z, 0-9, _ or -) is required when WEBHOOK_ENABLED")
+    webhook_url = os.getenv("WEBHOOK_URL", "")
+    webhook_listen = os.getenv("WEBHOOK_LISTEN", "127.0.0.1")
+    webhook_port = _parse_int(os.getenv("WEBHOOK_PORT"), 8080)
+    webhook_path = os.getenv("WEBHOOK_PATH", "/telegram")
+    if not webhook_path.startswith("/"):
+        webhook_path = "/" + webhook_path
+    webhook_max_queue = _parse_int(os.getenv("WEBHOOK_MAX_QUEUE"), 1000)
+    workers = max(0, _parse_int(os.getenv("WORKERS"), 0))
+    worker_queue_size = max(1, _parse_int(os.getenv("WORKER_QUEUE_SIZE"), 1000))
+    # Updates handled at once across users; one user's updates always run in order. 1 = sequential.
+    max_concurrent_updates = max(1, _parse_int(os.getenv("MAX_CONCURRENT_UPDATES"), 16))
+    # Updates slower than this are logged with a per-handler breakdown; 0 turns the log off.
+    slow_update_ms = max(0, _parse_int(os.getenv("SLOW_UPDATE_MS"), 1000))
+    # SQL statements slower than this are logged with EXPLAIN QUERY PLAN; 0 turns the log off.
+    slow_query_ms = max(0, _parse_int(os.getenv("SLOW_QUERY_MS"), 200))
+    # Event loop wake-ups this late are logged with the handlers in flight and the loop's stack; 0 = off.
+    loop_stall_ms = max(0, _parse_int(os.getenv("LOOP_STALL_MS"), 500))
+    # Above this recent loop lag users get a "busy" reply and bulk work waits; 0 = never shed.
+    load_shed_lag_ms = max(0, _parse_int(os.getenv("LOAD_SHED_LAG_MS"), 0))
+    metrics_enabled = _parse_bool(os.getenv("METRICS_ENABLED"), default=False)
+    metrics_listen = os.getenv("METRICS_LISTEN", "127.0.0.1")
+    metrics_port = _parse_int(os.getenv("METRICS_PORT"), 9101)
+    leader_election = _parse_bool(os.getenv("LEADER_ELECTION", "true"), default=True)
+    leader_lease_ttl = max(2, _parse_int(os.getenv("LEADER_LEASE_TTL"), 10))
+    persistence_enabled = _parse_bool(os.getenv("PERSISTENCE_ENABLED", "true"), default=True)
+    persistence_flush_interval = max(1, _parse_int(os.getenv("PERSISTENCE_FLUSH_INTERVAL"), 10))
+    persistence_idle_ttl = max(0, _parse_int(os.getenv("PERSISTENCE_IDLE_TTL"), 1800))
+    persistence_retention_days = max(0, _parse_int(os.getenv("PERSISTENCE_RETENTION_DAYS"), 7))
+    persistence_conversation_timeout = max(0, _parse_int(os.getenv("PERSISTENCE_CONVERSATION_TIMEOUT"), 3600))
+    # Self-hosted telegram-bot-api server or a local stand-in, e.g. http://127.0.0.1:8081/bot
+    bot_api_base_url = os.getenv("BOT_API_BASE_URL", "")
 
     db_dir = os.path.dirname(db_path)
     if db_dir:
@@ -98,7 +218,38 @@ def load_config() -> Config:
         log_file=log_file,
         log_max_bytes=log_max_bytes,
         log_backup_count=log_backup_count,
+        log_format=log_format,
+        log_queue=log_queue,
         restart_enabled=restart_enabled,
         restart_exit_code=restart_exit_code,
+        restart_drain_timeout=restart_drain_timeout,
+        export_max_part_bytes=export_max_part_bytes,
+        warmup_enabled=warmup_enabled,
+        warmup_timeout=warmup_timeout,
+        webhook_enabled=webhook_enabled,
+        webhook_url=webhook_url,
+        webhook_listen=webhook_listen,
+        webhook_port=webhook_port,
+        webhook_path=webhook_path,
+        webhook_secret=webhook_secret,
+        webhook_max_queue=webhook_max_queue,
+        workers=workers,
+        worker_queue_size=worker_queue_size,
+        max_concurrent_updates=max_concurrent_updates,
+        slow_update_ms=slow_update_ms,
+        slow_query_ms=slow_query_ms,
+        loop_stall_ms=loop_stall_ms,
+        load_shed_lag_ms=load_shed_lag_ms,
+        metrics_enabled=metrics_enabled,
+        metrics_listen=metrics_listen,
+        metrics_port=metrics_port,
+        leader_election=leader_election,
+        leader_lease_ttl=leader_lease_ttl,
+        persistence_enabled=persistence_enabled,
+        persistence_flush_interval=persistence_flush_interval,
+        persistence_idle_ttl=persistence_idle_ttl,
+        persistence_retention_days=persistence_retention_days,
+        persistence_conversation_timeout=persistence_conversation_timeout,
+        bot_api_base_url=bot_api_base_url,
     )
 
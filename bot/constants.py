@@ -38,3 +38,10 @@ class Conversation(IntEnum):
     NODE_EDIT_IS_MAIN = 27
     ADMIN_ADD_ID = 28
 
+
+EXPORT_FORMATS = ("xlsx", "csv", "jsonl")
+FORMAT_LABELS = {
+    "xlsx": "Excel (.xlsx)",
+    "csv": "CSV (.csv.gz)",
+    "jsonl": "JSON Lines (.jsonl)",
+}
@@ -1,2 +1,82 @@
 # Handlers package
 
+from __future__ import annotations
+
+import importlib
+import importlib.util
+from typing import Any, Dict, List
+
+from telegram.ext import Application, BaseHandler, ConversationHandler
+
+# Registration order matters: earlier modules win for overlapping handlers.
+# Modules are imported on demand so tools importing bot.main don't pay for them.
+HANDLER_MODULES = (
+    "bot.handlers.start",
+    "bot.handlers.profile",
+    "bot.handlers.events",
+    "bot.handlers.admin",
+    "bot.handlers.content",
+    "bot.handlers.menu",
+)
+
+
+class _HandlerCollector:
+    """Stands in for the Application in ``setup_handlers`` so a new handler set is built off to the side."""
+
+    def __init__(self, application: Application):
+        self.persistence = application.persistence
+        self.bot_data = application.bot_data
+        self.handlers: Dict[int, List[BaseHandler[Any, Any]]] = {}
+
+    def add_handler(self, handler: BaseHandler[Any, Any], group: int = 0) -> None:
+        self.handlers.setdefault(group, []).append(handler)
+
+    def add_handlers(self, handlers: List[BaseHandler[Any, Any]], group: int = 0) -> None:
+        for handler in handlers:
+            self.add_handler(handler, group)
+
+
+def register_handlers(application: Application) -> None:
+    for module_name in HANDLER_MODULES:
+        importlib.import_module(module_name).setup_handlers(application)
+
+
+def rebuild_handlers(application: Application, reload_modules: bool = True) -> int:
+    """Re-import the handler modules and swap in a fresh handler set; returns the handler count.
+
+    Raises (leaving the running handlers untouched) when a module does not compile.
+    Conversations in progress keep their state: new ConversationHandlers adopt the old ones'.
+    """
+    modules = [importlib.import_module(name) for name in HANDLER_MODULES]
+    if reload_modules:
+        # Compile everything first: a syntax error must not leave half the modules re-executed.
+        for module in modules:
+            spec = importlib.util.find_spec(module.__name__)
+            if spec and spec.origin and spec.loader:
+                compile(spec.loader.get_source(module.__name__) or "", spec.origin, "exec")
+        modules = [importlib.reload(module) for module in modules]
+
+    collector = _HandlerCollector(application)
+    for module in modules:
+        module.setup_handlers(collector)  # type: ignore[arg-type]
+    instrumentation = application.bot_data.get("instrumentation")
+    if instrumentation is not None:
+        instrumentation.install(collector)
+    shedder = application.bot_data.get("load_shedder")
+    if shedder is not None:
+        shedder.install(collector)
+
+    old = {h.name: h for h in _conversation_handlers(application.handlers) if h.name}
+    for handler in _conversation_handlers(collector.handlers):
+        if handler.name in old:
+            # Share the very dict the Application persists for this conversation name.
+            handler._conversations = old[handler.name]._conversations  # noqa: SLF001
+    # process_update() iterates the dict it read when the update arrived: swapping the attribute
+    # never disturbs updates in flight, and the next update sees the complete new set.
+    # Groups run in key order (Application.add_handler keeps the dict sorted the same way).
+    application.handlers = dict(sorted(collector.handlers.items()))
+    return sum(len(handlers) for handlers in collector.handlers.values())
+
+
+def _conversation_handlers(handlers: Dict[int, List[BaseHandler[Any, Any]]]) -> List[ConversationHandler]:
+    return [h for group in handlers.values() for h in group if isinstance(h, ConversationHandler)]
@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import asyncio
-import io
 from datetime import datetime
 import sys
 import time
@@ -18,10 +17,13 @@ from telegram.ext import (
 )
 
 from ..constants import Conversation, Role
-from ..keyboards.admin import admin_panel_kb, cancel_keyboard, confirm_keyboard
+from ..keyboards.admin import admin_panel_kb, cancel_keyboard, confirm_keyboard, export_format_kb
 from ..services.messaging import ADMIN_BUTTON_TEXT
 from ..services.permissions import require_role
 from ..utils.errors import ValidationError
+from ..utils.log_search import parse_query, search_logs
+from ..utils.metrics import BROADCAST_PENDING
+from ..utils.profiling import SamplingProfiler, TracemallocSession
 from ..utils.validators import parse_int
 from ..logging_config import logger
 from ..utils.admin_diagnostics import (
@@ -32,6 +34,9 @@ from ..utils.admin_diagnostics import (
 )
 
 
+PROFILE_DEFAULT_SECONDS = 10
+PROFILE_MAX_SECONDS = 120
+
 _CMS_DRAFT_KEYS = [
     "cms_node_id",
     "cms_parent_id",
@@ -118,6 +123,42 @@ async def admin_status_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"restart_enabled: {cfg.restart_enabled}",
         f"counts: users={users}, events={events}, registrations={regs}",
     ]
+    processor = getattr(context.application, "update_processor", None)
+    if processor is not None and hasattr(processor, "stats"):
+        stats = processor.stats()
+        lines.append(
+            f"updates: limit={stats['limit']}, active={stats['active']}, pending={stats['pending']}, "
+            f"peak={stats['peak_active']}, processed={stats['processed']}"
+        )
+    instrumentation = context.application.bot_data.get("instrumentation")
+    if instrumentation is not None and instrumentation.handlers:
+        lines.append(f"handlers (p50/p95/p99 ms, avg db/api per call; slow updates: {instrumentation.slow_updates}):")
+        for name, row in instrumentation.report():
+            lines.append(
+                f"  {name}: n={row['calls']} {row['p50_ms']:.0f}/{row['p95_ms']:.0f}/{row['p99_ms']:.0f} "
+                f"db={row['db_avg']:.1f} api={row['api_avg']:.1f}"
+                + (f" err={row['failures']}" if row["failures"] else "")
+            )
+    monitor = context.application.bot_data.get("loop_monitor")
+    if monitor is not None:
+        shedder = context.application.bot_data.get("load_shedder")
+        shedding = f", shedding={'ON' if shedder.overloaded else 'off'} shed={shedder.shed}" if shedder else ""
+        lines.append(
+            f"loop lag: last={monitor.current_lag * 1000:.0f}ms, max={monitor.max_lag * 1000:.0f}ms, "
+            f"stalls={monitor.stalls}{shedding}"
+        )
+    lease = context.application.bot_data.get("leader_lease")
+    if lease is not None:
+        since = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(lease.acquired_at)) if lease.acquired_at else "-"
+        lines.append(f"leader: {lease.holder} (since {since})")
+    persistence = getattr(context.application, "persistence", None)
+    if persistence is not None and hasattr(persistence, "stats"):
+        stats = persistence.stats()
+        lines.append(
+            f"persistence: in_memory={stats['in_memory']}, pending={stats['pending']}, flushes={stats['flushes']}, "
+            f"rows_written={stats['rows_written']}, loaded={stats['loaded']}, evicted={stats['evicted']}, "
+            f"dialogs={stats['conversations']}, dialogs_expired={stats['conversations_expired']}"
+        )
     if loadavg:
         lines.append(f"loadavg: {loadavg}")
     if meminfo:
@@ -167,13 +208,17 @@ async def admin_health_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 @require_role(Role.MODERATOR)
 async def admin_logs_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/admin_logs [level=ERROR] [since=1h] [grep=text] [user=id] [limit=N]; no arguments: tail of LOG_FILE."""
     cfg = context.application.bot_data["config"]
     path = getattr(cfg, "log_file", "")
     if not path:
         await update.effective_message.reply_text("❌ LOG_FILE is not set")
         return
+    if context.args:
+        await _search_logs(update, path, context.args)
+        return
 
-    text = read_last_lines(path, max_lines=120, max_bytes=64 * 1024)
+    text = await asyncio.to_thread(read_last_lines, path, max_lines=120, max_bytes=64 * 1024)
     if not text:
         await update.effective_message.reply_text("Лог пустой или файл не найден.")
         return
@@ -185,10 +230,148 @@ async def admin_logs_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.effective_message.reply_text(text)
 
 
+async def _search_logs(update: Update, path: str, args: list[str]) -> None:
+    try:
+        query = parse_query(args)
+    except ValidationError as exc:
+        await update.effective_message.reply_text(
+            f"❌ {exc}\nИспользование: /admin_logs level=ERROR since=1h grep=текст user=123 limit=50"
+        )
+        return
+    result = await asyncio.to_thread(search_logs, path, query)
+    scanned = (
+        f"прочитано {result.scanned_bytes / 1024:.0f} из {result.total_bytes / 1024:.0f} КБ в {result.files} файлах"
+    )
+    if not result.matches:
+        await update.effective_message.reply_text(f"Ничего не найдено ({scanned}).")
+        return
+    header = f"✅ admin_logs: найдено {result.total}, показаны последние {len(result.matches)} ({scanned})"
+    body = "\n".join(match.text for match in result.matches)
+    # Telegram message limit is ~4096 chars; keep headroom and the newest records.
+    if len(header) + len(body) > 3500:
+        body = "(truncated)\n" + body[-(3500 - len(header)) :]
+    await update.effective_message.reply_text(f"{header}\n{body}")
+
+
+@require_role(Role.MODERATOR)
+async def admin_queries_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/admin_queries [N] [total|max|calls|avg] or /admin_queries reset"""
+    db = context.application.bot_data.get("db")
+    if not db:
+        await update.effective_message.reply_text("❌ DB: not configured")
+        return
+    args = [arg.lower() for arg in (context.args or [])]
+    if "reset" in args:
+        db.query_stats.reset()
+        await update.effective_message.reply_text("✅ Статистика запросов сброшена.")
+        return
+    limit = next((int(arg) for arg in args if arg.isdigit()), 10)
+    order = next((arg for arg in args if arg in ("total", "max", "calls", "avg")), "total")
+
+    top = db.query_stats.top(max(1, min(limit, 50)), key=order)
+    if not top:
+        await update.effective_message.reply_text("Запросов пока не было.")
+        return
+    slow = f"{db.slow_query_ms}ms" if db.slow_query_ms else "off"
+    lines = [f"✅ admin_queries (top {len(top)} by {order}, slow log: {slow})"]
+    for idx, stat in enumerate(top, start=1):
+        sql = stat.sql if len(stat.sql) <= 200 else stat.sql[:197] + "..."
+        lines.append(
+            f"{idx}. calls={stat.calls} total={stat.total_seconds * 1000:.0f}ms avg={stat.avg_seconds * 1000:.1f}ms "
+            f"max={stat.max_seconds * 1000:.0f}ms rows={stat.rows} slow={stat.slow_calls}"
+        )
+        lines.append(f"   {sql}")
+        if stat.plan:
+            lines.append(f"   plan: {stat.plan}")
+    if db.query_stats.dropped:
+        lines.append(f"(не учтено запросов сверх лимита: {db.query_stats.dropped})")
+    text = "\n".join(lines)
+    # Telegram message limit is ~4096 chars; keep headroom.
+    if len(text) > 3500:
+        text = text[:3500] + "\n(truncated)"
+    await update.effective_message.reply_text(text)
+
+
+@require_role(Role.ADMIN)
+async def admin_profile_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/admin_profile <seconds>: sample the event loop and send the report as a file."""
+    args = context.args or []
+    seconds = parse_int(args[0]) if args else PROFILE_DEFAULT_SECONDS
+    if seconds is None or not 1 <= seconds <= PROFILE_MAX_SECONDS:
+        await update.effective_message.reply_text(
+            f"Использование: /admin_profile <секунды от 1 до {PROFILE_MAX_SECONDS}>"
+        )
+        return
+    bot_data = context.application.bot_data
+    if bot_data.get("sampling_profiler") is not None:
+        await update.effective_message.reply_text("Профилирование уже идёт, дождитесь отчёта.")
+        return
+
+    profiler = SamplingProfiler()
+    bot_data["sampling_profiler"] = profiler
+    await update.effective_message.reply_text(f"⏱ Снимаю профиль event loop {seconds} с, отчёт пришлю файлом.")
+    # Not awaited: sleeping here would hold the admin's per-user lock, and /admin_status with it,
+    # for the whole window.
+    context.application.create_task(_send_profile(update, context, profiler, seconds), update=update)
+
+
+async def _send_profile(update: Update, context: ContextTypes.DEFAULT_TYPE, profiler: SamplingProfiler, seconds: int):
+    bot_data = context.application.bot_data
+    # Started on the event loop thread, so that is the thread it samples.
+    profiler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.stop()
+        bot_data.pop("sampling_profiler", None)
+    logger and logger.info(
+        "Profile by user_id=%s: %ss, %s samples, %s idle",
+        update.effective_user.id,
+        seconds,
+        profiler.samples,
+        profiler.idle,
+    )
+    busy_share = (profiler.samples - profiler.idle) * 100 // max(profiler.samples, 1)
+    await context.bot.send_document(
+        chat_id=update.effective_chat.id,
+        document=profiler.report().encode("utf-8"),
+        filename=f"profile-{datetime.now():%Y%m%d-%H%M%S}.txt",
+        caption=f"Профиль за {seconds} с: {profiler.samples} сэмплов, loop занят {busy_share}%",
+    )
+
+
+@require_role(Role.ADMIN)
+async def admin_tracemalloc_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/admin_tracemalloc: the first call starts tracing, the next ones send top allocation sites; "stop" ends it."""
+    session: TracemallocSession = context.application.bot_data.setdefault("tracemalloc_session", TracemallocSession())
+    args = [arg.lower() for arg in (context.args or [])]
+    if "stop" in args:
+        if session.tracing:
+            session.stop()
+            await update.effective_message.reply_text("✅ tracemalloc выключен.")
+        else:
+            await update.effective_message.reply_text("tracemalloc и так выключен.")
+        return
+    if not session.tracing:
+        session.start()
+        await update.effective_message.reply_text(
+            "✅ tracemalloc включён (память и CPU растут, пока он работает). Повторите /admin_tracemalloc позже, "
+            "чтобы получить топ мест аллокации и рост с этого момента; /admin_tracemalloc stop — выключить."
+        )
+        return
+    await context.bot.send_document(
+        chat_id=update.effective_chat.id,
+        document=session.report().encode("utf-8"),
+        filename=f"tracemalloc-{datetime.now():%Y%m%d-%H%M%S}.txt",
+        caption="Топ мест аллокации памяти",
+    )
+
+
 @require_role(Role.MODERATOR)
 async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
+    await _yield_to_users(context)
     event_service = context.application.bot_data["event_service"]
     events = await event_service.list_active_events()
     lines = []
@@ -207,79 +390,77 @@ async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 @require_role(Role.MODERATOR)
 async def export_regs(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    # Heavy dependency: import lazily to keep bot startup fast on weak VPS.
-    import pandas as pd
-
     query = update.callback_query
     await query.answer()
-    profile_service = context.application.bot_data["profile_service"]
-    user_repo = profile_service.user_repo
-    event_service = context.application.bot_data["event_service"]
-    users = await profile_service.list_users()
-    user_by_id = {u.user_id: u for u in users}
-    data = []
-    events = await event_service.event_repo.list_events()
-    for ev in events:
-        regs = await event_service.list_registrations(ev.event_id)
-        for reg in regs:
-            user = user_by_id.get(reg.user_id) or await user_repo.get_user(reg.user_id)
-            data.append(
-                {
-                    "event_id": ev.event_id,
-                    "event_name": ev.name,
-                    "user_id": reg.user_id,
-                    "full_name": user.full_name if user else "",
-                    "email": user.email if user else "",
-                    "status": reg.status,
-                    "reg_time": reg.reg_time,
-                }
-            )
-    df = pd.DataFrame(data)
-    buffer = io.BytesIO()
-    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name="registrations")
-    buffer.seek(0)
-    await context.bot.send_document(
-        chat_id=query.message.chat_id,
-        document=buffer,
-        filename="registrations.xlsx",
-        caption="Экспорт регистраций",
-    )
-    await query.edit_message_text("Готово", reply_markup=admin_panel_kb())
+    await query.edit_message_text("Формат экспорта регистраций:", reply_markup=export_format_kb("admin_export_regs"))
 
 
 @require_role(Role.MODERATOR)
 async def export_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    # Heavy dependency: import lazily to keep bot startup fast on weak VPS.
-    import pandas as pd
+    query = update.callback_query
+    await query.answer()
+    await query.edit_message_text("Формат экспорта пользователей:", reply_markup=export_format_kb("admin_export_users"))
+
+
+def _heavy_job(context: ContextTypes.DEFAULT_TYPE, name: str):
+    # A restart waits for these to finish instead of cutting a broadcast or export in half.
+    return context.application.bot_data["restart_service"].heavy_job(name)
+
+
+async def _yield_to_users(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Low-priority work (broadcasts, exports, statistics) waits here while load shedding is active."""
+    shedder = context.application.bot_data.get("load_shedder")
+    if shedder is not None:
+        await shedder.defer()
+
 
+def _queued(recipients: list):
+    """Iterate broadcast recipients, keeping the pending-messages metric current."""
+    left = len(recipients)
+    BROADCAST_PENDING.inc(amount=left)
+    try:
+        for recipient in recipients:
+            yield recipient
+            left -= 1
+            BROADCAST_PENDING.dec()
+    finally:
+        BROADCAST_PENDING.dec(amount=left)
+
+
+async def _send_export_parts(context: ContextTypes.DEFAULT_TYPE, chat_id: int, parts, caption: str):
+    for idx, part in enumerate(parts, start=1):
+        suffix = f" ({idx}/{len(parts)})" if len(parts) > 1 else ""
+        await context.bot.send_document(
+            chat_id=chat_id,
+            document=part.data,
+            filename=part.filename,
+            caption=f"{caption}{suffix}",
+        )
+
+
+@require_role(Role.MODERATOR)
+async def export_regs_format(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    profile_service = context.application.bot_data["profile_service"]
-    users = await profile_service.list_users()
-    df = pd.DataFrame(
-        [
-            {
-                "user_id": u.user_id,
-                "username": u.username,
-                "full_name": u.full_name,
-                "email": u.email,
-                "consent": u.consent,
-                "consent_time": u.consent_time,
-            }
-            for u in users
-        ]
-    )
-    buffer = io.BytesIO()
-    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name="users")
-    buffer.seek(0)
-    await context.bot.send_document(
-        chat_id=query.message.chat_id,
-        document=buffer,
-        filename="users.xlsx",
-        caption="Экспорт пользователей",
-    )
+    fmt = query.data.replace("admin_export_regs_", "")
+    export_service = context.application.bot_data["export_service"]
+    await _yield_to_users(context)
+    async with _heavy_job(context, "экспорт регистраций"):
+        parts = await export_service.export_registrations(fmt)
+        await _send_export_parts(context, query.message.chat_id, parts, "Экспорт регистраций")
+    await query.edit_message_text("Готово", reply_markup=admin_panel_kb())
+
+
+@require_role(Role.MODERATOR)
+async def export_users_format(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    fmt = query.data.replace("admin_export_users_", "")
+    export_service = context.application.bot_data["export_service"]
+    await _yield_to_users(context)
+    async with _heavy_job(context, "экспорт пользователей"):
+        parts = await export_service.export_users(fmt)
+        await _send_export_parts(context, query.message.chat_id, parts, "Экспорт пользователей")
     await query.edit_message_text("Экспорт отправлен", reply_markup=admin_panel_kb())
 
 
@@ -463,19 +644,21 @@ async def remind_send(update: Update, context: ContextTypes.DEFAULT_TYPE):
     regs = await event_service.list_registrations(event_id)
     target = [r for r in regs if r.status not in ("confirmed", "cancelled", "canceled")]
     sent = 0
-    for reg in target:
-        try:
-            await context.bot.send_message(
-                chat_id=reg.user_id,
-                text="⏰ Пожалуйста, подтвердите участие в мероприятии.",
-                reply_markup=InlineKeyboardMarkup(
-                    [[InlineKeyboardButton("✅ Подтвердить", callback_data=f"event_confirm_{event_id}")]]
-                ),
-            )
-            sent += 1
-            await asyncio.sleep(0.05)
-        except Exception as exc:  # noqa: BLE001
-            logger and logger.warning("Reminder failed for %s: %s", reg.user_id, exc)
+    async with _heavy_job(context, "напоминания"):
+        for reg in _queued(target):
+            try:
+                await context.bot.send_message(
+                    chat_id=reg.user_id,
+                    text="⏰ Пожалуйста, подтвердите участие в мероприятии.",
+                    reply_markup=InlineKeyboardMarkup(
+                        [[InlineKeyboardButton("✅ Подтвердить", callback_data=f"event_confirm_{event_id}")]]
+                    ),
+                )
+                sent += 1
+                await asyncio.sleep(0.05)
+                await _yield_to_users(context)
+            except Exception as exc:  # noqa: BLE001
+                logger and logger.warning("Reminder failed for %s: %s", reg.user_id, exc)
     await query.edit_message_text(f"Напоминания отправлены: {sent}", reply_markup=admin_panel_kb())
     logger and logger.info("Reminder sent for event %s to %s users", event_id, sent)
 
@@ -503,13 +686,15 @@ async def broadcast_all_send(update: Update, context: ContextTypes.DEFAULT_TYPE)
     text = context.user_data.get("broadcast_text", "")
     users = await context.application.bot_data["profile_service"].list_users()
     sent = 0
-    for u in users:
-        try:
-            await context.bot.send_message(chat_id=u.user_id, text=text)
-            sent += 1
-            await asyncio.sleep(0.05)
-        except Exception as exc:  # noqa: BLE001
-            logger and logger.warning("Broadcast fail %s: %s", u.user_id, exc)
+    async with _heavy_job(context, "рассылка всем"):
+        for u in _queued(users):
+            try:
+                await context.bot.send_message(chat_id=u.user_id, text=text)
+                sent += 1
+                await asyncio.sleep(0.05)
+                await _yield_to_users(context)
+            except Exception as exc:  # noqa: BLE001
+                logger and logger.warning("Broadcast fail %s: %s", u.user_id, exc)
     await query.edit_message_text(f"Рассылка завершена. Доставлено: {sent}", reply_markup=admin_panel_kb())
     logger and logger.info("Broadcast to all finished by user_id=%s delivered=%s", query.from_user.id, sent)
     return ConversationHandler.END
@@ -549,13 +734,15 @@ async def broadcast_event_send(update: Update, context: ContextTypes.DEFAULT_TYP
     regs = await context.application.bot_data["event_service"].list_registrations(event_id)
     regs = [r for r in regs if r.status not in ("cancelled", "canceled")]
     sent = 0
-    for reg in regs:
-        try:
-            await context.bot.send_message(chat_id=reg.user_id, text=text)
-            sent += 1
-            await asyncio.sleep(0.05)
-        except Exception as exc:  # noqa: BLE001
-            logger and logger.warning("Broadcast event fail %s: %s", reg.user_id, exc)
+    async with _heavy_job(context, "рассылка по событию"):
+        for reg in _queued(regs):
+            try:
+                await context.bot.send_message(chat_id=reg.user_id, text=text)
+                sent += 1
+                await asyncio.sleep(0.05)
+                await _yield_to_users(context)
+            except Exception as exc:  # noqa: BLE001
+                logger and logger.warning("Broadcast event fail %s: %s", reg.user_id, exc)
     await query.edit_message_text(f"Рассылка по событию завершена. Доставлено: {sent}", reply_markup=admin_panel_kb())
     logger and logger.info(
         "Broadcast to event %s finished by user_id=%s delivered=%s", event_id, query.from_user.id, sent
@@ -700,7 +887,6 @@ async def adm_node_reparent_apply(update: Update, context: ContextTypes.DEFAULT_
         order_index=node.order_index,
         is_main_menu=node.is_main_menu,
     )
-    context.application.bot_data.pop("main_menu_cache", None)
     await query.edit_message_text("✅ Сохранено. Обновляю структуру...")
     await _adm_node_view_render(update, context, node_id)
     return ConversationHandler.END
@@ -832,9 +1018,6 @@ async def adm_node_is_main_input(update: Update, context: ContextTypes.DEFAULT_T
         is_main_menu=context.user_data.get("cms_is_main", False)
     )
     
-    # Invalidate main menu cache
-    context.application.bot_data.pop("main_menu_cache", None)
-    
     await query.edit_message_text("✅ Сохранено!")
     # Clear user data
     for key in ["cms_node_id", "cms_parent_id", "cms_title", "cms_content", "cms_url", "cms_order", "cms_is_main"]:
@@ -868,8 +1051,6 @@ async def adm_node_delete_confirm(update: Update, context: ContextTypes.DEFAULT_
     parent_id = node.parent_id if node else None
     
     await node_service.delete_node(node_id)
-    # Invalidate main menu cache
-    context.application.bot_data.pop("main_menu_cache", None)
     
     await query.edit_message_text("🗑 Удалено")
     
@@ -977,6 +1158,21 @@ async def reload_data(update: Update, context: ContextTypes.DEFAULT_TYPE):
     logger and logger.info("Admin %s requested data reload", query.from_user.id)
 
 
+@require_role(Role.ADMIN)
+async def soft_reload(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    restart_service = context.application.bot_data["restart_service"]
+    try:
+        report = await restart_service.soft_reload(context.application)
+    except RuntimeError as exc:
+        # load_config() rejects an invalid .env; the running configuration stays as it was.
+        await query.edit_message_text(f"❌ Перезагрузка отменена: {exc}", reply_markup=admin_panel_kb())
+        return
+    await query.edit_message_text("⚡ Перезагружено без остановки\n" + "\n".join(report), reply_markup=admin_panel_kb())
+    logger and logger.info("Admin %s requested soft reload", query.from_user.id)
+
+
 @require_role(Role.ADMIN)
 async def restart_bot(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
@@ -1098,16 +1294,23 @@ def setup_handlers(application):
         },
         fallbacks=[CommandHandler("cancel", admin_cancel), CallbackQueryHandler(adm_node_cancel, pattern="^adm_node_cancel$")],
         per_user=True,
+        name="admin",
+        persistent=application.persistence is not None,
     )
     application.add_handler(conv)
     application.add_handler(MessageHandler(filters.Regex(f"^{ADMIN_BUTTON_TEXT}$"), admin_entry))
     application.add_handler(CommandHandler("admin_status", admin_status_cmd))
     application.add_handler(CommandHandler("admin_health", admin_health_cmd))
     application.add_handler(CommandHandler("admin_logs", admin_logs_cmd))
+    application.add_handler(CommandHandler("admin_queries", admin_queries_cmd))
+    application.add_handler(CommandHandler("admin_profile", admin_profile_cmd))
+    application.add_handler(CommandHandler("admin_tracemalloc", admin_tracemalloc_cmd))
     application.add_handler(CallbackQueryHandler(admin_panel, pattern="^admin_panel$"))
     application.add_handler(CallbackQueryHandler(stats, pattern="^admin_stats$"))
     application.add_handler(CallbackQueryHandler(export_regs, pattern="^admin_export_regs$"))
     application.add_handler(CallbackQueryHandler(export_users, pattern="^admin_export_users$"))
+    application.add_handler(CallbackQueryHandler(export_regs_format, pattern="^admin_export_regs_(xlsx|csv|jsonl)$"))
+    application.add_handler(CallbackQueryHandler(export_users_format, pattern="^admin_export_users_(xlsx|csv|jsonl)$"))
     application.add_handler(CallbackQueryHandler(edit_event_start, pattern="^admin_edit_event$"))
     application.add_handler(CallbackQueryHandler(edit_event_pick, pattern="^admin_edit_pick_.*$"))
     application.add_handler(CallbackQueryHandler(delete_event_start, pattern="^admin_delete_event$"))
@@ -1129,5 +1332,6 @@ def setup_handlers(application):
     application.add_handler(CallbackQueryHandler(role_pick, pattern="^role_pick_.*$"))
     application.add_handler(CallbackQueryHandler(role_set, pattern="^role_set_.*$"))
     application.add_handler(CallbackQueryHandler(reload_data, pattern="^admin_reload$"))
+    application.add_handler(CallbackQueryHandler(soft_reload, pattern="^admin_soft_reload$"))
     application.add_handler(CallbackQueryHandler(restart_bot, pattern="^admin_restart$"))
 
@@ -42,25 +42,9 @@ async def list_events(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("Выберите событие:", reply_markup=_event_keyboard(events))
 
 
-async def list_my_registrations(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    profile_service = context.application.bot_data["profile_service"]
-    event_service = context.application.bot_data["event_service"]
-
-    profile = await profile_service.get_profile(update.effective_user.id)
-    if not profile or not profile.consent:
-        await update.message.reply_text("Сначала дайте согласие на обработку данных через /start.")
-        return
-
-    regs = await event_service.list_user_registrations(update.effective_user.id, only_active=True)
-    if not regs:
-        await update.message.reply_text("У вас нет активных записей.")
-        return
-
+def _my_registrations_keyboard(page, next_cursor, first_page: bool) -> InlineKeyboardMarkup:
     rows = []
-    for reg in regs:
-        ev = await event_service.get_event(reg.event_id)
-        if not ev:
-            continue
+    for reg, ev in page:
         status = STATUS_LABELS.get(reg.status, reg.status)
         rows.append(
             [
@@ -70,8 +54,44 @@ async def list_my_registrations(update: Update, context: ContextTypes.DEFAULT_TY
                 )
             ]
         )
+    nav = []
+    if not first_page:
+        nav.append(InlineKeyboardButton("⏮ В начало", callback_data="myregs_"))
+    if next_cursor:
+        nav.append(InlineKeyboardButton("Далее ➡️", callback_data=f"myregs_{next_cursor}"))
+    if nav:
+        rows.append(nav)
     rows.append([InlineKeyboardButton("↩️ Назад", callback_data="events_back")])
-    await update.message.reply_text("Ваши записи:", reply_markup=InlineKeyboardMarkup(rows))
+    return InlineKeyboardMarkup(rows)
+
+
+async def list_my_registrations(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    profile_service = context.application.bot_data["profile_service"]
+    event_service = context.application.bot_data["event_service"]
+
+    profile = await profile_service.get_profile(update.effective_user.id)
+    if not profile or not profile.consent:
+        await update.message.reply_text("Сначала дайте согласие на обработку данных через /start.")
+        return
+
+    page, next_cursor = await event_service.list_upcoming_registrations(update.effective_user.id)
+    if not page:
+        await update.message.reply_text("У вас нет записей на предстоящие мероприятия.")
+        return
+    await update.message.reply_text("Ваши записи:", reply_markup=_my_registrations_keyboard(page, next_cursor, True))
+
+
+async def my_registrations_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    cursor = query.data.replace("myregs_", "") or None
+    event_service = context.application.bot_data["event_service"]
+    page, next_cursor = await event_service.list_upcoming_registrations(query.from_user.id, after_event_id=cursor)
+    if not page:
+        await query.edit_message_text("У вас нет записей на предстоящие мероприятия.")
+        return
+    kb = _my_registrations_keyboard(page, next_cursor, first_page=cursor is None)
+    await query.edit_message_text("Ваши записи:", reply_markup=kb)
 
 
 async def view_event(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -79,15 +99,11 @@ async def view_event(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     event_id = query.data.replace("event_view_", "")
     event_service = context.application.bot_data["event_service"]
-    event = await event_service.get_event(event_id)
-    if not event:
+    card = await event_service.get_event_card(event_id, query.from_user.id)
+    if not card:
         await query.edit_message_text("Событие не найдено.")
         return
-    regs = await event_service.list_registrations(event_id)
-    active_regs = [r for r in regs if r.status not in ("cancelled", "canceled")]
-    free = event.max_seats - len(active_regs)
-
-    user_reg = await event_service.get_user_registration(query.from_user.id, event_id)
+    event, user_reg = card.event, card.registration
     user_status = STATUS_LABELS.get(user_reg.status, "—") if user_reg else "—"
     actions = []
     if not user_reg or user_reg.status in ("cancelled", "canceled"):
@@ -104,7 +120,7 @@ async def view_event(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"🕒 Когда: {event.datetime_str}\n"
         f"ℹ️ Описание: {event.description}\n"
         f"Статус вашей записи: {user_status}\n"
-        f"Свободных мест: {free}/{event.max_seats}"
+        f"Свободных мест: {card.free}/{event.max_seats}"
     )
     await query.edit_message_text(text, reply_markup=kb)
 
@@ -254,10 +270,13 @@ def setup_handlers(application):
         },
         fallbacks=[],
         per_user=True,
+        name="event_registration",
+        persistent=application.persistence is not None,
     )
     application.add_handler(conv)
     application.add_handler(MessageHandler(filters.Regex("^📅 Мероприятия$"), list_events))
     application.add_handler(MessageHandler(filters.Regex("^📝 Мои записи$"), list_my_registrations))
+    application.add_handler(CallbackQueryHandler(my_registrations_page, pattern="^myregs_.*$"))
     application.add_handler(CallbackQueryHandler(view_event, pattern="^event_view_.*$"))
     application.add_handler(CallbackQueryHandler(confirm_registration_callback, pattern="^event_confirm_.*$"))
     application.add_handler(CallbackQueryHandler(cancel_registration_callback, pattern="^event_cancel_.*$"))
@@ -26,12 +26,7 @@ async def main_menu_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     node_service = context.application.bot_data.get("node_service")
     if node_service:
-        cache = context.application.bot_data.get("main_menu_cache")
-        if cache is None:
-            nodes = await node_service.get_main_menu_nodes()
-            cache = {n.title: n for n in nodes}
-            context.application.bot_data["main_menu_cache"] = cache
-        node = cache.get(text)
+        node = await node_service.get_main_menu_node(text)
         if node:
             return await content_handlers.show_node(update, context, node, is_callback=False)
 
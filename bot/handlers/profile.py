@@ -106,6 +106,8 @@ def setup_handlers(application):
         },
         fallbacks=[],
         per_user=True,
+        name="profile_edit",
+        persistent=application.persistence is not None,
     )
     application.add_handler(conv)
     application.add_handler(CallbackQueryHandler(back, pattern="^profile_back$"))
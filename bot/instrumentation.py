@@ -0,0 +1,210 @@
+"""Per-handler latency: wall time, DB statements and Bot API calls for every update.
+
+Installed by ``build_application`` (and again by every soft reload):
+
+- a ``TypeHandler`` in group -1 opens an ``UpdateTrace`` before any other handler runs, and one in
+  a last group closes it: updates slower than ``SLOW_UPDATE_MS`` are logged with a per-handler
+  breakdown;
+- every handler callback, including the ones inside ConversationHandlers, is wrapped to record
+  its own wall time and the DB statements / API calls it made;
+- ``InstrumentedRequest`` counts Bot API calls (``bot.utils.tracing`` gets the DB statements from
+  ``Database``).
+
+Rolling p50/p95/p99 over the last ``window`` calls per handler are shown in ``/admin_status``.
+"""
+
+from __future__ import annotations
+
+import functools
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import BaseHandler, ConversationHandler, TypeHandler
+from telegram.request import HTTPXRequest
+
+from .utils.metrics import API_ERRORS, API_SECONDS, API_THROTTLED, HANDLER_FAILURES, HANDLER_SECONDS, UPDATE_SECONDS
+from .utils.tracing import HandlerSpan, UpdateTrace, begin_trace, current_trace, end_trace, note_api_call
+
+logger = logging.getLogger(__name__)
+
+TRACE_BEGIN_GROUP = -1
+# Later than any group the handler modules use, so it runs after all of them.
+TRACE_END_GROUP = 1000
+
+UPDATE = "(update)"
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest that reports every Bot API call to the current update's trace."""
+
+    async def do_request(self, url: str, method: str, *args: Any, **kwargs: Any) -> Tuple[int, bytes]:
+        # ".../bot<token>/sendMessage" -> "sendMessage"
+        api_method = url.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        status = 0
+        try:
+            status, payload = await super().do_request(url, method, *args, **kwargs)
+            return status, payload
+        finally:
+            seconds = time.perf_counter() - started
+            note_api_call(seconds)
+            API_SECONDS.observe(seconds, api_method)
+            if status == 429:
+                API_THROTTLED.inc(api_method)
+            elif not status or status >= 400:
+                API_ERRORS.inc(api_method)
+
+
+def _percentile(ordered: List[float], share: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))] if ordered else 0.0
+
+
+class LatencyWindow:
+    """The last ``size`` samples of one handler; percentiles are computed on demand."""
+
+    def __init__(self, size: int):
+        self.seconds: Deque[float] = deque(maxlen=size)
+        self.db_statements: Deque[int] = deque(maxlen=size)
+        self.api_calls: Deque[int] = deque(maxlen=size)
+        self.calls = 0
+        self.failures = 0
+
+    def add(self, seconds: float, db_statements: int, api_calls: int, failed: bool = False) -> None:
+        self.seconds.append(seconds)
+        self.db_statements.append(db_statements)
+        self.api_calls.append(api_calls)
+        self.calls += 1
+        self.failures += int(failed)
+
+    def summary(self) -> Dict[str, float]:
+        ordered = sorted(self.seconds)
+        samples = len(ordered) or 1
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "p50_ms": _percentile(ordered, 0.50) * 1000,
+            "p95_ms": _percentile(ordered, 0.95) * 1000,
+            "p99_ms": _percentile(ordered, 0.99) * 1000,
+            "db_avg": sum(self.db_statements) / samples,
+            "api_avg": sum(self.api_calls) / samples,
+        }
+
+
+def handler_name(handler: BaseHandler[Any, Any]) -> str:
+    callback = getattr(handler, "callback", None)
+    return getattr(callback, "__qualname__", None) or type(handler).__name__
+
+
+class UpdateInstrumentation:
+    def __init__(self, slow_update_ms: int = 1000, window: int = 500):
+        self.slow_update_ms = slow_update_ms
+        self.window = window
+        self.handlers: Dict[str, LatencyWindow] = {}
+        self.slow_updates = 0
+        # Handler calls in progress, read by the loop watchdog thread when the loop stalls.
+        self.in_flight: Dict[int, Tuple[str, Optional[int], float]] = {}
+        self._calls = itertools.count()
+
+    def install(self, target: Any) -> None:
+        """Wrap the callbacks already added to ``target`` (an Application or a handler collector)."""
+        self._wrap_all(handler for group in target.handlers.values() for handler in group)
+        target.add_handler(TypeHandler(Update, self._begin), group=TRACE_BEGIN_GROUP)
+        target.add_handler(TypeHandler(Update, self._end), group=TRACE_END_GROUP)
+
+    def _wrap_all(self, handlers: Iterable[BaseHandler[Any, Any]]) -> None:
+        for handler in handlers:
+            if isinstance(handler, ConversationHandler):
+                self._wrap_all(handler.entry_points)
+                for state_handlers in handler.states.values():
+                    self._wrap_all(state_handlers)
+                self._wrap_all(handler.fallbacks)
+            elif callable(getattr(handler, "callback", None)) and handler.callback not in (self._begin, self._end):
+                handler.callback = self._wrap(handler_name(handler), handler.callback)
+
+    def _wrap(self, name: str, callback: Callable[..., Any]) -> Callable[..., Any]:
+        if getattr(callback, "__instrumented__", False):
+            return callback
+
+        @functools.wraps(callback)
+        async def timed(update: object, context: Any) -> Any:
+            trace = current_trace()
+            db_before = trace.db_statements if trace else 0
+            api_before = trace.api_calls if trace else 0
+            started = time.perf_counter()
+            call = next(self._calls)
+            self.in_flight[call] = (name, trace.update_id if trace else None, started)
+            failed = True
+            try:
+                result = await callback(update, context)
+                failed = False
+                return result
+            finally:
+                del self.in_flight[call]
+                span = HandlerSpan(
+                    name=name,
+                    seconds=time.perf_counter() - started,
+                    db_statements=(trace.db_statements - db_before) if trace else 0,
+                    api_calls=(trace.api_calls - api_before) if trace else 0,
+                    failed=failed,
+                )
+                if trace is not None:
+                    trace.spans.append(span)
+                self._record(span)
+
+        timed.__instrumented__ = True  # type: ignore[attr-defined]
+        return timed
+
+    def _record(self, span: HandlerSpan) -> None:
+        window = self.handlers.get(span.name)
+        if window is None:
+            window = self.handlers[span.name] = LatencyWindow(self.window)
+        window.add(span.seconds, span.db_statements, span.api_calls, span.failed)
+        if span.name == UPDATE:
+            UPDATE_SECONDS.observe(span.seconds)
+            return
+        HANDLER_SECONDS.observe(span.seconds, span.name)
+        if span.failed:
+            HANDLER_FAILURES.inc(span.name)
+
+    async def _begin(self, update: Update, context: Any) -> None:
+        user = update.effective_user
+        begin_trace(update.update_id, user.id if user else None)
+
+    async def _end(self, update: Update, context: Any) -> None:
+        trace = end_trace()
+        if trace is None:
+            return
+        elapsed = trace.elapsed
+        self._record(HandlerSpan(UPDATE, elapsed, trace.db_statements, trace.api_calls))
+        if self.slow_update_ms and elapsed * 1000 >= self.slow_update_ms:
+            self.slow_updates += 1
+            logger.warning("Slow update %s", format_trace(trace, elapsed))
+
+    def running(self) -> List[str]:
+        """``handler (update_id=…, 1234ms)`` for every call in progress, longest-running first."""
+        now = time.perf_counter()
+        calls = sorted(tuple(self.in_flight.values()), key=lambda call: call[2])
+        return [f"{name} (update_id={update_id}, {(now - started) * 1000:.0f}ms)" for name, update_id, started in calls]
+
+    def report(self, limit: int = 10) -> List[Tuple[str, Dict[str, float]]]:
+        """Handlers by p95, slowest first; the whole-update row comes first."""
+        rows = [(name, window.summary()) for name, window in self.handlers.items()]
+        rows.sort(key=lambda row: (row[0] != UPDATE, -row[1]["p95_ms"]))
+        return rows[: limit + 1]
+
+
+def format_trace(trace: UpdateTrace, elapsed: Optional[float] = None) -> str:
+    elapsed = trace.elapsed if elapsed is None else elapsed
+    spans = "; ".join(
+        f"{s.name} {s.seconds * 1000:.0f}ms db={s.db_statements} api={s.api_calls}{' failed' if s.failed else ''}"
+        for s in trace.spans
+    )
+    return (
+        f"update_id={trace.update_id} user_id={trace.user_id}: {elapsed * 1000:.0f}ms, "
+        f"db={trace.db_statements} ({trace.db_seconds * 1000:.0f}ms), "
+        f"api={trace.api_calls} ({trace.api_seconds * 1000:.0f}ms) [{spans or 'no handler'}]"
+    )
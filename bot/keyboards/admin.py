@@ -1,5 +1,7 @@
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
+from ..constants import EXPORT_FORMATS, FORMAT_LABELS
+
 
 def admin_panel_kb():
     return InlineKeyboardMarkup(
@@ -17,6 +19,7 @@ def admin_panel_kb():
             [InlineKeyboardButton("👤 Роли", callback_data="admin_roles")],
             [InlineKeyboardButton("➕ Добавить админа", callback_data="admin_add_admin")],
             [InlineKeyboardButton("🔄 Обновить шаблоны", callback_data="admin_reload")],
+            [InlineKeyboardButton("⚡ Перезагрузка без остановки", callback_data="admin_soft_reload")],
             [InlineKeyboardButton("♻️ Перезапуск", callback_data="admin_restart")],
         ]
     )
@@ -33,3 +36,9 @@ def confirm_keyboard(ok_cb: str, cancel_cb: str):
 
 def cancel_keyboard(cb: str = "adm_node_cancel", text: str = "❌ Отмена") -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup([[InlineKeyboardButton(text, callback_data=cb)]])
+
+
+def export_format_kb(prefix: str) -> InlineKeyboardMarkup:
+    rows = [[InlineKeyboardButton(FORMAT_LABELS[fmt], callback_data=f"{prefix}_{fmt}")] for fmt in EXPORT_FORMATS]
+    rows.append([InlineKeyboardButton("⬅️ Назад", callback_data="admin_panel")])
+    return InlineKeyboardMarkup(rows)
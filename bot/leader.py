@@ -0,0 +1,151 @@
+"""Leader election: only one bot process at a time polls Telegram and runs background work.
+
+A supervisor respawn racing a still-stopping process, or a second copy started by hand, would
+otherwise poll the same token, get 409 Conflicts and send broadcasts twice. Every process takes
+a lease row in the shared SQLite database before starting the application. The holder renews it
+every ``heartbeat`` seconds; the others wait as standbys and take over once the lease expires
+(``ttl`` seconds after the leader's last heartbeat) or is released on a clean shutdown.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Awaitable, Callable, Optional
+
+from telegram.ext import Application
+
+from .config import Config
+from .lifecycle import install_stop_signals
+from .storage.db import Database
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = "ingress"
+
+Runner = Callable[[Application, Config, asyncio.Event], Awaitable[Optional[int]]]
+
+
+class LeaderLease:
+    def __init__(self, db: Database, ttl: float = 10, heartbeat: Optional[float] = None, name: str = LEASE_NAME):
+        self.db = db
+        self.ttl = ttl
+        self.heartbeat = heartbeat if heartbeat is not None else max(ttl / 4, 0.05)
+        self.name = name
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self.lost = False
+        self.acquired_at: Optional[float] = None
+
+    async def try_acquire(self) -> bool:
+        """Take or renew the lease; one atomic upsert, so two processes can never both win."""
+        now = time.time()
+        async with self.db.transaction() as conn:
+            cursor = await conn.execute(
+                """
+                INSERT INTO leader_lease (name, holder, expires_at, acquired_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                    holder = excluded.holder,
+                    expires_at = excluded.expires_at,
+                    acquired_at = CASE WHEN leader_lease.holder = excluded.holder
+                                       THEN leader_lease.acquired_at ELSE excluded.acquired_at END
+                WHERE leader_lease.holder = excluded.holder OR leader_lease.expires_at < ?
+                """,
+                (self.name, self.holder, now + self.ttl, now, now),
+            )
+            won = cursor.rowcount == 1
+        if won and not self.is_leader:
+            self.acquired_at = now
+        self.is_leader = won
+        return won
+
+    async def current_holder(self) -> Optional[str]:
+        row = await self.db.fetchone(
+            "SELECT holder FROM leader_lease WHERE name = ? AND expires_at >= ?", (self.name, time.time())
+        )
+        return row["holder"] if row else None
+
+    async def release(self) -> None:
+        """Hand over immediately instead of making standbys wait for the expiry."""
+        if not self.is_leader:
+            return
+        self.is_leader = False
+        try:
+            await self.db.execute("DELETE FROM leader_lease WHERE name = ? AND holder = ?", (self.name, self.holder))
+        except Exception:
+            logger.exception("Failed to release the leader lease; standbys take over after %ss", self.ttl)
+
+    async def wait_for_leadership(self, stop: asyncio.Event) -> bool:
+        """Block as a standby until elected; False when ``stop`` was set first."""
+        announced = False
+        while not stop.is_set():
+            if await self.try_acquire():
+                return True
+            if not announced:
+                logger.info("Standby: lease is held by %s", await self.current_holder())
+                announced = True
+            await _wait(stop, self.heartbeat)
+        return False
+
+    async def keep_alive(self, stop: asyncio.Event) -> None:
+        """Renew until ``stop``; on losing the lease set ``lost`` and ``stop`` so this process steps down."""
+        last_renewed = time.monotonic()
+        while not stop.is_set():
+            await _wait(stop, self.heartbeat)
+            if stop.is_set():
+                return
+            try:
+                if await self.try_acquire():
+                    last_renewed = time.monotonic()
+                    continue
+                logger.error("Leader lease taken over by %s, stepping down", await self.current_holder())
+            except Exception:
+                # A busy database is not a reason to step down yet: the lease is still ours until expiry.
+                logger.exception("Leader lease renewal failed")
+                if time.monotonic() - last_renewed < self.ttl:
+                    continue
+                logger.error("Leader lease expired without renewal, stepping down")
+            self.is_leader = False
+            self.lost = True
+            stop.set()
+            return
+
+
+async def _wait(stop: asyncio.Event, seconds: float) -> None:
+    try:
+        await asyncio.wait_for(stop.wait(), seconds)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def run_with_leadership(app: Application, config: Config, runner: Runner) -> int:
+    """Wait for the lease, run ``runner`` while holding it; returns the process exit code."""
+    stop = asyncio.Event()
+    install_stop_signals(stop)
+    db: Database = app.bot_data["db"]
+    # The lease table has to exist before the leader's first bootstrap; init_db is a no-op when current.
+    await db.init_db()
+    lease = LeaderLease(db, ttl=config.leader_lease_ttl)
+    app.bot_data["leader_lease"] = lease
+    if not await lease.wait_for_leadership(stop):
+        await db.close()
+        return 0
+    logger.info("Elected leader (%s)", lease.holder)
+
+    heartbeat = asyncio.create_task(lease.keep_alive(stop))
+    try:
+        result = await runner(app, config, stop)
+    finally:
+        heartbeat.cancel()
+        await asyncio.gather(heartbeat, return_exceptions=True)
+        # The runner has stopped polling by now, so handing over cannot overlap two pollers.
+        await lease.release()
+        await db.close()
+    if lease.lost:
+        # Let the supervisor restart this process as a fresh standby.
+        return config.restart_exit_code
+    return result or 0
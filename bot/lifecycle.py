@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import asyncio
+import signal
+
+from typing import Optional
+
+from telegram.ext import Application
+
+
+def install_stop_signals(stop: asyncio.Event) -> None:
+    """SIGINT/SIGTERM set ``stop`` instead of killing the loop mid-update."""
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+
+
+async def start_application(app: Application) -> None:
+    """The part of ``Application.run_polling`` before updates start flowing, without the updater."""
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    await app.start()
+
+
+async def run_polling(app: Application, stop: Optional[asyncio.Event] = None) -> None:
+    """``Application.run_polling`` on the caller's event loop, stopped by ``stop`` or SIGINT/SIGTERM."""
+    if stop is None:
+        stop = asyncio.Event()
+        install_stop_signals(stop)
+    try:
+        await start_application(app)
+        await app.updater.start_polling()
+        await stop.wait()
+    finally:
+        await stop_application(app)
+
+
+async def stop_application(app: Application) -> None:
+    if app.updater and app.updater.running:
+        await app.updater.stop()
+    if app.running:
+        await app.stop()
+    if app.post_stop:
+        await app.post_stop(app)
+    await app.shutdown()
+    if app.post_shutdown:
+        await app.post_shutdown(app)
@@ -1,29 +1,104 @@
+"""Logging setup for the whole project.
+
+By default records are not written on the calling thread: a ``QueueHandler`` puts them on a queue
+and a ``QueueListener`` thread formats them and writes to stdout and the rotating file. A slow
+disk, a rotation or a full stdout pipe (journald, docker) then delays the listener, not the event
+loop. ``LOG_FORMAT=json`` writes one JSON object per line with the ids of the update being handled.
+"""
+
 from __future__ import annotations
 
+import atexit
+import copy
+import json
 import logging
 import os
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from typing import Optional
 
+from .utils.tracing import current_correlation_id, current_trace
 
 logger = logging.getLogger("bot")
 
+LOG_FORMATS = ("text", "json")
+TEXT_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+
+# Attributes every LogRecord has; anything else came in through ``extra=`` and goes into the JSON.
+_RECORD_FIELDS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+_CONTEXT_FIELDS = ("update_id", "user_id", "correlation_id")
+
+_listener: Optional[QueueListener] = None
+_atexit_registered = False
+
+
+class ContextFilter(logging.Filter):
+    """Stamps records with the update being handled; must run on the thread that logs."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace = current_trace()
+        record.update_id = trace.update_id if trace else None
+        record.user_id = trace.user_id if trace else None
+        record.correlation_id = current_correlation_id()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created).astimezone().isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key in _CONTEXT_FIELDS:
+                if value is not None:
+                    payload[key] = value
+            elif key not in _RECORD_FIELDS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        if record.stack_info:
+            payload["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock prepare() formats the whole line here, on the logging thread. Only render what
+        # cannot wait (args may be mutated later, exc_info holds frames); the listener formats the rest.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
 
 def setup_logging(
     level: str = "INFO",
     log_file: Optional[str] = None,
     max_bytes: int = 5 * 1024 * 1024,
     backup_count: int = 3,
+    fmt: str = "text",
+    queued: bool = True,
 ) -> logging.Logger:
     """Configure console + rotating file logging for the whole project."""
-    handlers: list[logging.Handler] = [logging.StreamHandler(sys.stdout)]
+    global _listener, _atexit_registered
+    stop_logging()
+    sinks: list[logging.Handler] = [logging.StreamHandler(sys.stdout)]
 
     if log_file:
         log_dir = os.path.dirname(log_file)
         if log_dir:
             os.makedirs(log_dir, exist_ok=True)
-        handlers.append(
+        sinks.append(
             RotatingFileHandler(
                 log_file,
                 maxBytes=max_bytes,
@@ -32,17 +107,44 @@ def setup_logging(
             )
         )
 
-    formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s")
-    for handler in handlers:
+    formatter = JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT)
+    for handler in sinks:
         handler.setFormatter(formatter)
 
+    context = ContextFilter()
+    if queued:
+        records: queue.SimpleQueue = queue.SimpleQueue()
+        front: logging.Handler = _QueueHandler(records)
+        front.addFilter(context)
+        handlers = [front]
+        _listener = QueueListener(records, *sinks, respect_handler_level=True)
+        _listener.start()
+        if not _atexit_registered:
+            # Registered after logging's own shutdown hook, so it runs first and drains the queue.
+            atexit.register(stop_logging)
+            _atexit_registered = True
+    else:
+        for handler in sinks:
+            handler.addFilter(context)
+        handlers = sinks
+
     logging.basicConfig(level=level, handlers=handlers, force=True)
     logging.captureWarnings(True)
 
     logger.setLevel(level)
-    logger.debug("Logging configured (level=%s, file=%s)", level, log_file)
+    logger.debug("Logging configured (level=%s, file=%s, format=%s, queued=%s)", level, log_file, fmt, queued)
     return logger
 
 
-__all__ = ["setup_logging", "logger"]
+def stop_logging() -> None:
+    """Write out queued records and close the sinks. Call before ``os._exit``, which skips atexit."""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is None:
+        return
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
 
+__all__ = ["setup_logging", "stop_logging", "logger", "JsonFormatter", "ContextFilter", "LOG_FORMATS"]
@@ -0,0 +1,199 @@
+"""Event-loop lag probe, stall reports and load shedding.
+
+A task asks to wake up every ``interval`` seconds and measures how late it actually woke up. On
+an idle loop the lag is well under a millisecond; a blocking call (a sync SQLite query, a big
+pandas export, a CPU-heavy handler) shows up as lag, and every other update waits just as long.
+
+While the loop is blocked the probe cannot run, so a watchdog thread watches its heartbeat: once
+a wake-up is ``stall_ms`` overdue it notes the handlers in flight and the loop thread's stack.
+The stall is logged with them when the loop comes back (or right away if it hangs for
+``HANG_SECONDS``), pointing at the code that blocked instead of at whatever ran next.
+
+``LoadShedder`` is opt-in (``LOAD_SHED_LAG_MS``): while the recent lag is above the threshold,
+users get an immediate "busy, try again" reply instead of waiting for a timeout, while
+broadcasts, reminders, exports and statistics are deferred: they wait between steps until the
+loop catches up.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Callable, Deque, List, Optional
+
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, TypeHandler
+
+from .utils.metrics import LOOP_LAG_SECONDS, LOOP_STALLS, SHED_UPDATES
+
+logger = logging.getLogger(__name__)
+
+# Before the update trace opens (-1): a turned-away update is not counted as handled.
+SHED_GROUP = -2
+HANG_SECONDS = 10.0
+STACK_LIMIT = 12
+BUSY_TEXT = "⏳ Бот сейчас перегружен, повторите через минуту."
+
+
+class LoopLagMonitor:
+    def __init__(
+        self,
+        interval: float = 0.5,
+        stall_ms: int = 0,
+        window: int = 10,
+        running: Optional[Callable[[], List[str]]] = None,
+    ):
+        self.interval = interval
+        self.stall_ms = stall_ms
+        self.running = running
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.samples = 0
+        self.stalls = 0
+        # The last ``window`` probes (5s at the default interval): what load shedding looks at.
+        self.recent: Deque[float] = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+        self._expected = 0.0
+        self._loop_thread: Optional[int] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._watchdog_stop = threading.Event()
+        self._stall_detail: Optional[str] = None
+        self._noted_for = 0.0
+        self._hang_logged_for = 0.0
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._loop_thread = threading.get_ident()
+            self._expected = time.perf_counter() + self.interval
+            self._task = asyncio.create_task(self._run(), name="loop-lag-monitor")
+        if self._watchdog is None:
+            self._watchdog_stop.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        if self._watchdog is not None:
+            self._watchdog_stop.set()
+            self._watchdog.join()
+            self._watchdog = None
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            self._expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, time.perf_counter() - self._expected))
+
+    def record(self, lag: float) -> None:
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self.samples += 1
+        self.recent.append(lag)
+        LOOP_LAG_SECONDS.observe(lag)
+        if self.stall_ms and lag * 1000 >= self.stall_ms:
+            self.stalls += 1
+            LOOP_STALLS.inc()
+            detail, self._stall_detail = self._stall_detail, None
+            logger.warning("Event loop stalled for %.0fms; %s", lag * 1000, detail or "no snapshot taken")
+
+    @property
+    def current_lag(self) -> float:
+        """Like ``last_lag``, but also counts a wake-up that is overdue right now."""
+        return max(self.last_lag, time.perf_counter() - self._expected) if self._task is not None else self.last_lag
+
+    @property
+    def recent_lag(self) -> float:
+        return max(max(self.recent, default=0.0), self.current_lag)
+
+    def _watch(self) -> None:
+        while not self._watchdog_stop.wait(self._watch_interval()):
+            if not self.stall_ms:
+                continue
+            expected = self._expected
+            overdue = time.perf_counter() - expected
+            if overdue * 1000 < self.stall_ms:
+                continue
+            if self._noted_for != expected:
+                self._noted_for = expected
+                self._stall_detail = self.describe()
+            if overdue >= HANG_SECONDS and self._hang_logged_for != expected:
+                self._hang_logged_for = expected
+                logger.error("Event loop blocked for %.0fs and counting; %s", overdue, self.describe())
+
+    def _watch_interval(self) -> float:
+        # Reports off: only look again now and then, in case a soft reload turns them on.
+        if not self.stall_ms:
+            return self.interval
+        return min(self.interval, max(self.stall_ms, 50) / 2000)
+
+    def describe(self) -> str:
+        """Handlers in flight and where the loop thread is right now (safe to call from any thread)."""
+        running = self.running() if self.running is not None else []
+        parts = [f"running: {', '.join(running) if running else 'no handler'}"]
+        frame = sys._current_frames().get(self._loop_thread) if self._loop_thread else None  # noqa: SLF001
+        if frame is not None:
+            stack = traceback.format_stack(frame, limit=STACK_LIMIT)
+            parts.append("loop thread at:\n" + "".join(stack).rstrip())
+        return "; ".join(parts)
+
+    def stats(self) -> dict:
+        return {
+            "last_ms": self.last_lag * 1000,
+            "max_ms": self.max_lag * 1000,
+            "samples": self.samples,
+            "stalls": self.stalls,
+        }
+
+
+class LoadShedder:
+    def __init__(self, monitor: LoopLagMonitor, lag_ms: int = 0, max_defer: float = 60.0):
+        self.monitor = monitor
+        self.lag_ms = lag_ms
+        self.max_defer = max_defer
+        self.shed = 0
+        self.deferred = 0
+
+    @property
+    def overloaded(self) -> bool:
+        return bool(self.lag_ms) and self.monitor.recent_lag * 1000 >= self.lag_ms
+
+    def install(self, target: Any) -> None:
+        """Add the gate in front of every handler of ``target`` (an Application or a handler collector)."""
+        target.add_handler(TypeHandler(Update, self.shed_update), group=SHED_GROUP)
+
+    async def shed_update(self, update: Update, context: Any) -> None:
+        if not self.overloaded:
+            return
+        user = update.effective_user
+        config = context.application.bot_data.get("config")
+        # Admins keep full service: they are the ones diagnosing the overload.
+        if user is None or (config is not None and user.id in config.admin_ids):
+            return
+        self.shed += 1
+        SHED_UPDATES.inc()
+        try:
+            if update.callback_query is not None:
+                await update.callback_query.answer(BUSY_TEXT)
+            elif update.effective_message is not None:
+                await update.effective_message.reply_text(BUSY_TEXT)
+        except Exception as exc:  # noqa: BLE001
+            logger.debug("Busy reply to user_id=%s failed: %s", user.id, exc)
+        raise ApplicationHandlerStop
+
+    async def defer(self) -> None:
+        """Hold low-priority bulk work (broadcast sends) while overloaded, ``max_defer`` seconds at most."""
+        if not self.overloaded:
+            return
+        self.deferred += 1
+        deadline = time.perf_counter() + self.max_defer
+        while self.overloaded and time.perf_counter() < deadline:
+            await asyncio.sleep(self.monitor.interval)
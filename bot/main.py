@@ -1,72 +1,140 @@
 from __future__ import annotations
 
+import argparse
+import asyncio
 import logging
+import os
+import sys
 import time
+from typing import Optional
 
 from telegram.ext import Application, ApplicationBuilder
 
 from .config import load_config
-from .constants import Role
-from .handlers import admin as admin_handlers
-from .handlers import content as content_handlers
-from .handlers import events as events_handlers
-from .handlers import menu as menu_handlers
-from .handlers import profile as profile_handlers
-from .handlers import start as start_handlers
+from .handlers import register_handlers
+from .instrumentation import InstrumentedRequest, UpdateInstrumentation
+from .lifecycle import run_polling
 from .logging_config import setup_logging
+from .loop_monitor import LoadShedder, LoopLagMonitor
 from .services.content import ContentService
 from .services.events import EventService
+from .services.exports import ExportService
 from .services.migrations import MigrationService
 from .services.nodes import NodeService
 from .services.profiles import ProfileService
 from .services.restart import RestartService
+from .services.warmup import warm_up
 from .storage.db import Database
+from .storage.persistence import SQLitePersistence
 from .storage.repositories.content import ContentRepository
 from .storage.repositories.events import EventRepository
 from .storage.repositories.nodes import NodeRepository
 from .storage.repositories.registrations import RegistrationRepository
 from .storage.repositories.roles import RoleRepository
 from .storage.repositories.users import UserRepository
-from .utils.errors import PermissionDenied
+from .update_processor import KeyedUpdateProcessor
+from .utils.errors import PermissionDenied, RestartInProgress
+from .utils.startup import StartupProfiler
 
 logger = logging.getLogger(__name__)
 
+# Bump to make the next boot run ContentService/NodeService.ensure_defaults again on existing databases.
+DEFAULTS_VERSION = "1"
+
 
 async def on_startup(app: Application):
     logger.info("Bootstrapping bot...")
     app.bot_data.setdefault("started_at", time.time())
+    profiler: StartupProfiler = app.bot_data.setdefault("startup_profiler", StartupProfiler())
     config = app.bot_data["config"]
-    db: Database = app.bot_data["db"]
 
+    # Worker processes (bot.workers) share a database the ingress process already bootstrapped.
+    if not app.bot_data.get("bootstrap_done"):
+        await _bootstrap_database(app, profiler)
+
+    if "loop_monitor" in app.bot_data:
+        app.bot_data["loop_monitor"].start()
+    if config.metrics_enabled:
+        await _start_metrics(app)
+
+    # post_init runs before polling starts, so the first updates after a restart hit warm caches.
+    if config.warmup_enabled:
+        with profiler.phase("warmup"):
+            steps = await warm_up(app.bot_data, timeout=config.warmup_timeout)
+        for step in steps:
+            profiler.note(f"warmup {step.name}: {step.seconds * 1000:.1f}ms, {step.detail}")
+    logger.info("Startup finished in %.0fms (%s)", profiler.total * 1000, profiler.summary())
+
+
+async def _bootstrap_database(app: Application, profiler: StartupProfiler) -> None:
+    config = app.bot_data["config"]
+    db: Database = app.bot_data["db"]
     try:
-        await db.init_db()
-        logger.info("Database initialized at %s", db.path)
+        with profiler.phase("init_db"):
+            created = await db.init_db()
+        if created:
+            logger.info("Database initialized at %s", db.path)
+        else:
+            profiler.note("schema is current: DDL skipped")
     except Exception:
         logger.exception("Failed to initialize database")
         raise
 
     migrator: MigrationService = app.bot_data["migrator"]
-    try:
-        await migrator.migrate_from_files()
-    except Exception:
-        logger.exception("Migration failed; continuing without legacy import")
+    with profiler.phase("legacy_migration"):
+        try:
+            # Under leader election the lease heartbeat shares the write lock: one transaction for
+            # the whole import would starve it and hand the lease to a standby mid-startup.
+            await migrator.migrate_from_files(atomic=not config.leader_election)
+        except Exception:
+            logger.exception("Migration failed; continuing without legacy import")
 
     content_service: ContentService = app.bot_data["content_service"]
     node_service: NodeService = app.bot_data["node_service"]
-    try:
-        await content_service.ensure_defaults()
-        await node_service.ensure_defaults()
-    except Exception:
-        logger.exception("Failed to ensure default content or nodes")
+    with profiler.phase("defaults"):
+        try:
+            if await db.get_meta("defaults_version") == DEFAULTS_VERSION:
+                profiler.note("defaults already ensured: skipped")
+            else:
+                await content_service.ensure_defaults()
+                await node_service.ensure_defaults()
+                await db.set_meta("defaults_version", DEFAULTS_VERSION)
+        except Exception:
+            logger.exception("Failed to ensure default content or nodes")
 
     profile_service = app.bot_data["profile_service"]
-    for admin_id in config.admin_ids:
-        await profile_service.ensure_user(admin_id, username="", full_name=f"admin-{admin_id}")
-        await profile_service.assign_role(admin_id, Role.ADMIN)
+    with profiler.phase("admin_roles"):
+        granted = await profile_service.ensure_admins(config.admin_ids)
+    for admin_id in granted:
         logger.info("Granted admin role from config to user_id=%s", admin_id)
+    app.bot_data["bootstrap_done"] = True
+
+
+async def _start_metrics(app: Application) -> None:
+    from .metrics import MetricsServer
+
+    config = app.bot_data["config"]
+    port = config.metrics_port
+    worker_index = app.bot_data.get("worker_index")
+    if worker_index is not None:
+        # Every worker process has its own counters: one port each, next to the ingress's.
+        port += 1 + worker_index
+    server = MetricsServer(app, config.metrics_listen, port)
+    try:
+        await server.start()
+    except OSError:
+        logger.exception("Metrics endpoint could not listen on %s:%s; continuing without it", config.metrics_listen, port)
+        return
+    app.bot_data["metrics_server"] = server
 
 
 async def on_shutdown(app: Application):
+    server = app.bot_data.pop("metrics_server", None)
+    if server is not None:
+        await server.stop()
+    monitor = app.bot_data.get("loop_monitor")
+    if monitor is not None:
+        await monitor.stop()
     db: Database = app.bot_data.get("db")
     if db:
         await db.close()
@@ -82,6 +150,8 @@ async def on_error(update, context):
         try:
             if isinstance(err, PermissionDenied):
                 await update.effective_message.reply_text("⛔ Недостаточно прав для этой команды.")
+            elif isinstance(err, RestartInProgress):
+                await update.effective_message.reply_text("⏳ Бот перезапускается, повторите через минуту.")
             else:
                 await update.effective_message.reply_text(
                     "⚠️ Что-то пошло не так. Я уже записал ошибку в лог и попробую работать дальше."
@@ -90,16 +160,28 @@ async def on_error(update, context):
             logger.exception("Failed to send error message to chat_id=%s", chat_id)
 
 
-def build_application() -> Application:
-    config = load_config()
-    setup_logging(
-        config.log_level,
-        log_file=config.log_file,
-        max_bytes=config.log_max_bytes,
-        backup_count=config.log_backup_count,
-    )
+def build_application(
+    profiler: Optional[StartupProfiler] = None,
+    worker_index: Optional[int] = None,
+) -> Application:
+    profiler = profiler or StartupProfiler()
     started_at = time.time()
-    db = Database(config.database_path)
+    with profiler.phase("config"):
+        config = load_config()
+        log_file = config.log_file
+        if log_file and worker_index is not None:
+            # RotatingFileHandler is not multi-process safe: one file per worker.
+            root, ext = os.path.splitext(log_file)
+            log_file = f"{root}.worker{worker_index}{ext}"
+        setup_logging(
+            config.log_level,
+            log_file=log_file,
+            max_bytes=config.log_max_bytes,
+            backup_count=config.log_backup_count,
+            fmt=config.log_format,
+            queued=config.log_queue,
+        )
+    db = Database(config.database_path, slow_query_ms=config.slow_query_ms)
     user_repo = UserRepository(db)
     role_repo = RoleRepository(db)
     event_repo = EventRepository(db)
@@ -111,15 +193,34 @@ def build_application() -> Application:
     event_service = EventService(event_repo, reg_repo)
     content_service = ContentService(content_repo)
     node_service = NodeService(node_repo)
+    export_service = ExportService(user_repo, reg_repo, max_part_bytes=config.export_max_part_bytes)
     migrator = MigrationService(user_repo, role_repo, event_repo, reg_repo, content_repo)
 
-    app = (
-        ApplicationBuilder()
-        .token(config.bot_token)
-        .post_init(on_startup)
-        .post_shutdown(on_shutdown)
-        .build()
-    )
+    with profiler.phase("application"):
+        builder = (
+            ApplicationBuilder()
+            .token(config.bot_token)
+            .concurrent_updates(KeyedUpdateProcessor(config.max_concurrent_updates))
+            # Same pool size ApplicationBuilder picks by default; counts API calls per update.
+            .request(InstrumentedRequest(connection_pool_size=256))
+            .post_init(on_startup)
+            .post_shutdown(on_shutdown)
+        )
+        if config.bot_api_base_url:
+            builder = builder.base_url(config.bot_api_base_url)
+        persistence = None
+        if config.persistence_enabled:
+            persistence = SQLitePersistence(
+                db,
+                flush_interval=config.persistence_flush_interval,
+                idle_ttl=config.persistence_idle_ttl,
+                retention_days=config.persistence_retention_days,
+                conversation_timeout=config.persistence_conversation_timeout,
+            )
+            builder = builder.persistence(persistence)
+        app = builder.build()
+        if persistence is not None:
+            persistence.attach(app)
 
     app.bot_data["config"] = config
     app.bot_data["db"] = db
@@ -127,35 +228,90 @@ def build_application() -> Application:
     app.bot_data["event_service"] = event_service
     app.bot_data["content_service"] = content_service
     app.bot_data["node_service"] = node_service
+    app.bot_data["export_service"] = export_service
     app.bot_data["migrator"] = migrator
     app.bot_data["role_service"] = profile_service  # reuse profile service for role ops
     app.bot_data["restart_service"] = RestartService(
         enabled=config.restart_enabled,
         exit_code=config.restart_exit_code,
+        drain_timeout=config.restart_drain_timeout,
     )
     app.bot_data["started_at"] = started_at
+    app.bot_data["startup_profiler"] = profiler
+    if worker_index is not None:
+        app.bot_data["worker_index"] = worker_index
+        app.bot_data["bootstrap_done"] = True
+
+    instrumentation = UpdateInstrumentation(slow_update_ms=config.slow_update_ms)
+    app.bot_data["instrumentation"] = instrumentation
+    monitor = LoopLagMonitor(stall_ms=config.loop_stall_ms, running=instrumentation.running)
+    app.bot_data["loop_monitor"] = monitor
+    shedder = LoadShedder(monitor, lag_ms=config.load_shed_lag_ms)
+    app.bot_data["load_shedder"] = shedder
 
-    start_handlers.setup_handlers(app)
-    profile_handlers.setup_handlers(app)
-    events_handlers.setup_handlers(app)
-    admin_handlers.setup_handlers(app)
-    content_handlers.setup_handlers(app)
-    menu_handlers.setup_handlers(app)
-    app.add_error_handler(on_error)
+    with profiler.phase("handlers"):
+        register_handlers(app)
+        instrumentation.install(app)
+        shedder.install(app)
+        app.add_error_handler(on_error)
     logger.info(
-        "Bot initialized (log_level=%s, db=%s, admins=%s, restart_enabled=%s)",
+        "Bot initialized (log_level=%s, db=%s, admins=%s, restart_enabled=%s, concurrent_updates=%s)",
         config.log_level,
         config.database_path,
         len(config.admin_ids),
         config.restart_enabled,
+        config.max_concurrent_updates,
     )
     return app
 
 
-def main():
+async def _profile_startup(app: Application) -> None:
+    # Same boot work as run_polling's post_init, minus the network. It writes to the configured
+    # database like a real start: schema, legacy import, defaults and admin roles.
+    profiler: StartupProfiler = app.bot_data["startup_profiler"]
+    # The live bot may already hold the metrics port.
+    app.bot_data["config"].metrics_enabled = False
+    await on_startup(app)
+    await on_shutdown(app)
+    print(profiler.report())
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m bot.main")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="run the startup sequence without polling and print a per-phase timing breakdown",
+    )
+    args = parser.parse_args(argv)
     application = build_application()
+    if args.profile_startup:
+        asyncio.run(_profile_startup(application))
+        return
+    config = application.bot_data["config"]
+    runner = _ingress_runner(config)
+    if config.leader_election:
+        from .leader import run_with_leadership
+
+        sys.exit(asyncio.run(run_with_leadership(application, config, runner)))
+    sys.exit(asyncio.run(runner(application, config, None)))
+
+
+def _ingress_runner(config):
+    """Pick how updates come in; every runner is ``async (app, config, stop) -> exit code | None``."""
+    if config.workers:
+        from .workers import run_sharded
+
+        logger.info("Starting ingress with %s worker processes...", config.workers)
+        return run_sharded
+    if config.webhook_enabled:
+        # Imported here: polling deployments never load the HTTP listener.
+        from .webhook import run_webhook
+
+        logger.info("Starting webhook listener...")
+        return run_webhook
     logger.info("Starting polling...")
-    application.run_polling()
+    return lambda app, _config, stop: run_polling(app, stop)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,108 @@
+"""Optional ``/metrics`` endpoint in the Prometheus text format.
+
+Enabled with ``METRICS_ENABLED=true``; listens on ``METRICS_LISTEN:METRICS_PORT`` (worker N of
+``WORKERS`` mode on ``METRICS_PORT + 1 + N``). Two kinds of series are exported:
+
+- recorded as things happen (``bot.utils.metrics.REGISTRY``): update and handler latency, SQL
+  statement time, Bot API time with 429/error counts, pending broadcast messages, loop lag;
+- read from live objects at scrape time: update processor queue, cache hit/miss counters,
+  persistence backlog, running heavy jobs.
+
+Scraping renders a few hundred lines from in-memory counters: nothing touches the database or
+the Bot API, so leaving it on in production is cheap.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import List
+
+from telegram.ext import Application
+
+from .utils.http import HttpRequest, HttpResponse, HttpServer
+from .utils.metrics import REGISTRY, format_samples
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+CACHED_SERVICES = ("event_service", "node_service", "profile_service")
+
+
+class MetricsServer:
+    def __init__(self, application: Application, host: str = "127.0.0.1", port: int = 9101):
+        self.application = application
+        self.http = HttpServer(host, port)
+        self.http.add_route("GET", "/metrics", self._metrics)
+
+    @property
+    def port(self) -> int:
+        return self.http.port
+
+    async def start(self) -> None:
+        await self.http.start()
+
+    async def stop(self) -> None:
+        await self.http.stop()
+
+    async def _metrics(self, request: HttpRequest) -> HttpResponse:
+        return HttpResponse(body=render_metrics(self.application).encode("utf-8"), content_type=CONTENT_TYPE)
+
+
+def render_metrics(application: Application) -> str:
+    return "\n".join(REGISTRY.render() + _live_samples(application)) + "\n"
+
+
+def _single(name: str, kind: str, help_text: str, value: float) -> List[str]:
+    return format_samples(name, kind, help_text, (), [((), value)])
+
+
+def _live_samples(application: Application) -> List[str]:
+    bot_data = application.bot_data
+    lines: List[str] = []
+    started_at = bot_data.get("started_at")
+    if started_at:
+        lines += _single("bot_start_time_seconds", "gauge", "Unix time the process started.", started_at)
+
+    processor = getattr(application, "update_processor", None)
+    if processor is not None and hasattr(processor, "stats"):
+        stats = processor.stats()
+        lines += _single("bot_updates_processed_total", "counter", "Updates fully handled.", stats["processed"])
+        lines += format_samples(
+            "bot_updates_in_flight",
+            "gauge",
+            "Updates admitted to the processor: running, or waiting for a slot or their user's lock.",
+            ("state",),
+            [(("active",), stats["active"]), (("pending",), stats["pending"])],
+        )
+    lines += _single(
+        "bot_update_queue_size", "gauge", "Updates received but not picked up yet.", application.update_queue.qsize()
+    )
+
+    caches = [(name, bot_data[name].cache_stats()) for name in CACHED_SERVICES if name in bot_data]
+    for field, help_text in (("hits", "In-process cache hits."), ("misses", "In-process cache misses.")):
+        samples = [((name,), stats[field]) for name, stats in caches]
+        lines += format_samples(f"bot_cache_{field}_total", "counter", help_text, ("cache",), samples)
+
+    persistence = getattr(application, "persistence", None)
+    if persistence is not None and hasattr(persistence, "stats"):
+        stats = persistence.stats()
+        lines += _single("bot_persistence_pending_rows", "gauge", "Rows waiting for the next flush.", stats["pending"])
+        lines += _single("bot_persistence_flushes_total", "counter", "Persistence flushes.", stats["flushes"])
+
+    restart_service = bot_data.get("restart_service")
+    if restart_service is not None:
+        running = len(restart_service.active_jobs())
+        lines += _single("bot_heavy_jobs_running", "gauge", "Running broadcasts, reminders and exports.", running)
+
+    monitor = bot_data.get("loop_monitor")
+    if monitor is not None:
+        lines += _single(
+            "bot_event_loop_lag_last_seconds", "gauge", "Lag of the latest or the overdue probe.", monitor.current_lag
+        )
+        lines += _single("bot_event_loop_lag_max_seconds", "gauge", "Worst lag since start.", monitor.max_lag)
+    shedder = bot_data.get("load_shedder")
+    if shedder is not None:
+        lines += _single(
+            "bot_load_shedding_active", "gauge", "1 while updates are turned away as busy.", int(shedder.overloaded)
+        )
+    return lines
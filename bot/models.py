@@ -43,6 +43,19 @@ class Registration:
     reg_time: str = field(default_factory=utcnow_str)
 
 
+@dataclass
+class EventCard:
+    """What the event card shows: the event, its active registrations and the viewer's registration."""
+
+    event: Event
+    taken: int
+    registration: Optional[Registration] = None
+
+    @property
+    def free(self) -> int:
+        return max(0, self.event.max_seats - self.taken)
+
+
 @dataclass
 class ContentSection:
     key: str
@@ -1,14 +1,23 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from uuid import uuid4
 
 from ..logging_config import logger
-from ..models import Event, Registration
+from ..models import Event, EventCard, Registration
+from ..utils.cache import TTLCache
 from ..utils.errors import ValidationError
 from ..utils.validators import parse_int
 
+# The catalog changes only through this service (which invalidates it); the TTL covers imports
+# done by other processes such as the CLI.
+EVENT_CATALOG_TTL = 60
+# Seat counts on event cards may lag this much behind; registering itself always checks live.
+# Registrations do not invalidate it: in multi-process mode an invalidation flushes every cache.
+EVENT_CARD_TTL = 5
+MY_REGISTRATIONS_PAGE = 10
+
 
 def _parse_datetime(dt: str) -> datetime:
     try:
@@ -18,22 +27,48 @@ def _parse_datetime(dt: str) -> datetime:
 
 
 class EventService:
-    def __init__(self, event_repo, reg_repo):
+    def __init__(self, event_repo, reg_repo, cache_ttl: float = EVENT_CATALOG_TTL, card_ttl: float = EVENT_CARD_TTL):
         self.event_repo = event_repo
         self.reg_repo = reg_repo
+        self._cache = TTLCache(ttl=cache_ttl, maxsize=1)
+        # event_id -> (Event, active registrations): the part of the card that is the same for everyone.
+        self._cards = TTLCache(ttl=card_ttl, maxsize=1024)
 
     @staticmethod
     def _is_active_reg_status(status: str) -> bool:
         return status not in ("cancelled", "canceled")
 
+    def invalidate_cache(self) -> None:
+        self._cache.invalidate()
+        self._cards.invalidate()
+
+    def cache_stats(self) -> Dict[str, int]:
+        catalog, cards = self._cache.stats(), self._cards.stats()
+        return {key: catalog[key] + cards[key] for key in catalog}
+
     async def list_active_events(self) -> List[Event]:
-        events = await self.event_repo.list_events()
+        events = self._cache.get("catalog")
+        if events is None:
+            events = await self.event_repo.list_events()
+            self._cache.set("catalog", events)
+        # Filter on every call: an event drops out of the list the minute it starts, cache or not.
         now = datetime.now()
         return [e for e in events if _parse_datetime(e.datetime_str) > now]
 
     async def get_event(self, event_id: str) -> Optional[Event]:
         return await self.event_repo.get(event_id)
 
+    async def get_event_card(self, event_id: str, user_id: int) -> Optional[EventCard]:
+        """Everything ``view_event`` shows; one statement, and only the user's registration on a cache hit."""
+        shared = self._cards.get(event_id)
+        if shared is not None:
+            event, taken = shared
+            return EventCard(event=event, taken=taken, registration=await self.reg_repo.get(user_id, event_id))
+        card = await self.event_repo.get_card(event_id, user_id)
+        if card is not None:
+            self._cards.set(event_id, (card.event, card.taken))
+        return card
+
     async def add_event(self, name: str, datetime_str: str, description: str, seats: int) -> Event:
         _parse_datetime(datetime_str)
         if seats <= 0:
@@ -47,6 +82,7 @@ class EventService:
             max_seats=seats,
         )
         await self.event_repo.add(event)
+        self.invalidate_cache()
         logger and logger.info("Event created id=%s name=%s seats=%s", event_id, event.name, seats)
         return event
 
@@ -69,28 +105,34 @@ class EventService:
         else:
             raise ValidationError("Неверное поле для обновления.")
         await self.event_repo.update(event)
+        self.invalidate_cache()
         logger and logger.info("Event %s field %s updated", event_id, field)
         return event
 
     async def delete_event(self, event_id: str):
         await self.event_repo.delete(event_id)
         await self.reg_repo.delete_by_event(event_id)
+        self.invalidate_cache()
         logger and logger.info("Event %s deleted", event_id)
 
-    async def register_user(self, user_id: int, event_id: str) -> Registration:
+    async def _refusal(self, user_id: int, event_id: str) -> ValidationError:
+        """Why ``claim_seat`` refused: only looked up on that path, registering stays one statement."""
         existing = await self.reg_repo.get(user_id, event_id)
-        if existing:
-            raise ValidationError("Вы уже записаны на это событие.")
-        event = await self.get_event(event_id)
-        if not event:
-            raise ValidationError("Событие не найдено.")
-        regs = await self.reg_repo.list_by_event(event_id)
-        active_regs = [r for r in regs if self._is_active_reg_status(r.status)]
-        if len(active_regs) >= event.max_seats:
-            raise ValidationError("Свободных мест нет.")
-        reg = Registration(id=None, user_id=user_id, event_id=event_id, status="registered")
-        reg_id = await self.reg_repo.create(reg)
-        reg.id = reg_id
+        if existing and self._is_active_reg_status(existing.status):
+            return ValidationError("Вы уже записаны на это событие.")
+        if not await self.get_event(event_id):
+            return ValidationError("Событие не найдено.")
+        return ValidationError("Свободных мест нет.")
+
+    async def _take_seat(self, user_id: int, event_id: str, status: str) -> Registration:
+        reg = Registration(id=None, user_id=user_id, event_id=event_id, status=status)
+        if not await self.reg_repo.claim_seat(reg):
+            raise await self._refusal(user_id, event_id)
+        return await self.reg_repo.get(user_id, event_id)  # type: ignore[return-value]
+
+    async def register_user(self, user_id: int, event_id: str) -> Registration:
+        # A cancelled registration comes back to life here, subject to the same seat check.
+        reg = await self._take_seat(user_id, event_id, "registered")
         logger and logger.info("User %s registered for event %s", user_id, event_id)
         return reg
 
@@ -98,17 +140,28 @@ class EventService:
         reg = await self.reg_repo.get(user_id, event_id)
         if not reg:
             raise ValidationError("Регистрация не найдена.")
-        await self.reg_repo.update_status(reg.id, "confirmed")  # type: ignore[arg-type]
+        if reg.status == "confirmed":
+            return reg
+        active = self._is_active_reg_status(reg.status)
+        if active and await self.reg_repo.set_status_if_active(reg.id, "confirmed"):  # type: ignore[arg-type]
+            reg = await self.reg_repo.get(user_id, event_id)  # type: ignore[assignment]
+        else:
+            # Cancelled, maybe a moment ago: confirming takes a seat again, if one is free.
+            reg = await self._take_seat(user_id, event_id, "confirmed")
         logger and logger.info("User %s confirmed event %s", user_id, event_id)
-        return await self.reg_repo.get(user_id, event_id)  # type: ignore[return-value]
+        return reg  # type: ignore[return-value]
 
     async def confirm_or_register(self, user_id: int, event_id: str) -> Registration:
         reg = await self.reg_repo.get(user_id, event_id)
-        if not reg:
-            reg = await self.register_user(user_id, event_id)
-        if reg.status != "confirmed":
-            reg = await self.confirm_registration(user_id, event_id)
-        return reg
+        if reg is None:
+            new = Registration(id=None, user_id=user_id, event_id=event_id, status="confirmed")
+            if await self.reg_repo.claim_seat(new):
+                logger and logger.info("User %s registered and confirmed event %s", user_id, event_id)
+                return await self.reg_repo.get(user_id, event_id)  # type: ignore[return-value]
+            # Refused, or a concurrent request created the registration first.
+            if await self.reg_repo.get(user_id, event_id) is None:
+                raise await self._refusal(user_id, event_id)
+        return await self.confirm_registration(user_id, event_id)
 
     async def cancel_registration(self, user_id: int, event_id: str) -> Registration:
         reg = await self.reg_repo.get(user_id, event_id)
@@ -129,5 +182,14 @@ class EventService:
             return regs
         return [r for r in regs if self._is_active_reg_status(r.status)]
 
+    async def list_upcoming_registrations(
+        self, user_id: int, after_event_id: Optional[str] = None, limit: int = MY_REGISTRATIONS_PAGE
+    ) -> Tuple[List[Tuple[Registration, Event]], Optional[str]]:
+        """A page of the user's active registrations for events not started yet, and the cursor of the next one."""
+        now = datetime.now().strftime("%Y-%m-%d %H:%M")
+        rows = await self.reg_repo.list_upcoming_by_user(user_id, now, after_event_id, limit + 1)
+        next_cursor = rows[limit - 1][1].event_id if len(rows) > limit else None
+        return rows[:limit], next_cursor
+
     async def list_registrations(self, event_id: str) -> List[Registration]:
         return await self.reg_repo.list_by_event(event_id)
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import asyncio
+import csv
+import gzip
+import io
+import json
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List
+
+from ..constants import EXPORT_FORMATS
+from ..logging_config import logger
+from ..utils.errors import ValidationError
+
+FORMAT_EXTENSIONS = {
+    "xlsx": "xlsx",
+    "csv": "csv.gz",
+    "jsonl": "jsonl",
+}
+
+REGISTRATION_COLUMNS = ["event_id", "event_name", "user_id", "full_name", "email", "status", "reg_time"]
+USER_COLUMNS = ["user_id", "username", "full_name", "email", "consent", "consent_time"]
+
+# Telegram bots may upload documents up to 50 MB; keep headroom for multipart overhead.
+DEFAULT_MAX_PART_BYTES = 45 * 1024 * 1024
+# xlsx size is only known once rendered: parts are cut by row count, assuming a generous size per
+# row, and a part that still comes out too big is rendered again as two halves.
+XLSX_ROW_BYTES = 200
+# A sheet holds 1,048,576 rows including the header.
+XLSX_MAX_ROWS = 1_000_000
+
+
+@dataclass
+class ExportPart:
+    filename: str
+    data: io.BytesIO
+    rows: int
+
+    @property
+    def size(self) -> int:
+        return len(self.data.getbuffer())
+
+
+class _PartBuffer:
+    """One output file being filled; CSV parts are gzip-compressed on the fly."""
+
+    def __init__(self, fmt: str, columns: List[str]):
+        self.fmt = fmt
+        self.columns = columns
+        self.raw = io.BytesIO()
+        self.rows = 0
+        # Uncompressed bytes written since the last gzip flush (an upper bound for their output).
+        self._pending = 0
+        self._gzip = gzip.GzipFile(fileobj=self.raw, mode="wb", compresslevel=6) if fmt == "csv" else None
+        if self._gzip is not None:
+            self._write(_encode_csv([columns]))
+
+    def _write(self, chunk: bytes) -> None:
+        if self._gzip is not None:
+            self._gzip.write(chunk)
+            self._pending += len(chunk)
+        else:
+            self.raw.write(chunk)
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        if self.fmt == "csv":
+            chunk = _encode_csv([[row.get(col) for col in self.columns] for row in rows])
+        else:
+            chunk = "".join(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in rows).encode("utf-8")
+        self._write(chunk)
+        self.rows += len(rows)
+
+    def exceeds(self, limit: int) -> bool:
+        emitted = len(self.raw.getbuffer())
+        if self._gzip is None:
+            return emitted >= limit
+        if emitted + self._pending < limit:
+            return False
+        # Only sync-flush zlib when the part may really be full: flushing every batch
+        # would cost compression ratio for no benefit.
+        self._gzip.flush()
+        self._pending = 0
+        return len(self.raw.getbuffer()) >= limit
+
+    def close(self) -> io.BytesIO:
+        if self._gzip is not None:
+            self._gzip.close()
+        self.raw.seek(0)
+        return self.raw
+
+
+class ExportService:
+    def __init__(self, user_repo, reg_repo, max_part_bytes: int = DEFAULT_MAX_PART_BYTES, batch_size: int = 2000):
+        self.user_repo = user_repo
+        self.reg_repo = reg_repo
+        self.max_part_bytes = max_part_bytes
+        self.batch_size = batch_size
+
+    async def export_registrations(self, fmt: str) -> List[ExportPart]:
+        rows = self.reg_repo.iter_export_rows(batch_size=self.batch_size)
+        return await self._export(rows, fmt, "registrations", REGISTRATION_COLUMNS)
+
+    async def export_users(self, fmt: str) -> List[ExportPart]:
+        rows = self.user_repo.iter_export_rows(batch_size=self.batch_size)
+        return await self._export(rows, fmt, "users", USER_COLUMNS)
+
+    async def _export(
+        self,
+        batches: AsyncIterator[List[Dict[str, Any]]],
+        fmt: str,
+        name: str,
+        columns: List[str],
+    ) -> List[ExportPart]:
+        if fmt not in EXPORT_FORMATS:
+            raise ValidationError(f"Неизвестный формат экспорта: {fmt}")
+        if fmt == "xlsx":
+            parts = await self._export_xlsx(batches, name, columns)
+        else:
+            parts = await self._export_streamed(batches, fmt, name, columns)
+        logger and logger.info(
+            "Export %s format=%s rows=%s parts=%s bytes=%s",
+            name,
+            fmt,
+            sum(p.rows for p in parts),
+            len(parts),
+            sum(p.size for p in parts),
+        )
+        return parts
+
+    async def _export_streamed(
+        self,
+        batches: AsyncIterator[List[Dict[str, Any]]],
+        fmt: str,
+        name: str,
+        columns: List[str],
+    ) -> List[ExportPart]:
+        finished: List[tuple[io.BytesIO, int]] = []
+        current = _PartBuffer(fmt, columns)
+        async for rows in batches:
+            current.write(rows)
+            if self.max_part_bytes and current.exceeds(self.max_part_bytes):
+                finished.append((current.close(), current.rows))
+                current = _PartBuffer(fmt, columns)
+        if current.rows or not finished:
+            finished.append((current.close(), current.rows))
+
+        return _named_parts(finished, name, FORMAT_EXTENSIONS[fmt])
+
+    async def _export_xlsx(
+        self,
+        batches: AsyncIterator[List[Dict[str, Any]]],
+        name: str,
+        columns: List[str],
+    ) -> List[ExportPart]:
+        per_part = XLSX_MAX_ROWS
+        if self.max_part_bytes:
+            per_part = max(1, min(per_part, self.max_part_bytes // XLSX_ROW_BYTES))
+        finished: List[tuple[io.BytesIO, int]] = []
+        pending: List[Dict[str, Any]] = []
+        async for rows in batches:
+            pending.extend(rows)
+            while len(pending) >= per_part:
+                finished += await self._render_xlsx_parts(pending[:per_part], name, columns)
+                pending = pending[per_part:]
+        if pending or not finished:
+            finished += await self._render_xlsx_parts(pending, name, columns)
+        return _named_parts(finished, name, FORMAT_EXTENSIONS["xlsx"])
+
+    async def _render_xlsx_parts(
+        self, data: List[Dict[str, Any]], name: str, columns: List[str]
+    ) -> List[tuple[io.BytesIO, int]]:
+        # openpyxl is CPU-bound and slow on big sheets: keep the event loop responsive.
+        buffer = await asyncio.to_thread(_render_xlsx, data, name, columns)
+        if self.max_part_bytes and len(buffer.getbuffer()) > self.max_part_bytes and len(data) > 1:
+            half = len(data) // 2
+            return await self._render_xlsx_parts(data[:half], name, columns) + await self._render_xlsx_parts(
+                data[half:], name, columns
+            )
+        return [(buffer, len(data))]
+
+
+def _named_parts(finished: List[tuple[io.BytesIO, int]], name: str, ext: str) -> List[ExportPart]:
+    if len(finished) == 1:
+        data, count = finished[0]
+        return [ExportPart(filename=f"{name}.{ext}", data=data, rows=count)]
+    return [
+        ExportPart(filename=f"{name}.part{idx:03d}.{ext}", data=data, rows=count)
+        for idx, (data, count) in enumerate(finished, start=1)
+    ]
+
+
+def _encode_csv(values: List[List[Any]]) -> bytes:
+    text = io.StringIO()
+    csv.writer(text).writerows(values)
+    return text.getvalue().encode("utf-8")
+
+
+def _render_xlsx(data: List[Dict[str, Any]], sheet_name: str, columns: List[str]) -> io.BytesIO:
+    # Heavy dependency: import lazily to keep bot startup fast on weak VPS.
+    import pandas as pd
+
+    df = pd.DataFrame(data, columns=columns)
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False, sheet_name=sheet_name)
+    buffer.seek(0)
+    return buffer
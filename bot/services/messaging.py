@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from typing import List
+from functools import lru_cache
+from typing import List, Tuple
 
 from telegram import ReplyKeyboardMarkup
 from telegram.ext import ContextTypes
@@ -22,22 +23,30 @@ BASE_MENU_ITEMS: List[tuple[str, str]] = [
 
 
 def build_main_keyboard(menu_items: List[tuple[str, str]], show_admin: bool) -> ReplyKeyboardMarkup:
+    return _main_keyboard(tuple(menu_items), show_admin)
+
+
+@lru_cache(maxsize=32)
+def _main_keyboard(menu_items: Tuple[tuple[str, str], ...], show_admin: bool) -> ReplyKeyboardMarkup:
+    # Markups are immutable once built, so every chat can share the same instance.
     buttons = [[title] for _, title in menu_items]
     if show_admin:
         buttons.append([ADMIN_BUTTON_TEXT])
     return ReplyKeyboardMarkup(buttons, resize_keyboard=True, one_time_keyboard=False)
 
 
+async def main_menu_items(node_service) -> List[tuple[str, str]]:
+    menu_nodes = await node_service.get_main_menu_nodes()
+    return BASE_MENU_ITEMS + [(n.key or str(n.id), n.title) for n in menu_nodes]
+
+
 async def send_main_menu(context: ContextTypes.DEFAULT_TYPE, chat_id: int, text: str = DEFAULT_MENU_TEXT):
     node_service = context.application.bot_data["node_service"]
     role_service = context.application.bot_data["role_service"]
 
-    menu_nodes = await node_service.get_main_menu_nodes()
-    node_items = [(n.key or str(n.id), n.title) for n in menu_nodes]
-
     role = await role_service.get_role(chat_id)
     keyboard = build_main_keyboard(
-        menu_items=BASE_MENU_ITEMS + node_items,
+        menu_items=await main_menu_items(node_service),
         show_admin=role in (Role.ADMIN, Role.MODERATOR),
     )
     await context.bot.send_message(chat_id=chat_id, text=text, reply_markup=keyboard)
@@ -1,16 +1,25 @@
 from __future__ import annotations
 
+import asyncio
+import concurrent.futures
+import contextlib
 import json
 import os
+import threading
+import time
 from datetime import datetime
+from typing import Any, AsyncIterable, Dict, Iterator, List
 
-from ..constants import Role
 from ..logging_config import logger
 from ..models import ContentSection, Event, MenuItem, Registration, Template, User
 
+LEGACY_CHUNK_SIZE = 5000
+
 
 class MigrationService:
-    def __init__(self, user_repo, role_repo, event_repo, reg_repo, content_repo):
+    def __init__(self, user_repo, role_repo, event_repo, reg_repo, content_repo, chunk_size: int = LEGACY_CHUNK_SIZE):
+        self.db = event_repo.db
+        self.chunk_size = chunk_size
         self.user_repo = user_repo
         self.role_repo = role_repo
         self.event_repo = event_repo
@@ -44,87 +53,55 @@ class MigrationService:
         events_file: str = "events.xlsx",
         registrations_file: str = "registrations.xlsx",
         users_file: str = "bot_users.json",
-    ):
+        force: bool = False,
+        atomic: bool = True,
+    ) -> bool:
+        """Import legacy files; returns True when data was imported without errors.
+
+        ``atomic=False`` commits every chunk separately: slower, but keeps write locks short
+        when importing into a database a running bot is using.
+        """
         marker = self._migration_marker_path()
         legacy_files = [events_file, registrations_file, users_file]
         if not any(os.path.exists(path) for path in legacy_files):
-            return
-        if not self._legacy_files_changed(marker, legacy_files):
-            return
-
-        # Heavy dependency: import lazily to keep bot startup fast on weak VPS.
-        import pandas as pd
+            return False
+        if not force and not self._legacy_files_changed(marker, legacy_files):
+            return False
 
         logger and logger.info("Starting migration from legacy files...")
-        had_errors = False
-
+        started = time.monotonic()
+        # All files are parsed in parallel worker threads while rows are written in FK order
+        # (users -> events -> registrations); bounded queues keep memory flat.
+        readers: Dict[str, _ChunkPrefetcher] = {}
         if os.path.exists(users_file):
-            try:
-                with open(users_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                for uid_str, info in data.items():
-                    user_id = int(uid_str)
-                    user = User(
-                        user_id=user_id,
-                        username=info.get("username", ""),
-                        full_name=info.get("name", ""),
-                        email=info.get("email", ""),
-                        consent=False,
-                        consent_time=None,
-                        created_at=info.get("first_seen"),
-                        updated_at=info.get("first_seen"),
-                    )
-                    await self.user_repo.upsert_user(user.user_id, user.username, user.full_name)
-                    await self.user_repo.set_email(user.user_id, user.email)
-                    await self.role_repo.set_role(user.user_id, Role.USER)
-                logger and logger.info("Users migrated: %s", len(data))
-            except Exception as exc:
-                had_errors = True
-                logger and logger.error("Failed to migrate users: %s", exc)
-
+            readers["users"] = _ChunkPrefetcher(_iter_json_chunks(users_file, self.chunk_size))
         if os.path.exists(events_file):
-            try:
-                df_events = pd.read_excel(events_file)
-                for _, row in df_events.iterrows():
-                    event = Event(
-                        event_id=str(row["event_id"]),
-                        name=row["name"],
-                        datetime_str=row["datetime_str"],
-                        description=row["desc"],
-                        max_seats=int(row["max_seats"]),
-                    )
-                    if not await self.event_repo.get(event.event_id):
-                        await self.event_repo.add(event)
-                logger and logger.info("Events migrated from %s", events_file)
-            except Exception as exc:
-                had_errors = True
-                logger and logger.error("Failed to migrate events: %s", exc)
-
+            readers["events"] = _ChunkPrefetcher(_iter_sheet_chunks(events_file, self.chunk_size))
         if os.path.exists(registrations_file):
-            try:
-                df_reg = pd.read_excel(registrations_file)
-                for _, row in df_reg.iterrows():
-                    reg = Registration(
-                        id=None,
-                        user_id=int(row["user_id"]),
-                        event_id=str(row["event_id"]),
-                        status=row.get("status", "registered"),
-                        reg_time=row.get("reg_time")
-                        or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    )
-                    existing = await self.reg_repo.get(reg.user_id, reg.event_id)
-                    if not existing:
-                        await self.reg_repo.create(reg)
-                logger and logger.info("Registrations migrated from %s", registrations_file)
-            except Exception as exc:
-                had_errors = True
-                logger and logger.error("Failed to migrate registrations: %s", exc)
+            readers["registrations"] = _ChunkPrefetcher(_iter_sheet_chunks(registrations_file, self.chunk_size))
+        try:
+            # One transaction for the whole import: either everything lands or nothing does,
+            # and SQLite only syncs the journal once instead of once per row.
+            async with self.db.transaction() if atomic else contextlib.nullcontext():
+                if "users" in readers:
+                    await self._import_users(readers["users"])
+                if "events" in readers:
+                    await self._import_events(readers["events"], events_file)
+                if "registrations" in readers:
+                    await self._import_registrations(readers["registrations"], registrations_file)
+        except Exception as exc:
+            logger and logger.error(
+                "Legacy import failed (%s): %s", "nothing was written" if atomic else "partially written", exc
+            )
+            await self.ensure_defaults()
+            logger and logger.warning("Migration finished with errors; marker not updated.")
+            return False
+        finally:
+            for reader in readers.values():
+                reader.close()
 
         await self.ensure_defaults()
-        if had_errors:
-            logger and logger.warning("Migration finished with errors; marker not updated.")
-            return
-        logger and logger.info("Migration done.")
+        logger and logger.info("Migration done in %.1fs.", time.monotonic() - started)
 
         try:
             os.makedirs(os.path.dirname(marker), exist_ok=True)
@@ -132,6 +109,71 @@ class MigrationService:
                 f.write(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
         except Exception as exc:
             logger and logger.warning("Failed to write migration marker %s: %s", marker, exc)
+        return True
+
+    async def _import_users(self, chunks: AsyncIterable[List[Dict[str, Any]]]) -> None:
+        total = 0
+        async for chunk in chunks:
+            users = [
+                User(
+                    user_id=int(item["user_id"]),
+                    username=item.get("username") or "",
+                    full_name=item.get("name") or "",
+                    email=item.get("email") or "",
+                    created_at=item.get("first_seen"),
+                )
+                for item in chunk
+            ]
+            await self.user_repo.upsert_many(users)
+            total += len(users)
+        logger and logger.info("Users migrated: %s", total)
+
+    async def _import_events(self, chunks: AsyncIterable[List[Dict[str, Any]]], path: str) -> None:
+        read = inserted = skipped = 0
+        async for chunk in chunks:
+            events = []
+            for row in chunk:
+                try:
+                    events.append(
+                        Event(
+                            event_id=_cell_str(row.get("event_id")),
+                            name=_cell_str(row.get("name")),
+                            datetime_str=_cell_datetime(row.get("datetime_str"), "%Y-%m-%d %H:%M"),
+                            description=_cell_str(row.get("desc")),
+                            max_seats=int(row["max_seats"]),
+                        )
+                    )
+                except (KeyError, TypeError, ValueError):
+                    skipped += 1
+            read += len(chunk)
+            inserted += await self.event_repo.add_many(events)
+            logger and logger.info("Events: %s rows read, %s inserted", read, inserted)
+        if skipped:
+            logger and logger.warning("Events: %s malformed rows skipped in %s", skipped, path)
+
+    async def _import_registrations(self, chunks: AsyncIterable[List[Dict[str, Any]]], path: str) -> None:
+        read = inserted = skipped = 0
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        async for chunk in chunks:
+            regs = []
+            for row in chunk:
+                try:
+                    regs.append(
+                        Registration(
+                            id=None,
+                            user_id=int(row["user_id"]),
+                            event_id=_cell_str(row.get("event_id")),
+                            status=_cell_str(row.get("status")) or "registered",
+                            reg_time=_cell_datetime(row.get("reg_time"), "%Y-%m-%d %H:%M:%S") or now,
+                        )
+                    )
+                except (KeyError, TypeError, ValueError):
+                    skipped += 1
+            read += len(chunk)
+            inserted += await self.reg_repo.add_many(regs)
+            logger and logger.info("Registrations: %s rows read, %s inserted", read, inserted)
+        if skipped:
+            logger and logger.warning("Registrations: %s malformed rows skipped in %s", skipped, path)
 
     async def ensure_defaults(self):
         existing = await self.content_repo.list_sections()
@@ -153,3 +195,100 @@ class MigrationService:
             await self.content_repo.upsert_template(
                 Template(key="registration_success", body="✅ Вы записаны на {event_name}")
             )
+
+
+def _iter_json_chunks(path: str, chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    items = [dict(info or {}, user_id=uid) for uid, info in data.items()]
+    for start in range(0, len(items), chunk_size):
+        yield items[start : start + chunk_size]
+
+
+def _iter_sheet_chunks(path: str, chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Stream the first sheet as lists of {header: value} dicts without loading it whole."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if not header:
+            return
+        names = [str(h).strip() if h is not None else "" for h in header]
+        chunk: List[Dict[str, Any]] = []
+        for values in rows:
+            if not values or all(v is None for v in values):
+                continue
+            chunk.append(dict(zip(names, values)))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        workbook.close()
+
+
+class _ChunkPrefetcher:
+    """Parse a file in a background thread and hand chunks over through a bounded queue."""
+
+    _DONE = object()
+
+    def __init__(self, chunks: Iterator[List[Dict[str, Any]]], maxsize: int = 2):
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._closed = threading.Event()
+        self._loop.run_in_executor(None, self._produce, chunks)
+
+    def _produce(self, chunks: Iterator[List[Dict[str, Any]]]) -> None:
+        try:
+            for chunk in chunks:
+                if not self._hand_over(chunk):
+                    return
+            self._hand_over(self._DONE)
+        except Exception as exc:
+            self._hand_over(exc)
+        finally:
+            chunks.close()
+
+    def _hand_over(self, item: Any) -> bool:
+        future = asyncio.run_coroutine_threadsafe(self._queue.put(item), self._loop)
+        while True:
+            try:
+                future.result(timeout=0.5)
+                return True
+            except concurrent.futures.TimeoutError:
+                # Consumer gave up (e.g. the import failed): stop parsing instead of blocking forever.
+                if self._closed.is_set():
+                    future.cancel()
+                    return False
+
+    def close(self) -> None:
+        self._closed.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> List[Dict[str, Any]]:
+        item = await self._queue.get()
+        if item is self._DONE:
+            self._queue.put_nowait(item)
+            raise StopAsyncIteration
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+
+def _cell_str(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _cell_datetime(value: Any, fmt: str) -> str:
+    if isinstance(value, datetime):
+        return value.strftime(fmt)
+    return _cell_str(value)
@@ -1,23 +1,71 @@
 from __future__ import annotations
 
-from typing import List, Optional
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
 
 from ..logging_config import logger
 from ..models import Node
+from ..utils.cache import TTLCache
+
+# The CMS tree is small and read on every menu click; edits go through this service and
+# invalidate it, the TTL only bounds staleness after out-of-process edits.
+NODE_TREE_TTL = 300
+
+
+@dataclass
+class _NodeTree:
+    nodes: List[Node]
+    by_id: Dict[int, Node] = field(default_factory=dict)
+    by_key: Dict[str, Node] = field(default_factory=dict)
+    children: Dict[Optional[int], List[Node]] = field(default_factory=dict)
+    main_menu: List[Node] = field(default_factory=list)
+    main_menu_by_title: Dict[str, Node] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, nodes: List[Node]) -> "_NodeTree":
+        tree = cls(nodes=nodes)
+        for node in sorted(nodes, key=lambda n: (n.order_index, n.id or 0)):
+            tree.by_id[node.id] = node  # type: ignore[index]
+            if node.key:
+                tree.by_key[node.key] = node
+            tree.children.setdefault(node.parent_id, []).append(node)
+            if node.is_main_menu:
+                tree.main_menu.append(node)
+                tree.main_menu_by_title.setdefault(node.title, node)
+        return tree
 
 
 class NodeService:
-    def __init__(self, repo):
+    def __init__(self, repo, cache_ttl: float = NODE_TREE_TTL):
         self.repo = repo
+        self._cache = TTLCache(ttl=cache_ttl, maxsize=1)
+
+    async def _tree(self) -> _NodeTree:
+        tree = self._cache.get("tree")
+        if tree is None:
+            tree = _NodeTree.build(await self.repo.list_all_nodes())
+            self._cache.set("tree", tree)
+        return tree
+
+    def invalidate_cache(self) -> None:
+        self._cache.invalidate()
+
+    def cache_stats(self) -> Dict[str, int]:
+        return self._cache.stats()
+
+    async def warm_up(self) -> int:
+        """Load the whole tree into memory; returns the node count."""
+        self.invalidate_cache()
+        return len((await self._tree()).nodes)
 
     async def get_node(self, node_id: int) -> Optional[Node]:
-        return await self.repo.get_node(node_id)
+        return (await self._tree()).by_id.get(node_id)
 
     async def get_node_by_key(self, key: str) -> Optional[Node]:
-        return await self.repo.get_node_by_key(key)
+        return (await self._tree()).by_key.get(key)
 
     async def get_children(self, parent_id: Optional[int]) -> List[Node]:
-        return await self.repo.get_children(parent_id)
+        return list((await self._tree()).children.get(parent_id, []))
 
     async def save_node(
         self,
@@ -41,18 +89,24 @@ class NodeService:
             is_main_menu=is_main_menu,
         )
         node_id = await self.repo.upsert_node(node)
+        self.invalidate_cache()
         logger and logger.debug("Saved node id=%s key=%s parent=%s", node_id, key, parent_id)
         return node_id
 
     async def delete_node(self, node_id: int):
         await self.repo.delete_node(node_id)
+        self.invalidate_cache()
         logger and logger.info("Deleted node id=%s", node_id)
 
     async def get_all_nodes(self) -> List[Node]:
-        return await self.repo.list_all_nodes()
+        return list((await self._tree()).nodes)
 
     async def get_main_menu_nodes(self) -> List[Node]:
-        return await self.repo.get_main_menu_nodes()
+        return list((await self._tree()).main_menu)
+
+    async def get_main_menu_node(self, title: str) -> Optional[Node]:
+        """Main-menu node whose reply-keyboard button has this text."""
+        return (await self._tree()).main_menu_by_title.get(title)
 
     async def ensure_defaults(self):
         nodes = await self.get_all_nodes()
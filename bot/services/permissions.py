@@ -56,12 +56,14 @@ def require_role(required: Role):
 
             if user.id in admin_ids:
                 try:
-                    await role_service.ensure_user(
-                        user.id,
-                        getattr(user, "username", "") or "",
-                        getattr(user, "full_name", "") or "",
-                    )
-                    await role_service.assign_role(user.id, Role.ADMIN)
+                    # Role lookups are cached: only write when the grant is actually missing.
+                    if await role_service.get_role(user.id) != Role.ADMIN:
+                        await role_service.ensure_user(
+                            user.id,
+                            getattr(user, "username", "") or "",
+                            getattr(user, "full_name", "") or "",
+                        )
+                        await role_service.assign_role(user.id, Role.ADMIN)
                 except Exception:
                     # best-effort: если не смогли записать в БД, всё равно пропускаем
                     pass
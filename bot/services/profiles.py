@@ -1,17 +1,24 @@
 from __future__ import annotations
 
-from typing import Optional
+from typing import Dict, Iterable, List, Optional
 
+from ..constants import Role
 from ..logging_config import logger
 from ..models import User
+from ..utils.cache import TTLCache
 from ..utils.errors import ValidationError
 from ..utils.validators import is_valid_email
 
+# Role checks run on every admin/menu interaction. Only elevated roles are cached (everyone
+# else is USER); the TTL bounds staleness when roles are changed outside this process.
+ROLE_CACHE_TTL = 60
+
 
 class ProfileService:
-    def __init__(self, user_repo, role_repo):
+    def __init__(self, user_repo, role_repo, cache_ttl: float = ROLE_CACHE_TTL):
         self.user_repo = user_repo
         self.role_repo = role_repo
+        self._cache = TTLCache(ttl=cache_ttl, maxsize=1)
 
     async def ensure_user(self, user_id: int, username: str, full_name: str) -> User:
         user = await self.user_repo.upsert_user(user_id, username, full_name)
@@ -44,7 +51,44 @@ class ProfileService:
 
     async def assign_role(self, user_id: int, role):
         await self.role_repo.set_role(user_id, role)
+        self.invalidate_cache()
         logger and logger.info("Role %s assigned to %s", role, user_id)
 
+    def invalidate_cache(self) -> None:
+        self._cache.invalidate()
+
+    def cache_stats(self) -> Dict[str, int]:
+        return self._cache.stats()
+
+    async def _elevated_roles(self) -> Dict[int, Role]:
+        roles = self._cache.get("elevated")
+        if roles is None:
+            roles = await self.role_repo.list_elevated()
+            self._cache.set("elevated", roles)
+        return roles
+
+    async def warm_up(self) -> int:
+        """Preload the elevated-role table; returns how many users have one."""
+        self.invalidate_cache()
+        return len(await self._elevated_roles())
+
     async def get_role(self, user_id: int):
-        return await self.role_repo.get_role(user_id)
+        return (await self._elevated_roles()).get(user_id, Role.USER)
+
+    async def ensure_admins(self, admin_ids: Iterable[int]) -> List[int]:
+        """Grant ADMIN to configured ids that don't have it yet; returns the ids that changed.
+
+        One lookup for the whole list keeps startup free of writes once roles are in place,
+        and existing users keep their real names.
+        """
+        admin_ids = list(admin_ids)
+        current = await self.role_repo.get_roles(admin_ids)
+        granted = []
+        for admin_id in admin_ids:
+            if current.get(admin_id) == Role.ADMIN:
+                continue
+            if await self.user_repo.get_user(admin_id) is None:
+                await self.user_repo.upsert_user(admin_id, "", f"admin-{admin_id}")
+            await self.assign_role(admin_id, Role.ADMIN)
+            granted.append(admin_id)
+        return granted
@@ -2,17 +2,63 @@ import asyncio
 import logging
 import os
 import sys
+import time
+from contextlib import asynccontextmanager
+from dataclasses import fields
+from typing import AsyncIterator, Dict, List, Optional
 
 from telegram import Update
-from telegram.ext import ContextTypes
+from telegram.ext import Application, ContextTypes
+
+from ..config import RESTART_REQUIRED_FIELDS, Config, load_config
+from ..handlers import rebuild_handlers
+from ..lifecycle import stop_application
+from ..logging_config import stop_logging
+from ..utils.errors import RestartInProgress
+from .warmup import warm_up
 
 logger = logging.getLogger(__name__)
 
 
 class RestartService:
-    def __init__(self, enabled: bool = True, exit_code: int = 1):
+    def __init__(self, enabled: bool = True, exit_code: int = 1, drain_timeout: float = 60):
         self.enabled = enabled
         self.exit_code = exit_code
+        self.drain_timeout = drain_timeout
+        self.draining = False
+        self._jobs: Dict[int, str] = {}
+        self._job_ids = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._restart_task: Optional[asyncio.Task] = None
+
+    @asynccontextmanager
+    async def heavy_job(self, name: str) -> AsyncIterator[None]:
+        """Mark a long operation (broadcast, export) that a restart must wait for instead of cutting off."""
+        if self.draining:
+            raise RestartInProgress(name)
+        self._job_ids += 1
+        job_id = self._job_ids
+        self._jobs[job_id] = name
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            del self._jobs[job_id]
+            if not self._jobs:
+                self._idle.set()
+
+    def active_jobs(self) -> List[str]:
+        return list(self._jobs.values())
+
+    async def drain(self, timeout: float) -> List[str]:
+        """Refuse new heavy jobs and wait for running ones; returns those still running after ``timeout``."""
+        self.draining = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.active_jobs()
 
     async def schedule_restart(
         self,
@@ -23,19 +69,104 @@ class RestartService:
         if not self.enabled:
             await update.effective_message.reply_text("Перезапуск отключен в настройках.")
             return
-        await update.effective_message.reply_text("🔄 Перезапускаю бота, это займет пару секунд.")
+        if self._restart_task is not None:
+            await update.effective_message.reply_text("Перезапуск уже выполняется.")
+            return
+        jobs = self.active_jobs()
+        if jobs:
+            await update.effective_message.reply_text(
+                f"⏳ Дожидаюсь завершения: {', '.join(jobs)} (не дольше {self.drain_timeout:.0f} с), затем перезапущусь."
+            )
+        else:
+            await update.effective_message.reply_text("🔄 Перезапускаю бота, это займет пару секунд.")
         logger.info("Restart requested by user_id=%s", update.effective_user.id)
-        await context.application.stop()
-        await context.application.shutdown()
-        db = context.application.bot_data.get("db")
-        if db:
-            await db.close()
-        await asyncio.sleep(1)
+        self.draining = True
+        # Not awaited here: Application.stop() waits for every update in flight, this one included.
+        self._restart_task = asyncio.create_task(self._restart(context.application, code))
+
+    async def _restart(self, application: Application, code: int | None) -> None:
+        left = await self.drain(self.drain_timeout)
+        if left:
+            logger.warning("Drain timed out, restarting while still running: %s", ", ".join(left))
+        try:
+            # Processes queued updates, flushes persistence and closes the database.
+            await stop_application(application)
+        except Exception:
+            logger.exception("Graceful stop before restart failed")
+        lease = application.bot_data.get("leader_lease")
+        if lease is not None:
+            # os._exit skips run_with_leadership's cleanup: hand over now so a standby takes over at once.
+            await lease.release()
+            await application.bot_data["db"].close()
+        # os._exit skips atexit: write out records still queued for the log listener.
+        stop_logging()
         sys.stdout.flush()
         exit_code = self.exit_code if code is None else code
         os._exit(exit_code)
 
     async def reload_data(self, context: ContextTypes.DEFAULT_TYPE):
         logger.info("Reloading default content/nodes by admin request")
-        await context.application.bot_data["content_service"].ensure_defaults()
-        await context.application.bot_data["node_service"].ensure_defaults()
+        bot_data = context.application.bot_data
+        await bot_data["content_service"].ensure_defaults()
+        await bot_data["node_service"].ensure_defaults()
+        # Re-read everything from the DB, including edits made outside the bot (e.g. bot.cli).
+        for name in ("node_service", "event_service", "profile_service"):
+            bot_data[name].invalidate_cache()
+
+    async def soft_reload(self, application: Application) -> List[str]:
+        """Reload config, rebuild caches and re-register handlers while updates keep flowing.
+
+        Returns report lines for the admin. Settings listed in ``RESTART_REQUIRED_FIELDS`` keep
+        their running values until a real restart.
+        """
+        started = time.perf_counter()
+        bot_data = application.bot_data
+        report: List[str] = []
+
+        old: Config = bot_data["config"]
+        new = load_config(reload_env=True)
+        changed = [f.name for f in fields(Config) if getattr(old, f.name) != getattr(new, f.name)]
+        pinned = [name for name in changed if name in RESTART_REQUIRED_FIELDS]
+        for name in pinned:
+            setattr(new, name, getattr(old, name))
+        bot_data["config"] = new
+        self.enabled = new.restart_enabled
+        self.exit_code = new.restart_exit_code
+        self.drain_timeout = new.restart_drain_timeout
+        bot_data["export_service"].max_part_bytes = new.export_max_part_bytes
+        bot_data["db"].slow_query_ms = new.slow_query_ms
+        if "instrumentation" in bot_data:
+            bot_data["instrumentation"].slow_update_ms = new.slow_update_ms
+        if "loop_monitor" in bot_data:
+            bot_data["loop_monitor"].stall_ms = new.loop_stall_ms
+        if "load_shedder" in bot_data:
+            bot_data["load_shedder"].lag_ms = new.load_shed_lag_ms
+        logging.getLogger().setLevel(new.log_level)
+        logging.getLogger("bot").setLevel(new.log_level)
+        applied = [name for name in changed if name not in RESTART_REQUIRED_FIELDS]
+        report.append(f"config: {', '.join(applied) if applied else 'без изменений'}")
+        if pinned:
+            report.append(f"нужен перезапуск для: {', '.join(pinned)}")
+        granted = await bot_data["profile_service"].ensure_admins(new.admin_ids)
+        if granted:
+            report.append(f"админы из ADMIN_IDS: {', '.join(map(str, granted))}")
+
+        for name in ("node_service", "event_service", "profile_service"):
+            bot_data[name].invalidate_cache()
+        if new.warmup_enabled:
+            steps = await warm_up(bot_data, timeout=new.warmup_timeout)
+            report.append("кэши: " + ", ".join(f"{s.name} {'ok' if s.ok else s.detail}" for s in steps))
+        else:
+            report.append("кэши: сброшены")
+
+        try:
+            count = rebuild_handlers(application)
+            report.append(f"обработчики: {count}")
+        except Exception as exc:
+            logger.exception("Handler reload failed; keeping the running handlers")
+            report.append(f"обработчики: ошибка ({exc.__class__.__name__}: {exc}), оставлены прежние")
+
+        elapsed = time.perf_counter() - started
+        report.append(f"готово за {elapsed * 1000:.0f} мс")
+        logger.info("Soft reload finished in %.0fms (changed config: %s)", elapsed * 1000, changed or "none")
+        return report
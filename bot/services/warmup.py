@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, MutableMapping
+
+from ..logging_config import logger
+from .messaging import build_main_keyboard, main_menu_items
+
+
+@dataclass
+class WarmupStep:
+    name: str
+    seconds: float
+    detail: str
+    ok: bool = True
+
+
+async def _warm_node_tree(bot_data: MutableMapping[str, Any]) -> str:
+    count = await bot_data["node_service"].warm_up()
+    return f"{count} nodes"
+
+
+async def _warm_main_menu(bot_data: MutableMapping[str, Any]) -> str:
+    items = await main_menu_items(bot_data["node_service"])
+    build_main_keyboard(items, show_admin=False)
+    build_main_keyboard(items, show_admin=True)
+    return f"{len(items)} buttons"
+
+
+async def _warm_events(bot_data: MutableMapping[str, Any]) -> str:
+    events = await bot_data["event_service"].list_active_events()
+    return f"{len(events)} upcoming"
+
+
+async def _warm_roles(bot_data: MutableMapping[str, Any]) -> str:
+    count = await bot_data["profile_service"].warm_up()
+    return f"{count} elevated"
+
+
+WARMUP_STEPS: Dict[str, Callable[[MutableMapping[str, Any]], Awaitable[str]]] = {
+    "node_tree": _warm_node_tree,
+    "events": _warm_events,
+    "roles": _warm_roles,
+    "main_menu": _warm_main_menu,
+}
+
+
+async def warm_up(bot_data: MutableMapping[str, Any], timeout: float) -> List[WarmupStep]:
+    """Preload hot caches concurrently; never raises and never runs longer than ``timeout``.
+
+    Steps that fail or time out are reported and simply left cold: handlers fill the caches lazily.
+    """
+    results: List[WarmupStep] = []
+
+    async def run(name: str, step: Callable[[MutableMapping[str, Any]], Awaitable[str]]) -> None:
+        started = time.perf_counter()
+        try:
+            detail = await step(bot_data)
+            results.append(WarmupStep(name, time.perf_counter() - started, detail))
+        except Exception as exc:
+            results.append(WarmupStep(name, time.perf_counter() - started, f"failed: {exc}", ok=False))
+
+    started = time.perf_counter()
+    tasks = {name: asyncio.create_task(run(name, step)) for name, step in WARMUP_STEPS.items()}
+    _, pending = await asyncio.wait(tasks.values(), timeout=timeout)
+    for name, task in tasks.items():
+        if task in pending:
+            task.cancel()
+            results.append(WarmupStep(name, time.perf_counter() - started, "timed out", ok=False))
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    results.sort(key=lambda r: list(WARMUP_STEPS).index(r.name))
+    logger and logger.info(
+        "Warm-up: %s",
+        ", ".join(f"{r.name}={r.seconds * 1000:.0f}ms ({r.detail})" for r in results),
+    )
+    return results
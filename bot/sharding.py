@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import bisect
+import hashlib
+from typing import Any, Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Update payload fields carrying the sender, in the order Update.effective_user checks them.
+_USER_SOURCES = (
+    "message",
+    "edited_message",
+    "callback_query",
+    "inline_query",
+    "chosen_inline_result",
+    "shipping_query",
+    "pre_checkout_query",
+    "poll_answer",
+    "my_chat_member",
+    "chat_member",
+    "chat_join_request",
+    "channel_post",
+    "edited_channel_post",
+)
+
+
+def _hash(value: str) -> int:
+    # Stable across processes and restarts, unlike the built-in hash().
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing(Generic[T]):
+    """Consistent hash ring: adding/removing a node only remaps ~1/N of the keys."""
+
+    def __init__(self, nodes: Iterable[T], replicas: int = 128):
+        self.replicas = replicas
+        self._ring: List[Tuple[int, T]] = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: T) -> None:
+        for replica in range(self.replicas):
+            bisect.insort(self._ring, (_hash(f"{node}#{replica}"), node), key=lambda item: item[0])
+
+    def remove(self, node: T) -> None:
+        self._ring = [item for item in self._ring if item[1] != node]
+
+    def node_for(self, key: Any) -> T:
+        if not self._ring:
+            raise LookupError("Hash ring is empty")
+        idx = bisect.bisect(self._ring, _hash(str(key)), key=lambda item: item[0])
+        return self._ring[idx % len(self._ring)][1]
+
+
+def shard_key(update: Dict[str, Any]) -> Optional[int]:
+    """User id (falling back to chat id) of a raw update payload.
+
+    User id keeps user_data and per-user conversations on one worker; for the private chats this
+    bot lives in it equals the chat id anyway.
+    """
+    for source in _USER_SOURCES:
+        payload = update.get(source)
+        if not isinstance(payload, dict):
+            continue
+        sender = payload.get("from") or payload.get("user")
+        if isinstance(sender, dict) and "id" in sender:
+            return int(sender["id"])
+        chat = payload.get("chat") or (payload.get("message") or {}).get("chat")
+        if isinstance(chat, dict) and "id" in chat:
+            return int(chat["id"])
+    return None
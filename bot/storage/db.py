@@ -1,16 +1,49 @@
 from __future__ import annotations
 
+import asyncio
 import os
 import logging
-from typing import Optional, Iterable, Any, Dict, List
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, Iterable, Any, AsyncIterator, Dict, List, Set
 
 import aiosqlite
 
+from ..utils.metrics import DB_QUERY_SECONDS, DB_SLOW_QUERIES
+from ..utils.tracing import note_db_statement
+from .query_stats import QueryStat, QueryStats, is_explainable, normalize_sql, statement_kind
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever init_db gains tables/indexes: a file already at this PRAGMA user_version
+# skips the whole DDL pass on startup.
+SCHEMA_VERSION = 5
+# How long a write keeps retrying "database is locked" that SQLite could not wait out itself.
+LOCKED_RETRY_SECONDS = 5.0
+
+
+def _log_slow_query(query: str, seconds: float, rows: int, plan: Optional[str]) -> None:
+    logger.warning(
+        "Slow query %.0fms (rows=%s): %s | plan: %s", seconds * 1000, rows, normalize_sql(query), plan or "-"
+    )
+
 
 class Database:
-    def __init__(self, path: str):
+    def __init__(self, path: str, slow_query_ms: int = 0):
         self.path = path
         self._conn: Optional[aiosqlite.Connection] = None
+        # Serializes commits on the shared connection so a transaction is never
+        # committed half-way by a concurrent execute().
+        self._write_lock = asyncio.Lock()
+        self._tx_task: Optional[asyncio.Task] = None
+        # Statements slower than this are logged with their EXPLAIN QUERY PLAN; 0 disables the log.
+        self.slow_query_ms = slow_query_ms
+        self.query_stats = QueryStats()
+        # Writes retried after "database is locked" and the time spent backing off.
+        self.locked_retries = 0
+        self.locked_wait_seconds = 0.0
+        self._explain_tasks: Set[asyncio.Task] = set()
 
     async def connect(self) -> aiosqlite.Connection:
         if self._conn is None:
@@ -24,31 +57,198 @@ class Database:
             await self._conn.execute("PRAGMA busy_timeout = 5000;")
         return self._conn
 
-    async def execute(self, query: str, params: Iterable[Any] | Dict[str, Any] = ()):
-        conn = await self.connect()
-        await conn.execute(query, params)
-        await conn.commit()
+    def _in_own_transaction(self) -> bool:
+        return self._tx_task is not None and self._tx_task is asyncio.current_task()
+
+    def _observe(self, query: str, seconds: float, rows: int = 0, params: Any = None) -> None:
+        note_db_statement(seconds)
+        DB_QUERY_SECONDS.observe(seconds, statement_kind(query))
+        stat = self.query_stats.record(query, seconds, rows)
+        if not self.slow_query_ms or seconds * 1000 < self.slow_query_ms:
+            return
+        DB_SLOW_QUERIES.inc()
+        if stat is not None:
+            stat.slow_calls += 1
+        if stat is None or stat.plan is not None or params is None or not is_explainable(query):
+            _log_slow_query(query, seconds, rows, stat.plan if stat else None)
+            return
+        # First slow run of this statement: look up its plan off the caller's path, then log.
+        task = asyncio.create_task(self._explain_slow(stat, query, params, seconds, rows))
+        self._explain_tasks.add(task)
+        task.add_done_callback(self._explain_tasks.discard)
+
+    async def _explain_slow(self, stat: QueryStat, query: str, params: Any, seconds: float, rows: int) -> None:
+        if self._conn is None:
+            stat.plan = "n/a (connection closed)"
+        else:
+            try:
+                async with self._conn.execute(f"EXPLAIN QUERY PLAN {query}", params) as cursor:
+                    stat.plan = "; ".join(row["detail"] for row in await cursor.fetchall()) or "-"
+            except Exception as exc:
+                stat.plan = f"n/a ({exc.__class__.__name__})"
+        _log_slow_query(query, seconds, rows, stat.plan)
+
+    async def execute(self, query: str, params: Iterable[Any] | Dict[str, Any] = ()) -> int:
+        """Run one statement and commit (unless inside ``transaction()``); returns the number of changed rows."""
+        cursor = await self._write(query, params)
+        return max(cursor.rowcount, 0)
+
+    async def insert(self, query: str, params: Iterable[Any] | Dict[str, Any] = ()) -> Optional[int]:
+        """Like ``execute`` for an INSERT; returns the rowid of the inserted row."""
+        cursor = await self._write(query, params)
+        return cursor.lastrowid
+
+    async def _write(self, query: str, params: Iterable[Any] | Dict[str, Any]) -> aiosqlite.Cursor:
+        started = time.perf_counter()
+        rows = 0
+        try:
+            if self._in_own_transaction():
+                conn = await self.connect()
+                cursor = await conn.execute(query, params)
+            else:
+                async with self._write_lock:
+                    conn = await self.connect()
+                    cursor = await self._execute_retrying(conn, query, params)
+                    await conn.commit()
+            rows = max(cursor.rowcount, 0)
+            return cursor
+        finally:
+            self._observe(query, time.perf_counter() - started, rows, params)
+
+    async def _execute_retrying(self, conn: aiosqlite.Connection, query: str, params: Any) -> aiosqlite.Cursor:
+        """``conn.execute`` for an autocommit write, retried while another process holds the database.
+
+        busy_timeout only helps when this connection has no read open. Another task may be half-way
+        through a SELECT on the shared connection; its snapshot is then stale and SQLite reports
+        "database is locked" at once instead of waiting, so back off until that read is done.
+        """
+        deadline = time.perf_counter() + LOCKED_RETRY_SECONDS
+        delay = 0.001
+        while True:
+            try:
+                return await conn.execute(query, params)
+            except sqlite3.OperationalError as exc:
+                if "database is locked" not in str(exc) or time.perf_counter() + delay > deadline:
+                    raise
+            # The failed statement changed nothing; end the implicit transaction it opened.
+            if conn.in_transaction:
+                await conn.rollback()
+            self.locked_retries += 1
+            self.locked_wait_seconds += delay
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+    async def executemany(self, query: str, seq_of_params: Iterable[Iterable[Any] | Dict[str, Any]]) -> int:
+        """Run one statement for many parameter sets; returns the number of changed rows."""
+        started = time.perf_counter()
+        rows = 0
+        try:
+            if self._in_own_transaction():
+                conn = await self.connect()
+                cursor = await conn.executemany(query, seq_of_params)
+            else:
+                async with self._write_lock:
+                    conn = await self.connect()
+                    cursor = await conn.executemany(query, seq_of_params)
+                    await conn.commit()
+            rows = max(cursor.rowcount, 0)
+            return cursor.rowcount
+        finally:
+            # No single parameter set to explain with: slow batches are logged without a plan.
+            self._observe(query, time.perf_counter() - started, rows)
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Group writes into one atomic commit (execute/executemany inside do not commit)."""
+        async with self._write_lock:
+            conn = await self.connect()
+            await conn.execute("BEGIN")
+            self._tx_task = asyncio.current_task()
+            try:
+                yield conn
+            except BaseException:
+                await conn.rollback()
+                raise
+            else:
+                await conn.commit()
+            finally:
+                self._tx_task = None
 
     async def fetchone(
         self, query: str, params: Iterable[Any] | Dict[str, Any] = ()
     ) -> Optional[aiosqlite.Row]:
-        conn = await self.connect()
-        async with conn.execute(query, params) as cursor:
-            return await cursor.fetchone()
+        started = time.perf_counter()
+        row = None
+        try:
+            conn = await self.connect()
+            async with conn.execute(query, params) as cursor:
+                row = await cursor.fetchone()
+            return row
+        finally:
+            self._observe(query, time.perf_counter() - started, int(row is not None), params)
 
     async def fetchall(
         self, query: str, params: Iterable[Any] | Dict[str, Any] = ()
     ) -> List[aiosqlite.Row]:
+        started = time.perf_counter()
+        rows: List[aiosqlite.Row] = []
+        try:
+            conn = await self.connect()
+            async with conn.execute(query, params) as cursor:
+                rows = await cursor.fetchall()
+            return rows
+        finally:
+            self._observe(query, time.perf_counter() - started, len(rows), params)
+
+    async def iterate(
+        self,
+        query: str,
+        params: Iterable[Any] | Dict[str, Any] = (),
+        batch_size: int = 1000,
+    ) -> AsyncIterator[List[aiosqlite.Row]]:
+        """Yield rows in batches so big exports never materialize a whole table."""
         conn = await self.connect()
-        async with conn.execute(query, params) as cursor:
-            return await cursor.fetchall()
+        # Only time spent in SQLite counts, not the consumer's work between batches.
+        busy = 0.0
+        total = 0
+        try:
+            started = time.perf_counter()
+            async with conn.execute(query, params) as cursor:
+                while True:
+                    rows = await cursor.fetchmany(batch_size)
+                    busy += time.perf_counter() - started
+                    if not rows:
+                        break
+                    total += len(rows)
+                    yield rows
+                    started = time.perf_counter()
+        finally:
+            self._observe(query, busy, total, params)
 
     async def close(self) -> None:
         if self._conn is not None:
             await self._conn.close()
             self._conn = None
 
-    async def init_db(self):
+    async def get_meta(self, key: str) -> Optional[str]:
+        row = await self.fetchone("SELECT value FROM app_meta WHERE key = ?", (key,))
+        return row["value"] if row else None
+
+    async def set_meta(self, key: str, value: str) -> None:
+        await self.execute(
+            "INSERT INTO app_meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    async def schema_version(self) -> int:
+        row = await self.fetchone("PRAGMA user_version")
+        return int(row[0]) if row else 0
+
+    async def init_db(self) -> bool:
+        """Create tables/indexes; returns False when the schema is already current and nothing ran."""
+        if await self.schema_version() >= SCHEMA_VERSION:
+            return False
+
         await self.execute(
             """
             CREATE TABLE IF NOT EXISTS users (
@@ -138,18 +338,68 @@ class Database:
         """
         )
 
+        await self.execute(
+            """
+            CREATE TABLE IF NOT EXISTS app_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """
+        )
+
+        # user_data/chat_data and ConversationHandler states (bot.storage.persistence).
+        await self.execute(
+            """
+            CREATE TABLE IF NOT EXISTS persisted_data (
+                kind TEXT NOT NULL,
+                id INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (kind, id)
+            );
+        """
+        )
+        await self.execute(
+            """
+            CREATE TABLE IF NOT EXISTS persisted_conversations (
+                name TEXT NOT NULL,
+                key TEXT NOT NULL,
+                state TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (name, key)
+            );
+        """
+        )
+
+        # Single-row lease deciding which process polls (bot.leader).
+        await self.execute(
+            """
+            CREATE TABLE IF NOT EXISTS leader_lease (
+                name TEXT PRIMARY KEY,
+                holder TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                acquired_at REAL NOT NULL
+            );
+        """
+        )
+
         # Indexes for weak VPS: speed up common lookups. Safe to run on every startup.
         idx_statements = [
-            "CREATE INDEX IF NOT EXISTS idx_registrations_event_id ON registrations(event_id)",
+            # Covers the active-seat count of an event card; replaces the plain event_id index.
+            "CREATE INDEX IF NOT EXISTS idx_registrations_event_status ON registrations(event_id, status)",
+            "DROP INDEX IF EXISTS idx_registrations_event_id",
             "CREATE INDEX IF NOT EXISTS idx_registrations_user_id ON registrations(user_id)",
+            "CREATE INDEX IF NOT EXISTS idx_events_datetime ON events(datetime_str, event_id)",
             "CREATE INDEX IF NOT EXISTS idx_nodes_parent_order ON nodes(parent_id, order_index)",
             "CREATE INDEX IF NOT EXISTS idx_nodes_main_menu_order ON nodes(is_main_menu, order_index)",
             "CREATE INDEX IF NOT EXISTS idx_roles_role ON roles(role)",
         ]
+        complete = True
         for stmt in idx_statements:
             try:
                 await self.execute(stmt)
             except Exception as exc:
+                complete = False
                 logging.getLogger("bot").warning("Failed to create index: %s (%s)", stmt, exc)
 
         # Uniqueness for registrations (protect from duplicates under concurrency).
@@ -159,8 +409,14 @@ class Database:
                 "CREATE UNIQUE INDEX IF NOT EXISTS uq_registrations_user_event ON registrations(user_id, event_id)"
             )
         except Exception as exc:
+            complete = False
             logging.getLogger("bot").warning(
                 "Failed to create UNIQUE index uq_registrations_user_event (duplicates?): %s",
                 exc,
             )
 
+        # Only stamp the version when everything was created, so a failed index is retried next boot.
+        if complete:
+            await self.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        return True
+
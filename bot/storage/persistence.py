@@ -0,0 +1,382 @@
+"""SQLite persistence for ``user_data``/``chat_data`` and ConversationHandler states.
+
+Drafts kept in ``user_data`` (pending registrations, CMS edits, broadcast texts) and the
+conversation step a user is on survive restarts:
+
+- write-behind: PTB hands over touched entries every ``flush_interval`` seconds; unchanged
+  entries are skipped and the rest go to SQLite in one transaction per flush;
+- lazy loading: nothing is read at startup, a user's data is loaded right before their first
+  update is handled;
+- eviction: entries idle for ``idle_ttl`` seconds are dropped from memory (not from SQLite), so
+  memory is bounded by the recently active users;
+- conversation timeout: a dialog with no step for ``conversation_timeout`` seconds is ended, in
+  memory and in SQLite, and only dialogs younger than that are loaded at startup, so memory is
+  bounded by the recently active dialogs (PTB's own ``conversation_timeout`` needs a JobQueue);
+- retention: rows untouched for ``retention_days`` are purged at startup.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import json
+import logging
+import time
+from typing import Any, Dict, Optional, Set, Tuple, Union
+
+from telegram.ext import Application, BasePersistence, PersistenceInput
+
+from .db import Database
+
+logger = logging.getLogger(__name__)
+
+USER = "user"
+CHAT = "chat"
+
+_Key = Tuple[str, int]
+ConversationKey = Tuple[Union[int, str], ...]
+
+
+def _encode(value: Any) -> Any:
+    # user_data holds plain JSON values plus the occasional datetime (event drafts).
+    if isinstance(value, dt.datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, dt.date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, (set, frozenset)):
+        return {"__set__": sorted(value, key=repr)}
+    raise TypeError(f"{type(value).__name__} is not persistable")
+
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1:
+        if "__datetime__" in obj:
+            return dt.datetime.fromisoformat(obj["__datetime__"])
+        if "__date__" in obj:
+            return dt.date.fromisoformat(obj["__date__"])
+        if "__set__" in obj:
+            return set(obj["__set__"])
+    return obj
+
+
+def dumps(value: Any) -> str:
+    return json.dumps(value, default=_encode, ensure_ascii=False, sort_keys=True)
+
+
+def loads(payload: str) -> Any:
+    return json.loads(payload, object_hook=_decode)
+
+
+def _digest(payload: Optional[str]) -> Optional[int]:
+    return None if payload is None else hash(payload)
+
+
+class SQLitePersistence(BasePersistence[Dict[Any, Any], Dict[Any, Any], Dict[Any, Any]]):
+    def __init__(
+        self,
+        db: Database,
+        flush_interval: float = 10,
+        idle_ttl: float = 1800,
+        retention_days: float = 7,
+        conversation_timeout: float = 3600,
+    ):
+        # bot_data is the service container built in code, never persisted.
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=True, user_data=True, callback_data=False),
+            update_interval=flush_interval,
+        )
+        self.db = db
+        self.idle_ttl = idle_ttl
+        self.retention_days = retention_days
+        self.conversation_timeout = conversation_timeout
+        self._application: Optional[Application] = None
+        self._prepared = False
+        self._tables_ready = False
+        # Staged writes: serialized payload, or None for a delete.
+        self._pending: Dict[_Key, Optional[str]] = {}
+        self._pending_conversations: Dict[Tuple[str, str], Optional[str]] = {}
+        # Last step of every live conversation (monotonic), to end the abandoned ones.
+        self._conversation_seen: Dict[Tuple[str, ConversationKey], float] = {}
+        # Hash of what SQLite holds per loaded entry, to skip rewriting unchanged data.
+        self._written: Dict[_Key, Optional[int]] = {}
+        self._last_seen: Dict[_Key, float] = {}
+        self._evicted: Set[_Key] = set()
+        # Evicted, then touched again before PTB reported the drop back: PTB withholds their
+        # update_*_data until then, so the live dict is staged when the drop arrives.
+        self._revived: Set[_Key] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self.flushes = 0
+        self.rows_written = 0
+        self.loaded = 0
+        self.evicted = 0
+        self.conversations_expired = 0
+
+    def attach(self, application: Application) -> None:
+        """Eviction goes through ``application.drop_user_data``; PTB only gives persistences the bot."""
+        self._application = application
+
+    async def _prepare(self) -> None:
+        # Application.initialize() loads persistence before post_init bootstraps the schema:
+        # on a brand-new database there is simply nothing to load yet.
+        if self._prepared:
+            return
+        self._prepared = True
+        row = await self.db.fetchone(
+            "SELECT COUNT(*) AS c FROM sqlite_master WHERE type = 'table' "
+            "AND name IN ('persisted_data', 'persisted_conversations')"
+        )
+        self._tables_ready = bool(row and row["c"] == 2)
+        if not self._tables_ready or not self.retention_days:
+            return
+        cutoff = time.time() - self.retention_days * 86400
+        async with self.db.transaction():
+            await self.db.execute("DELETE FROM persisted_data WHERE updated_at < ?", (cutoff,))
+            await self.db.execute("DELETE FROM persisted_conversations WHERE updated_at < ?", (cutoff,))
+
+    # --- user_data / chat_data -------------------------------------------------------------
+
+    async def get_user_data(self) -> Dict[int, Dict[Any, Any]]:
+        await self._prepare()
+        return {}
+
+    async def get_chat_data(self) -> Dict[int, Dict[Any, Any]]:
+        await self._prepare()
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[Any, Any]) -> None:
+        await self._load((USER, user_id), user_data)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict[Any, Any]) -> None:
+        await self._load((CHAT, chat_id), chat_data)
+
+    async def update_user_data(self, user_id: int, data: Dict[Any, Any]) -> None:
+        self._stage((USER, user_id), data)
+
+    async def update_chat_data(self, chat_id: int, data: Dict[Any, Any]) -> None:
+        self._stage((CHAT, chat_id), data)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._drop((USER, user_id))
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._drop((CHAT, chat_id))
+
+    async def _load(self, key: _Key, target: Dict[Any, Any]) -> None:
+        self._last_seen[key] = time.monotonic()
+        if key in self._written:
+            return
+        if key in self._evicted:
+            self._evicted.discard(key)
+            self._revived.add(key)
+        payload = self._pending.get(key) if key in self._pending else await self._read(key)
+        self._written[key] = _digest(payload)
+        if payload is not None and not target:
+            target.update(loads(payload))
+            self.loaded += 1
+
+    async def _read(self, key: _Key) -> Optional[str]:
+        if not self._tables_ready:
+            return None
+        row = await self.db.fetchone("SELECT data FROM persisted_data WHERE kind = ? AND id = ?", key)
+        return row["data"] if row else None
+
+    def _stage(self, key: _Key, data: Dict[Any, Any]) -> None:
+        try:
+            payload = dumps(data) if data else None
+        except (TypeError, ValueError) as exc:
+            logger.warning("Skipping persistence of %s %s: %s", key[0], key[1], exc)
+            return
+        if self._written.get(key) != _digest(payload) or key in self._pending:
+            self._pending[key] = payload
+        self._schedule_flush()
+
+    def _drop(self, key: _Key) -> None:
+        if key in self._evicted:
+            # Dropped from memory by eviction: the row stays for the next lazy load.
+            self._evicted.discard(key)
+            return
+        if key in self._revived:
+            self._revived.discard(key)
+            live = self._live(key)
+            if live is not None:
+                self._stage(key, live)
+            return
+        self._pending[key] = None
+        self._written.pop(key, None)
+        self._last_seen.pop(key, None)
+        self._schedule_flush()
+
+    def _live(self, key: _Key) -> Optional[Dict[Any, Any]]:
+        if self._application is None:
+            return None
+        kind, ident = key
+        store = self._application.user_data if kind == USER else self._application.chat_data
+        return store.get(ident)
+
+    # --- conversations ---------------------------------------------------------------------
+
+    async def get_conversations(self, name: str) -> Dict[ConversationKey, object]:
+        await self._prepare()
+        if not self._tables_ready:
+            return {}
+        params: Tuple[Any, ...] = (name,)
+        if self.conversation_timeout:
+            # Dialogs abandoned before the restart are over: drop them instead of loading them.
+            cutoff = time.time() - self.conversation_timeout
+            await self.db.execute(
+                "DELETE FROM persisted_conversations WHERE name = ? AND updated_at < ?", (name, cutoff)
+            )
+            params = (name, cutoff)
+        rows = await self.db.fetchall(
+            "SELECT key, state, updated_at FROM persisted_conversations WHERE name = ?"
+            + (" AND updated_at >= ?" if self.conversation_timeout else ""),
+            params,
+        )
+        conversations: Dict[ConversationKey, object] = {}
+        now, wall = time.monotonic(), time.time()
+        for row in rows:
+            key = tuple(json.loads(row["key"]))
+            conversations[key] = loads(row["state"])
+            self._conversation_seen[(name, key)] = now - max(0.0, wall - row["updated_at"])
+        return conversations
+
+    async def update_conversation(self, name: str, key: ConversationKey, new_state: Optional[object]) -> None:
+        self._pending_conversations[(name, json.dumps(list(key)))] = None if new_state is None else dumps(new_state)
+        if new_state is None:
+            self._conversation_seen.pop((name, key), None)
+        else:
+            self._conversation_seen[(name, key)] = time.monotonic()
+        self._schedule_flush()
+
+    # --- unused stores ---------------------------------------------------------------------
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        return {}
+
+    async def update_bot_data(self, data: Dict[Any, Any]) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: Dict[Any, Any]) -> None:
+        pass
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def update_callback_data(self, data: Any) -> None:
+        pass
+
+    # --- write-behind ----------------------------------------------------------------------
+
+    def _schedule_flush(self) -> None:
+        # Application.update_persistence() gathers all update_* calls at once; a single flush task
+        # scheduled behind them writes the whole batch in one transaction.
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_soon())
+
+    async def _flush_soon(self) -> None:
+        await asyncio.sleep(0)
+        await self._write_pending()
+        self._evict_idle()
+        self._expire_conversations()
+
+    async def flush(self) -> None:
+        if self._flush_task is not None and not self._flush_task.done():
+            await self._flush_task
+        await self._write_pending()
+
+    async def _write_pending(self) -> None:
+        async with self._flush_lock:
+            while self._pending or self._pending_conversations:
+                data, self._pending = self._pending, {}
+                conversations, self._pending_conversations = self._pending_conversations, {}
+                try:
+                    await self._write(data, conversations)
+                except Exception:
+                    logger.exception("Persistence flush failed; retrying with the next flush")
+                    # Keep anything staged meanwhile: it is newer than what failed.
+                    self._pending = {**data, **self._pending}
+                    self._pending_conversations = {**conversations, **self._pending_conversations}
+                    return
+                for key, payload in data.items():
+                    if key in self._last_seen:
+                        self._written[key] = _digest(payload)
+                self.flushes += 1
+                self.rows_written += len(data) + len(conversations)
+
+    async def _write(self, data: Dict[_Key, Optional[str]], conversations: Dict[Tuple[str, str], Optional[str]]) -> None:
+        now = time.time()
+        async with self.db.transaction():
+            upserts = [(kind, ident, payload, now) for (kind, ident), payload in data.items() if payload is not None]
+            deletes = [key for key, payload in data.items() if payload is None]
+            if upserts:
+                await self.db.executemany(
+                    """
+                    INSERT INTO persisted_data (kind, id, data, updated_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(kind, id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at
+                    """,
+                    upserts,
+                )
+            if deletes:
+                await self.db.executemany("DELETE FROM persisted_data WHERE kind = ? AND id = ?", deletes)
+            states = [(name, key, state, now) for (name, key), state in conversations.items() if state is not None]
+            ended = [key for key, state in conversations.items() if state is None]
+            if states:
+                await self.db.executemany(
+                    """
+                    INSERT INTO persisted_conversations (name, key, state, updated_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(name, key) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at
+                    """,
+                    states,
+                )
+            if ended:
+                await self.db.executemany("DELETE FROM persisted_conversations WHERE name = ? AND key = ?", ended)
+        self._tables_ready = True
+
+    # --- eviction --------------------------------------------------------------------------
+
+    def _evict_idle(self) -> None:
+        if self._application is None or not self.idle_ttl:
+            return
+        deadline = time.monotonic() - self.idle_ttl
+        for key, seen in list(self._last_seen.items()):
+            if seen > deadline or key in self._pending:
+                continue
+            del self._last_seen[key]
+            self._written.pop(key, None)
+            self._evicted.add(key)
+            kind, ident = key
+            if kind == USER:
+                self._application.drop_user_data(ident)
+            else:
+                self._application.drop_chat_data(ident)
+            self.evicted += 1
+
+    def _expire_conversations(self) -> None:
+        if self._application is None or not self.conversation_timeout:
+            return
+        deadline = time.monotonic() - self.conversation_timeout
+        # The dicts the Application persists, shared with the ConversationHandlers (and their
+        # replacements after a soft reload).
+        live = self._application._conversation_handler_conversations  # noqa: SLF001
+        for (name, key), seen in list(self._conversation_seen.items()):
+            if seen > deadline:
+                continue
+            del self._conversation_seen[(name, key)]
+            conversations = live.get(name)
+            if conversations is not None and key in conversations:
+                # A tracked pop: the next update_persistence reports it as ended, deleting the row.
+                conversations.pop(key)
+            self.conversations_expired += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_memory": len(self._last_seen),
+            "conversations": len(self._conversation_seen),
+            "pending": len(self._pending) + len(self._pending_conversations),
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "loaded": self.loaded,
+            "evicted": self.evicted,
+            "conversations_expired": self.conversations_expired,
+        }
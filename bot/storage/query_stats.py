@@ -0,0 +1,91 @@
+"""Per-statement timing for ``Database``: call counts, total/max time and rows per normalized SQL.
+
+Statements are grouped by their text with literals and whitespace normalized away, so the 500
+``SELECT ... WHERE user_id = ?`` calls of an N+1 loop show up as one line with 500 calls.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+# EXPLAIN QUERY PLAN only makes sense for these.
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(query: str) -> str:
+    """``SELECT * FROM t WHERE id IN (1, 2,  3)`` -> ``SELECT * FROM t WHERE id IN (?, ...)``."""
+    text = _STRING.sub("?", query)
+    text = _NUMBER.sub("?", text)
+    text = _SPACE.sub(" ", text).strip().rstrip(";").strip()
+    return _PLACEHOLDER_LIST.sub("(?, ...)", text)
+
+
+@lru_cache(maxsize=1024)
+def statement_kind(query: str) -> str:
+    """First keyword in lower case (``select``, ``insert``, ``pragma``...): the metrics label."""
+    words = query.split(None, 1)
+    return words[0].lower() if words else "other"
+
+
+def is_explainable(query: str) -> bool:
+    return query.lstrip().upper().startswith(_EXPLAINABLE)
+
+
+@dataclass
+class QueryStat:
+    sql: str
+    calls: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    rows: int = 0
+    slow_calls: int = 0
+    plan: Optional[str] = None
+
+    @property
+    def avg_seconds(self) -> float:
+        return self.total_seconds / self.calls if self.calls else 0.0
+
+
+class QueryStats:
+    def __init__(self, max_entries: int = 500):
+        self.max_entries = max_entries
+        self.entries: Dict[str, QueryStat] = {}
+        self.dropped = 0
+
+    def record(self, query: str, seconds: float, rows: int = 0) -> Optional[QueryStat]:
+        """Returns ``None`` once ``max_entries`` distinct statements are tracked and this one is new."""
+        sql = normalize_sql(query)
+        stat = self.entries.get(sql)
+        if stat is None:
+            # Normalization keeps this small; the cap guards against dynamically built SQL.
+            if len(self.entries) >= self.max_entries:
+                self.dropped += 1
+                return None
+            stat = self.entries[sql] = QueryStat(sql)
+        stat.calls += 1
+        stat.total_seconds += seconds
+        stat.max_seconds = max(stat.max_seconds, seconds)
+        stat.rows += rows
+        return stat
+
+    def top(self, limit: int = 10, key: str = "total") -> List[QueryStat]:
+        sort_key = {
+            "total": lambda s: s.total_seconds,
+            "max": lambda s: s.max_seconds,
+            "calls": lambda s: s.calls,
+            "avg": lambda s: s.avg_seconds,
+        }[key]
+        return sorted(self.entries.values(), key=sort_key, reverse=True)[:limit]
+
+    def reset(self) -> None:
+        self.entries.clear()
+        self.dropped = 0
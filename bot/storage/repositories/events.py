@@ -1,8 +1,8 @@
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import Iterable, List, Optional
 
-from ...models import Event
+from ...models import Event, EventCard, Registration
 from ..db import Database
 
 
@@ -37,6 +37,40 @@ class EventRepository:
             max_seats=row["max_seats"],
         )
 
+    async def get_card(self, event_id: str, user_id: int) -> Optional[EventCard]:
+        """The event, its active registration count and ``user_id``'s registration, in one statement."""
+        row = await self.db.fetchone(
+            """
+            SELECT e.*,
+                   (SELECT COUNT(*) FROM registrations
+                     WHERE event_id = e.event_id AND status NOT IN ('cancelled', 'canceled')) AS taken,
+                   r.id AS reg_id, r.status AS reg_status, r.reg_time AS reg_time
+              FROM events e
+              LEFT JOIN registrations r ON r.event_id = e.event_id AND r.user_id = ?
+             WHERE e.event_id = ?
+            """,
+            (user_id, event_id),
+        )
+        if not row:
+            return None
+        event = Event(
+            event_id=row["event_id"],
+            name=row["name"],
+            datetime_str=row["datetime_str"],
+            description=row["description"],
+            max_seats=row["max_seats"],
+        )
+        registration = None
+        if row["reg_id"] is not None:
+            registration = Registration(
+                id=row["reg_id"],
+                user_id=user_id,
+                event_id=event_id,
+                status=row["reg_status"],
+                reg_time=row["reg_time"],
+            )
+        return EventCard(event=event, taken=row["taken"], registration=registration)
+
     async def add(self, event: Event):
         await self.db.execute(
             """
@@ -52,6 +86,16 @@ class EventRepository:
             ),
         )
 
+    async def add_many(self, events: Iterable[Event]) -> int:
+        """Bulk insert; events that already exist are left untouched. Returns rows inserted."""
+        return await self.db.executemany(
+            """
+            INSERT OR IGNORE INTO events (event_id, name, datetime_str, description, max_seats)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            [(e.event_id, e.name, e.datetime_str, e.description, e.max_seats) for e in events],
+        )
+
     async def update(self, event: Event):
         await self.db.execute(
             """
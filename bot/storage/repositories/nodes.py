@@ -90,8 +90,7 @@ class NodeRepository:
             )
             return node.id
         else:
-            conn = await self.db.connect()
-            cursor = await conn.execute(
+            return await self.db.insert(
                 """
                 INSERT INTO nodes (parent_id, key, title, content, url, order_index, is_main_menu)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
@@ -106,9 +105,6 @@ class NodeRepository:
                     1 if node.is_main_menu else 0,
                 ),
             )
-            node_id = cursor.lastrowid
-            await conn.commit()
-            return node_id
 
     async def list_all_nodes(self) -> List[Node]:
         rows = await self.db.fetchall(
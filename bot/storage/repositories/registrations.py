@@ -1,8 +1,8 @@
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
 
-from ...models import Registration
+from ...models import Event, Registration
 from ..db import Database
 
 
@@ -40,6 +40,58 @@ class RegistrationRepository:
             for row in rows
         ]
 
+    async def list_upcoming_by_user(
+        self, user_id: int, now: str, after_event_id: Optional[str] = None, limit: int = 10
+    ) -> List[Tuple[Registration, Event]]:
+        """Active registrations of the user for events starting after ``now``, soonest first, with their events.
+
+        Keyset pagination: pass the last event_id of the previous page as ``after_event_id``. If that
+        event has been deleted meanwhile, the first page comes back rather than an empty one.
+        """
+        after = ""
+        params: List[Any] = [user_id, now, limit]
+        if after_event_id is not None:
+            after = """
+               AND NOT EXISTS (
+                   SELECT 1 FROM events c
+                    WHERE c.event_id = ?4 AND (c.datetime_str, c.event_id) >= (e.datetime_str, e.event_id)
+               )"""
+            params.append(after_event_id)
+        rows = await self.db.fetchall(
+            f"""
+            SELECT r.id, r.user_id, r.status, r.reg_time,
+                   e.event_id, e.name, e.datetime_str, e.description, e.max_seats
+              FROM registrations r
+              JOIN events e ON e.event_id = r.event_id
+             WHERE r.user_id = ?1
+               AND r.status NOT IN ('cancelled', 'canceled')
+               AND e.datetime_str > ?2
+               {after}
+             ORDER BY e.datetime_str, e.event_id
+             LIMIT ?3
+            """,
+            params,
+        )
+        return [
+            (
+                Registration(
+                    id=row["id"],
+                    user_id=row["user_id"],
+                    event_id=row["event_id"],
+                    status=row["status"],
+                    reg_time=row["reg_time"],
+                ),
+                Event(
+                    event_id=row["event_id"],
+                    name=row["name"],
+                    datetime_str=row["datetime_str"],
+                    description=row["description"],
+                    max_seats=row["max_seats"],
+                ),
+            )
+            for row in rows
+        ]
+
     async def get(self, user_id: int, event_id: str) -> Optional[Registration]:
         row = await self.db.fetchone(
             "SELECT * FROM registrations WHERE user_id = ? AND event_id = ?",
@@ -71,6 +123,63 @@ class RegistrationRepository:
         row = await self.db.fetchone("SELECT last_insert_rowid() AS id")
         return int(row["id"]) if row else 0
 
+    async def add_many(self, registrations: Iterable[Registration]) -> int:
+        """Bulk insert skipping duplicates and rows whose user/event does not exist.
+
+        Returns rows inserted.
+        """
+        # INSERT OR IGNORE does not swallow FOREIGN KEY failures, hence the EXISTS guards.
+        return await self.db.executemany(
+            """
+            INSERT OR IGNORE INTO registrations (user_id, event_id, status, reg_time)
+            SELECT ?1, ?2, ?3, ?4
+             WHERE EXISTS (SELECT 1 FROM users WHERE user_id = ?1)
+               AND EXISTS (SELECT 1 FROM events WHERE event_id = ?2)
+            """,
+            [(r.user_id, r.event_id, r.status, r.reg_time) for r in registrations],
+        )
+
+    async def claim_seat(self, registration: Registration) -> bool:
+        """Insert ``registration`` (or reactivate the user's cancelled one) only while the event has a free seat.
+
+        The seat count and the write are one statement each, so SQLite holds the write lock across
+        both and concurrent registrations cannot overbook, in this process or another. False when
+        the event is full or missing, or the user already has an active registration for it.
+        """
+        params = (registration.user_id, registration.event_id, registration.status, registration.reg_time)
+        seat_free = """
+            (SELECT COUNT(*) FROM registrations WHERE event_id = ?2 AND status NOT IN ('cancelled', 'canceled'))
+            < (SELECT max_seats FROM events WHERE event_id = ?2)
+        """
+        inserted = await self.db.execute(
+            f"""
+            INSERT INTO registrations (user_id, event_id, status, reg_time)
+            SELECT ?1, ?2, ?3, ?4
+             WHERE NOT EXISTS (SELECT 1 FROM registrations WHERE user_id = ?1 AND event_id = ?2)
+               AND {seat_free}
+            """,
+            params,
+        )
+        if inserted:
+            return True
+        reactivated = await self.db.execute(
+            f"""
+            UPDATE registrations SET status = ?3, reg_time = ?4
+             WHERE user_id = ?1 AND event_id = ?2 AND status IN ('cancelled', 'canceled')
+               AND {seat_free}
+            """,
+            params,
+        )
+        return reactivated > 0
+
+    async def set_status_if_active(self, reg_id: int, status: str) -> bool:
+        """Change the status of a registration that is not cancelled; False if it is (or is gone)."""
+        changed = await self.db.execute(
+            "UPDATE registrations SET status = ? WHERE id = ? AND status NOT IN ('cancelled', 'canceled')",
+            (status, reg_id),
+        )
+        return changed > 0
+
     async def update_status(self, reg_id: int, status: str):
         await self.db.execute(
             "UPDATE registrations SET status = ? WHERE id = ?", (status, reg_id)
@@ -81,3 +190,18 @@ class RegistrationRepository:
             "DELETE FROM registrations WHERE event_id = ?", (event_id,)
         )
 
+    async def iter_export_rows(self, batch_size: int = 1000) -> AsyncIterator[List[Dict[str, Any]]]:
+        # One JOIN instead of "list events -> list regs -> get user" per row.
+        async for rows in self.db.iterate(
+            """
+            SELECT r.event_id, e.name AS event_name, r.user_id,
+                   COALESCE(u.full_name, '') AS full_name, COALESCE(u.email, '') AS email,
+                   r.status, r.reg_time
+              FROM registrations r
+              JOIN events e ON e.event_id = r.event_id
+              LEFT JOIN users u ON u.user_id = r.user_id
+             ORDER BY e.datetime_str, r.event_id, r.id
+            """,
+            batch_size=batch_size,
+        ):
+            yield [dict(row) for row in rows]
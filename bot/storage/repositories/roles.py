@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Optional, List
+from typing import Dict, Iterable, Optional, List
 
 from ...constants import Role
 from ..db import Database
@@ -35,3 +35,28 @@ class RoleRepository:
         rows = await self.db.fetchall("SELECT user_id, role FROM roles")
         return [(row["user_id"], Role(row["role"])) for row in rows]
 
+    async def list_elevated(self) -> Dict[int, Role]:
+        """Everyone above the default role (a handful of rows, unlike the full table)."""
+        rows = await self.db.fetchall("SELECT user_id, role FROM roles WHERE role != ?", (Role.USER.value,))
+        result: Dict[int, Role] = {}
+        for row in rows:
+            try:
+                result[row["user_id"]] = Role(row["role"])
+            except ValueError:
+                continue
+        return result
+
+    async def get_roles(self, user_ids: Iterable[int]) -> Dict[int, Role]:
+        """Roles for the given users in one query; users without a row are omitted."""
+        ids = list(user_ids)
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        rows = await self.db.fetchall(f"SELECT user_id, role FROM roles WHERE user_id IN ({placeholders})", ids)
+        result: Dict[int, Role] = {}
+        for row in rows:
+            try:
+                result[row["user_id"]] = Role(row["role"])
+            except ValueError:
+                result[row["user_id"]] = Role.USER
+        return result
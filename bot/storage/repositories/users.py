@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Optional, List
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, List
 
 from ...models import User, utcnow_str
 from ...constants import Role
@@ -41,6 +41,34 @@ class UserRepository:
         )
         return await self.get_user(user_id)  # type: ignore
 
+    async def upsert_many(self, users: Iterable[User]) -> int:
+        """Bulk insert/update of identity fields; new users get the default role.
+
+        Consent and existing roles are never touched. Returns the number of users written.
+        """
+        users = list(users)
+        now = utcnow_str()
+        written = await self.db.executemany(
+            """
+            INSERT INTO users (user_id, username, full_name, email, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE
+               SET username = excluded.username,
+                   full_name = excluded.full_name,
+                   email = excluded.email,
+                   updated_at = excluded.updated_at
+            """,
+            [
+                (u.user_id, u.username, u.full_name, u.email, u.created_at or now, now)
+                for u in users
+            ],
+        )
+        await self.db.executemany(
+            "INSERT OR IGNORE INTO roles (user_id, role) VALUES (?, ?)",
+            [(u.user_id, Role.USER.value) for u in users],
+        )
+        return written
+
     async def get_user(self, user_id: int) -> Optional[User]:
         row = await self.db.fetchone(
             "SELECT * FROM users WHERE user_id = ?", (user_id,)
@@ -110,3 +138,14 @@ class UserRepository:
             for row in rows
         ]
 
+    async def iter_export_rows(self, batch_size: int = 1000) -> AsyncIterator[List[Dict[str, Any]]]:
+        async for rows in self.db.iterate(
+            """
+            SELECT user_id, COALESCE(username, '') AS username, COALESCE(full_name, '') AS full_name,
+                   COALESCE(email, '') AS email, consent, consent_time
+              FROM users
+             ORDER BY user_id
+            """,
+            batch_size=batch_size,
+        ):
+            yield [dict(row, consent=bool(row["consent"])) for row in rows]
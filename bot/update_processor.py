@@ -0,0 +1,105 @@
+"""Concurrent update handling that keeps every user's updates in order.
+
+PTB runs handlers one update at a time by default, so a slow admin export or broadcast stalls
+everybody. ``KeyedUpdateProcessor`` runs updates of different users concurrently (up to
+``MAX_CONCURRENT_UPDATES`` at once) while updates of the same user still run strictly one after
+another in arrival order. That is exactly what the per-user ``ConversationHandler`` flows need:
+their state is keyed by user, and a user's next step never starts before the previous one ended.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Dict, Hashable, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+def update_key(update: object) -> Optional[Hashable]:
+    """Serialization key: the sender (falling back to the chat), ``None`` for anonymous updates."""
+    if not isinstance(update, Update):
+        return None
+    if update.effective_user is not None:
+        return update.effective_user.id
+    if update.effective_chat is not None:
+        return ("chat", update.effective_chat.id)
+    return None
+
+
+class KeyedUpdateProcessor(BaseUpdateProcessor):
+    """Serial per user, parallel across users, with a global concurrency cap."""
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        # Updates holding or waiting for each lock; the lock is dropped when it reaches zero.
+        self._users: Dict[Hashable, int] = {}
+        self._changed = asyncio.Event()
+        self.pending = 0
+        self.active = 0
+        self.peak_active = 0
+        self.processed = 0
+
+    async def process_update(self, update: object, coroutine: Awaitable[Any]) -> None:  # type: ignore[misc]
+        # The base class takes a global slot first and only then calls do_process_update. Here the
+        # per-user lock comes first: otherwise a burst from one user would fill every global slot
+        # with updates that just wait for that user's lock, and everyone else would wait too.
+        # No await happens before lock.acquire(), so tasks queue on the lock in arrival order.
+        self.pending += 1
+        key = update_key(update)
+        lock: Optional[asyncio.Lock] = None
+        if key is not None:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = asyncio.Lock()
+            self._users[key] = self._users.get(key, 0) + 1
+        try:
+            if lock is not None:
+                async with lock:
+                    await self._run(update, coroutine)
+            else:
+                await self._run(update, coroutine)
+        finally:
+            if key is not None:
+                self._users[key] -= 1
+                if not self._users[key]:
+                    del self._users[key]
+                    del self._locks[key]
+            self.pending -= 1
+            self._changed.set()
+
+    async def _run(self, update: object, coroutine: Awaitable[Any]) -> None:
+        async with self._semaphore:
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+            try:
+                await self.do_process_update(update, coroutine)
+            finally:
+                self.active -= 1
+                self.processed += 1
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        await coroutine
+
+    async def wait_for_room(self, limit: int) -> None:
+        """Block while ``limit`` or more updates are admitted but not finished (ingress backpressure)."""
+        while self.pending >= limit:
+            self._changed.clear()
+            await self._changed.wait()
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "limit": self.max_concurrent_updates,
+            "active": self.active,
+            "pending": self.pending,
+            "peak_active": self.peak_active,
+            "processed": self.processed,
+            "users": len(self._locks),
+        }
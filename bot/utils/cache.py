@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+_MISSING = object()
+
+# In multi-process mode (bot.workers) every process shares one counter: any invalidation bumps it
+# and every cache in every process drops its entries on the next read. Coarse, but invalidations
+# are rare admin edits while reads are constant.
+_shared_generation: Optional[Any] = None
+
+
+def use_shared_generation(counter: Any) -> None:
+    """Install a ``multiprocessing.Value('q')`` shared by all worker processes."""
+    global _shared_generation
+    _shared_generation = counter
+
+
+def _generation() -> int:
+    return _shared_generation.value if _shared_generation is not None else 0
+
+
+class TTLCache:
+    """Small in-process cache with per-entry expiry, LRU bound and hit/miss counters.
+
+    Not thread-safe: meant for the single event loop the bot runs on.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._generation = _generation()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if self._generation != _generation():
+            self._data.clear()
+            self._generation = _generation()
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING or entry[0] < time.monotonic():
+            if entry is not _MISSING:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable = _MISSING) -> None:
+        """Drop one key, or everything when called without arguments."""
+        if key is _MISSING:
+            self._data.clear()
+        else:
+            self._data.pop(key, None)
+        if _shared_generation is not None:
+            with _shared_generation.get_lock():
+                _shared_generation.value += 1
+            self._generation = _shared_generation.value
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
@@ -9,3 +9,7 @@ class PermissionDenied(BotError):
 class ValidationError(BotError):
     """Raised when input fails validation."""
 
+
+class RestartInProgress(BotError):
+    """Raised when a heavy job is started while the bot drains before a restart."""
+
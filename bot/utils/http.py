@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_COUNT = 100
+DEFAULT_MAX_BODY = 1024 * 1024
+KEEPALIVE_TIMEOUT = 30.0
+
+
+@dataclass
+class HttpRequest:
+    method: str
+    path: str
+    query: Dict[str, list[str]]
+    headers: Dict[str, str]
+    body: bytes = b""
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+
+@dataclass
+class HttpResponse:
+    status: int = 200
+    body: bytes = b""
+    content_type: str = "text/plain; charset=utf-8"
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def text(cls, status: int, text: str = "") -> "HttpResponse":
+        return cls(status=status, body=(text or HTTPStatus(status).phrase).encode("utf-8"))
+
+    @classmethod
+    def json(cls, payload: Any, status: int = 200) -> "HttpResponse":
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        return cls(status=status, body=body, content_type="application/json")
+
+
+Handler = Callable[[HttpRequest], Awaitable[HttpResponse]]
+
+
+class HttpServer:
+    """Minimal HTTP/1.1 server on asyncio streams (keep-alive, Content-Length bodies only).
+
+    Enough for webhook/metrics endpoints behind a reverse proxy without pulling in a web framework.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, max_body: int = DEFAULT_MAX_BODY):
+        self.host = host
+        self.port = port
+        self.max_body = max_body
+        self._routes: Dict[Tuple[str, str], Handler] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: set[asyncio.Task] = set()
+
+    def add_route(self, method: str, path: str, handler: Handler) -> None:
+        self._routes[(method.upper(), path)] = handler
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._serve_connection, self.host, self.port)
+        # Port 0 means "any free port": report the real one.
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("HTTP server listening on %s:%s", self.host, self.port)
+
+    async def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _dispatch(self, request: HttpRequest) -> HttpResponse:
+        handler = self._routes.get((request.method, request.path))
+        if handler is None:
+            if any(path == request.path for _, path in self._routes):
+                return HttpResponse.text(405)
+            return HttpResponse.text(404)
+        try:
+            return await handler(request)
+        except Exception:
+            logger.exception("HTTP handler failed for %s %s", request.method, request.path)
+            return HttpResponse.text(500)
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        if task is not None:
+            self._connections.add(task)
+        try:
+            while True:
+                try:
+                    request, keep_alive = await asyncio.wait_for(self._read_request(reader), KEEPALIVE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except _BadRequest as exc:
+                    await self._write_response(writer, HttpResponse.text(exc.status), keep_alive=False)
+                    return
+                if request is None:
+                    return
+                response = await self._dispatch(request)
+                await self._write_response(writer, response, keep_alive)
+                if not keep_alive:
+                    return
+        except asyncio.CancelledError:
+            # stop() cancels idle keep-alive connections; the task simply ends.
+            return
+        finally:
+            if task is not None:
+                self._connections.discard(task)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Tuple[Optional[HttpRequest], bool]:
+        line = await reader.readline()
+        if not line:
+            return None, False
+        try:
+            method, target, version = line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+        except ValueError:
+            raise _BadRequest(400) from None
+
+        headers: Dict[str, str] = {}
+        while True:
+            raw = await reader.readline()
+            if raw in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADER_COUNT:
+                raise _BadRequest(431)
+            name, _, value = raw.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise _BadRequest(411)
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise _BadRequest(400) from None
+        if length < 0:
+            raise _BadRequest(400)
+        if length > self.max_body:
+            raise _BadRequest(413)
+        body = await reader.readexactly(length) if length else b""
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        url = urlsplit(target)
+        return HttpRequest(method.upper(), url.path, parse_qs(url.query), headers, body), keep_alive
+
+    @staticmethod
+    async def _write_response(writer: asyncio.StreamWriter, response: HttpResponse, keep_alive: bool) -> None:
+        reason = HTTPStatus(response.status).phrase
+        head = [
+            f"HTTP/1.1 {response.status} {reason}",
+            f"Content-Type: {response.content_type}",
+            f"Content-Length: {len(response.body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        head += [f"{name}: {value}" for name, value in response.headers.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + response.body)
+        await writer.drain()
+
+
+class _BadRequest(Exception):
+    def __init__(self, status: int):
+        super().__init__(status)
+        self.status = status
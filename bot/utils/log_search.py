@@ -0,0 +1,329 @@
+"""Search across the bot's log files: ``/admin_logs level=ERROR since=1h grep=timeout user=123``.
+
+Searched: ``LOG_FILE``, the per-worker ``<name>.workerN<ext>`` files and their rotated backups
+(``.1`` .. ``.N``), written in either the text or the JSON log format.
+
+Every file gets a small sidecar index in ``<log dir>/.logindex/``: for each 5-minute bucket, the
+byte offset of its first record and which levels occur in it. A search only reads the buckets that
+can match ``since=`` and ``level=`` instead of every backup from the start. Indexes are named after
+the file's inode, so they stay valid when RotatingFileHandler renames ``bot.log`` to ``bot.log.1``,
+and the live file's index is extended from where it stopped.
+
+All of this is blocking file I/O: call it through ``asyncio.to_thread``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from typing import BinaryIO, Deque, Iterator, List, Optional, Sequence, Tuple
+
+from .errors import ValidationError
+
+BUCKET_SECONDS = 300
+INDEX_DIR = ".logindex"
+INDEX_VERSION = 1
+HEAD_BYTES = 256
+MAX_LIMIT = 200
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+_LEVEL_ALIASES = {"WARN": "WARNING", "FATAL": "CRITICAL"}
+_LEVEL_BITS = {name: 1 << i for i, name in enumerate(LEVELS)}
+
+_TEXT_HEAD = re.compile(rb"(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d),\d{3} \[([A-Z]+)\] ")
+_JSON_HEAD = re.compile(rb'\{"ts": "([^"]+)", "level": "([A-Z]+)"')
+_DURATION = re.compile(r"(\d+)([smhd])")
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+_BACKUP_SUFFIX = re.compile(r"\.\d+")
+
+
+@dataclass
+class LogQuery:
+    level: Optional[str] = None
+    since: Optional[float] = None
+    grep: str = ""
+    user_id: Optional[int] = None
+    limit: int = 50
+
+    def level_mask(self) -> int:
+        if self.level is None:
+            return -1
+        floor = LEVELS[self.level]
+        return sum(bit for name, bit in _LEVEL_BITS.items() if LEVELS[name] >= floor)
+
+
+@dataclass
+class LogMatch:
+    ts: float
+    path: str
+    text: str
+
+
+@dataclass
+class SearchResult:
+    matches: List[LogMatch] = field(default_factory=list)
+    total: int = 0
+    files: int = 0
+    scanned_bytes: int = 0
+    total_bytes: int = 0
+
+
+def parse_query(args: Sequence[str], now: Optional[float] = None) -> LogQuery:
+    """``key=value`` words; words after ``grep=`` without a ``=`` continue the search text."""
+    now = time.time() if now is None else now
+    query = LogQuery()
+    key = None
+    for arg in args:
+        name, sep, value = arg.partition("=")
+        name = name.lower()
+        if sep and name in ("level", "since", "grep", "user", "limit"):
+            key = name
+        elif key == "grep":
+            query.grep = f"{query.grep} {arg}"
+            continue
+        else:
+            raise ValidationError(f"Непонятный параметр: {arg}")
+
+        if name == "level":
+            level = _LEVEL_ALIASES.get(value.upper(), value.upper())
+            if level not in LEVELS:
+                raise ValidationError(f"Уровень должен быть одним из: {', '.join(LEVELS)}")
+            query.level = level
+        elif name == "since":
+            query.since = _parse_since(value, now)
+        elif name == "grep":
+            query.grep = value
+        elif name == "user":
+            if not value.isdigit():
+                raise ValidationError("user= ожидает числовой Telegram ID")
+            query.user_id = int(value)
+        else:
+            if not value.isdigit() or not 1 <= int(value) <= MAX_LIMIT:
+                raise ValidationError(f"limit= ожидает число от 1 до {MAX_LIMIT}")
+            query.limit = int(value)
+    query.grep = query.grep.strip().lower()
+    return query
+
+
+def _parse_since(value: str, now: float) -> float:
+    match = _DURATION.fullmatch(value.lower())
+    if match:
+        return now - int(match.group(1)) * _UNITS[match.group(2)]
+    for fmt in ("%Y-%m-%d", "%Y-%m-%dT%H:%M", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            return time.mktime(time.strptime(value, fmt))
+        except ValueError:
+            continue
+    raise ValidationError("since= ожидает 30m, 2h, 1d или дату YYYY-MM-DD[THH:MM]")
+
+
+def log_files(log_file: str) -> List[str]:
+    """``LOG_FILE`` and worker logs with their backups, each family oldest backup first."""
+    directory = os.path.dirname(log_file) or "."
+    root, ext = os.path.splitext(os.path.basename(log_file))
+    worker = re.compile(re.escape(root) + r"\.worker\d+" + re.escape(ext))
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    bases = [os.path.basename(log_file)] + sorted(name for name in names if worker.fullmatch(name))
+    files: List[str] = []
+    for base in bases:
+        backups = [name for name in names if name.startswith(base) and _BACKUP_SUFFIX.fullmatch(name[len(base) :])]
+        backups.sort(key=lambda name: int(name[len(base) + 1 :]), reverse=True)
+        files += [os.path.join(directory, name) for name in backups + [base] if name in names]
+    return files
+
+
+def search_logs(log_file: str, query: LogQuery) -> SearchResult:
+    result = SearchResult()
+    found: List[LogMatch] = []
+    for path in log_files(log_file):
+        try:
+            index = load_index(path)
+        except OSError:
+            continue
+        result.files += 1
+        result.total_bytes += index.indexed
+        matches: Deque[LogMatch] = deque(maxlen=query.limit)
+        with open(path, "rb") as f:
+            for start, end in index.ranges(query.since, query.level_mask()):
+                result.scanned_bytes += end - start
+                for ts, level, raw in _records(f, start, end):
+                    if _matches(query, ts, level, raw):
+                        result.total += 1
+                        matches.append(LogMatch(ts, path, raw.decode("utf-8", errors="replace").rstrip("\n")))
+        found += matches
+    found.sort(key=lambda match: match.ts)
+    result.matches = found[-query.limit :]
+    _prune_indexes(os.path.dirname(log_file) or ".")
+    return result
+
+
+def _matches(query: LogQuery, ts: float, level: str, raw: bytes) -> bool:
+    if query.since is not None and ts < query.since:
+        return False
+    if query.level is not None and LEVELS.get(level, 0) < LEVELS[query.level]:
+        return False
+    if query.user_id is not None and not re.search(rb'\buser_id(?:=|": )%d\b' % query.user_id, raw):
+        return False
+    return not query.grep or query.grep in raw.decode("utf-8", errors="replace").lower()
+
+
+def _records(f: BinaryIO, start: int, end: int) -> Iterator[Tuple[float, str, bytes]]:
+    """Records in ``[start, end)``; lines without a header (tracebacks) belong to the record above."""
+    f.seek(start)
+    offset = start
+    current: Optional[Tuple[float, str]] = None
+    lines: List[bytes] = []
+    while offset < end:
+        line = f.readline()
+        if not line:
+            break
+        offset += len(line)
+        head = _parse_head(line)
+        if head is not None:
+            if current is not None:
+                yield current[0], current[1], b"".join(lines)
+            current, lines = head, [line]
+        elif current is not None:
+            lines.append(line)
+    if current is not None:
+        yield current[0], current[1], b"".join(lines)
+
+
+def _parse_head(line: bytes) -> Optional[Tuple[float, str]]:
+    match = _TEXT_HEAD.match(line)
+    if match is not None:
+        return _local_time(match.group(1)), match.group(2).decode()
+    match = _JSON_HEAD.match(line)
+    if match is not None:
+        try:
+            return datetime.fromisoformat(match.group(1).decode()).timestamp(), match.group(2).decode()
+        except ValueError:
+            return None
+    return None
+
+
+def _local_time(stamp: bytes) -> float:
+    # strptime is slow and consecutive records share the minute: parse each minute once.
+    return _local_minute(stamp[:16]) + int(stamp[17:19])
+
+
+@lru_cache(maxsize=4096)
+def _local_minute(stamp: bytes) -> float:
+    return time.mktime(time.strptime(stamp.decode(), "%Y-%m-%d %H:%M"))
+
+
+@dataclass
+class LogIndex:
+    path: str
+    index_path: str
+    head: str = ""
+    head_len: int = 0
+    indexed: int = 0
+    # [bucket start (unix time), offset of its first record, bit mask of levels seen]
+    buckets: List[List[int]] = field(default_factory=list)
+
+    def ranges(self, since: Optional[float], level_mask: int) -> List[Tuple[int, int]]:
+        """Byte ranges holding every record that can match; adjacent ones are merged."""
+        ranges: List[Tuple[int, int]] = []
+        for i, (bucket, offset, levels) in enumerate(self.buckets):
+            # Records before a bucket's successor are never newer than the bucket itself.
+            if since is not None and bucket + BUCKET_SECONDS <= since:
+                continue
+            if not levels & level_mask:
+                continue
+            end = self.buckets[i + 1][1] if i + 1 < len(self.buckets) else self.indexed
+            if ranges and ranges[-1][1] == offset:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((offset, end))
+        return ranges
+
+    def extend(self, size: int) -> None:
+        with open(self.path, "rb") as f:
+            if not self.head_len:
+                chunk = f.read(HEAD_BYTES)
+                self.head, self.head_len = _digest(chunk), len(chunk)
+            f.seek(self.indexed)
+            offset = self.indexed
+            for line in f:
+                if not line.endswith(b"\n") or offset >= size:
+                    # A record still being written: picked up by the next search.
+                    break
+                head = _parse_head(line)
+                if head is not None:
+                    bucket = int(head[0]) // BUCKET_SECONDS * BUCKET_SECONDS
+                    bit = _LEVEL_BITS.get(head[1], 0)
+                    # Timestamps can step back a little; such records join the bucket before them.
+                    if self.buckets and bucket <= self.buckets[-1][0]:
+                        self.buckets[-1][2] |= bit
+                    else:
+                        self.buckets.append([bucket, offset, bit])
+                offset += len(line)
+            self.indexed = offset
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        payload = {
+            "version": INDEX_VERSION,
+            "head": self.head,
+            "head_len": self.head_len,
+            "indexed": self.indexed,
+            "buckets": self.buckets,
+        }
+        tmp = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f, separators=(",", ":"))
+        os.replace(tmp, self.index_path)
+
+
+def load_index(path: str) -> LogIndex:
+    """The file's index, brought up to date (built from scratch for a new or rewritten file)."""
+    st = os.stat(path)
+    index_path = os.path.join(os.path.dirname(path) or ".", INDEX_DIR, f"{st.st_dev}-{st.st_ino}.json")
+    index = LogIndex(path, index_path)
+    try:
+        with open(index_path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = None
+    if data and data.get("version") == INDEX_VERSION and data["indexed"] <= st.st_size:
+        with open(path, "rb") as f:
+            # A reused inode or a truncated file shows up as a different beginning.
+            if _digest(f.read(data["head_len"])) == data["head"]:
+                index.head, index.head_len = data["head"], data["head_len"]
+                index.indexed, index.buckets = data["indexed"], data["buckets"]
+    if index.indexed < st.st_size:
+        indexed = index.indexed
+        index.extend(st.st_size)
+        if index.indexed != indexed:
+            index.save()
+    return index
+
+
+def _digest(chunk: bytes) -> str:
+    return hashlib.sha1(chunk).hexdigest()
+
+
+def _prune_indexes(directory: str) -> None:
+    index_dir = os.path.join(directory, INDEX_DIR)
+    try:
+        live = set()
+        for entry in os.scandir(directory):
+            if entry.is_file():
+                st = entry.stat()
+                live.add(f"{st.st_dev}-{st.st_ino}.json")
+        for entry in os.scandir(index_dir):
+            if entry.name.endswith(".json") and entry.name not in live:
+                os.remove(entry.path)
+    except OSError:
+        pass
@@ -0,0 +1,193 @@
+"""Tiny Prometheus-style metrics: counters, gauges and fixed-bucket histograms.
+
+Hand-rolled instead of depending on prometheus_client: the bot needs a dozen series, and
+recording must stay a dict lookup plus a few additions so it can run on every update and every
+SQL statement. Label values are passed positionally in ``labelnames`` order.
+``REGISTRY.render()`` produces the text exposition format served on ``/metrics`` (bot.metrics).
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# Seconds; covers a fast cache hit up to a broadcast-sized handler.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def format_samples(
+    name: str, kind: str, help_text: str, labelnames: Sequence[str], samples: Iterable[Tuple[Labels, float]]
+) -> List[str]:
+    """Render a metric whose values are collected at scrape time (gauges read from live objects)."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines += [f"{name}{format_labels(labelnames, labels)} {_number(value)}" for labels, value in samples]
+    return lines
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self.values: Dict[Labels, float] = {}
+        if not self.labelnames:
+            # Unlabelled series are exported as 0 from the start instead of appearing later.
+            self.values[()] = 0
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self.values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        return format_samples(self.name, self.kind, self.help, self.labelnames, sorted(self.values.items()))
+
+    def reset(self) -> None:
+        self.values.clear()
+        if not self.labelnames:
+            self.values[()] = 0
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        self.values[labels] = value
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: per-bucket (non-cumulative) counts with +Inf last, sum, count.
+        self.series: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def count(self, *labels: str) -> int:
+        series = self.series.get(labels)
+        return int(series[-1]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        bounds = [_number(bound) for bound in self.buckets] + ["+Inf"]
+        for labels, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, hits in zip(bounds, series):
+                cumulative += hits
+                le = 'le="' + bound + '"'
+                lines.append(f"{self.name}_bucket{format_labels(self.labelnames, labels, le)} {int(cumulative)}")
+            label_text = format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{label_text} {int(series[-1])}")
+        return lines
+
+    def reset(self) -> None:
+        self.series.clear()
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labelnames))  # type: ignore[return-value]
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help_text, labelnames))  # type: ignore[return-value]
+
+    def histogram(
+        self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, help_text, labelnames, buckets))  # type: ignore[return-value]
+
+    def render(self) -> List[str]:
+        lines: List[str] = []
+        for metric in self.metrics.values():
+            lines += metric.render()
+        return lines
+
+    def reset(self) -> None:
+        for metric in self.metrics.values():
+            metric.reset()
+
+
+REGISTRY = Registry()
+
+UPDATE_SECONDS = REGISTRY.histogram("bot_update_duration_seconds", "Wall time per handled update.")
+HANDLER_SECONDS = REGISTRY.histogram("bot_handler_duration_seconds", "Wall time per handler call.", ("handler",))
+HANDLER_FAILURES = REGISTRY.counter("bot_handler_failures_total", "Handler calls that raised.", ("handler",))
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    "bot_db_query_duration_seconds",
+    "SQLite statement time by statement kind.",
+    ("op",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+DB_SLOW_QUERIES = REGISTRY.counter("bot_db_slow_queries_total", "Statements slower than SLOW_QUERY_MS.")
+API_SECONDS = REGISTRY.histogram("bot_telegram_api_duration_seconds", "Bot API call time.", ("method",))
+API_THROTTLED = REGISTRY.counter("bot_telegram_api_throttled_total", "Bot API calls answered 429.", ("method",))
+API_ERRORS = REGISTRY.counter(
+    "bot_telegram_api_errors_total", "Bot API calls that failed (network or HTTP >= 400).", ("method",)
+)
+BROADCAST_PENDING = REGISTRY.gauge(
+    "bot_broadcast_pending_messages", "Messages still to be sent by running broadcasts and reminders."
+)
+LOOP_LAG_SECONDS = REGISTRY.histogram(
+    "bot_event_loop_lag_seconds",
+    "How late the event loop woke up a periodic probe.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+LOOP_STALLS = REGISTRY.counter("bot_event_loop_stalls_total", "Probe wake-ups at least LOOP_STALL_MS late.")
+SHED_UPDATES = REGISTRY.counter("bot_updates_shed_total", "Updates answered \"busy\" by load shedding.")
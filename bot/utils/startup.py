@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+
+
+class StartupProfiler:
+    """Collect wall time per boot phase so slow restarts can be attributed."""
+
+    def __init__(self):
+        self.phases: List[Tuple[str, float]] = []
+        self.notes: List[str] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def note(self, text: str) -> None:
+        self.notes.append(text)
+
+    @property
+    def total(self) -> float:
+        return sum(seconds for _, seconds in self.phases)
+
+    def report(self) -> str:
+        width = max([len(name) for name, _ in self.phases] + [5])
+        lines = [f"{'phase':<{width}}  {'ms':>9}"]
+        lines += [f"{name:<{width}}  {seconds * 1000:>9.1f}" for name, seconds in self.phases]
+        lines.append(f"{'total':<{width}}  {self.total * 1000:>9.1f}")
+        lines += [f"- {text}" for text in self.notes]
+        return "\n".join(lines)
+
+    def summary(self) -> str:
+        """One-line form for the log."""
+        return ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.phases)
@@ -0,0 +1,82 @@
+"""Per-update counters shared by every layer an update passes through.
+
+``bot.instrumentation`` opens an ``UpdateTrace`` when an update starts. The database and the Bot
+API request layer bump its counters through a context variable, so nothing has to be threaded
+through service signatures. Outside an update (jobs, startup) the ``note_*`` calls are no-ops.
+
+Each update also gets a correlation id for log records. Tasks started while handling it (a
+restart, a slow-query EXPLAIN) copy the context and log under the same id after it is done.
+"""
+
+from __future__ import annotations
+
+import time
+import uuid
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+@dataclass
+class HandlerSpan:
+    name: str
+    seconds: float
+    db_statements: int
+    api_calls: int
+    failed: bool = False
+
+
+@dataclass
+class UpdateTrace:
+    update_id: Optional[int] = None
+    user_id: Optional[int] = None
+    started: float = field(default_factory=time.perf_counter)
+    db_statements: int = 0
+    db_seconds: float = 0.0
+    api_calls: int = 0
+    api_seconds: float = 0.0
+    spans: List[HandlerSpan] = field(default_factory=list)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+_current: ContextVar[Optional[UpdateTrace]] = ContextVar("update_trace", default=None)
+_correlation: ContextVar[Optional[str]] = ContextVar("correlation_id", default=None)
+
+
+def current_trace() -> Optional[UpdateTrace]:
+    return _current.get()
+
+
+def begin_trace(update_id: Optional[int] = None, user_id: Optional[int] = None) -> UpdateTrace:
+    trace = UpdateTrace(update_id=update_id, user_id=user_id)
+    _current.set(trace)
+    _correlation.set(uuid.uuid4().hex[:12])
+    return trace
+
+
+def end_trace() -> Optional[UpdateTrace]:
+    trace = _current.get()
+    _current.set(None)
+    _correlation.set(None)
+    return trace
+
+
+def current_correlation_id() -> Optional[str]:
+    return _correlation.get()
+
+
+def note_db_statement(seconds: float) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.db_statements += 1
+        trace.db_seconds += seconds
+
+
+def note_api_call(seconds: float) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.api_calls += 1
+        trace.api_seconds += seconds
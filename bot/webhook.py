@@ -0,0 +1,139 @@
+"""Webhook ingress: Telegram POSTs updates to a local HTTP listener instead of being long-polled.
+
+Put it behind a TLS-terminating reverse proxy (nginx/caddy) and set ``WEBHOOK_URL`` to the public
+address; for local testing leave ``WEBHOOK_URL`` empty and POST recorded update JSON yourself:
+
+    curl -H "X-Telegram-Bot-Api-Secret-Token: $WEBHOOK_SECRET" -d @update.json http://127.0.0.1:8080/telegram
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hmac
+import logging
+import queue
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import Application
+
+from .config import Config
+from .lifecycle import install_stop_signals, start_application, stop_application
+from .utils.http import HttpRequest, HttpResponse, HttpServer
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+
+
+UpdateSink = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class WebhookServer:
+    """Verify, parse and enqueue webhook updates into ``app.update_queue`` (or a custom ``sink``).
+
+    When the queue already holds ``max_queue`` updates the request is answered with 503 and
+    Telegram redelivers it later, so a slow bot pushes back instead of buffering without bound.
+    A custom sink signals the same by raising ``asyncio.QueueFull`` or ``queue.Full``.
+    """
+
+    def __init__(
+        self,
+        app: Application,
+        secret_token: str,
+        listen: str = "127.0.0.1",
+        port: int = 8080,
+        path: str = "/telegram",
+        max_queue: int = 1000,
+        sink: Optional[UpdateSink] = None,
+    ):
+        self.app = app
+        self.sink = sink or self._enqueue
+        self.secret_token = secret_token.encode("utf-8")
+        self.max_queue = max_queue
+        self.path = path
+        self.accepted = 0
+        self.rejected = 0
+        self.http = HttpServer(listen, port)
+        self.http.add_route("POST", path, self._handle_update)
+
+    @classmethod
+    def from_config(cls, app: Application, config: Config, sink: Optional[UpdateSink] = None) -> "WebhookServer":
+        return cls(
+            app,
+            secret_token=config.webhook_secret,
+            listen=config.webhook_listen,
+            port=config.webhook_port,
+            path=config.webhook_path,
+            max_queue=config.webhook_max_queue,
+            sink=sink,
+        )
+
+    @property
+    def port(self) -> int:
+        return self.http.port
+
+    async def start(self) -> None:
+        await self.http.start()
+
+    async def stop(self) -> None:
+        await self.http.stop()
+
+    async def _handle_update(self, request: HttpRequest) -> HttpResponse:
+        given = request.headers.get(SECRET_HEADER, "").encode("utf-8")
+        if not hmac.compare_digest(given, self.secret_token):
+            logger.warning("Webhook request with a wrong secret token rejected")
+            return HttpResponse.text(403)
+        try:
+            data = request.json()
+        except ValueError:
+            return HttpResponse.text(400)
+        if not isinstance(data, dict) or "update_id" not in data:
+            return HttpResponse.text(400)
+        try:
+            await self.sink(data)
+        except (asyncio.QueueFull, queue.Full):
+            self.rejected += 1
+            return HttpResponse(status=503, headers={"Retry-After": "1"})
+        except (ValueError, TypeError, KeyError):
+            return HttpResponse.text(400)
+        self.accepted += 1
+        return HttpResponse(status=200)
+
+    async def _enqueue(self, data: Dict[str, Any]) -> None:
+        # With concurrent processing the queue drains into tasks at once: count those too.
+        processor = getattr(self.app, "update_processor", None)
+        if self.app.update_queue.qsize() + getattr(processor, "pending", 0) >= self.max_queue:
+            raise asyncio.QueueFull
+        update = Update.de_json(data, self.app.bot)
+        if update is None:
+            raise ValueError("empty update")
+        await self.app.update_queue.put(update)
+
+
+async def register_webhook(app: Application, config: Config) -> None:
+    if not config.webhook_url:
+        return
+    await app.bot.set_webhook(
+        url=config.webhook_url,
+        secret_token=config.webhook_secret,
+        allowed_updates=Update.ALL_TYPES,
+    )
+    logger.info("Webhook registered at %s", config.webhook_url)
+
+
+async def run_webhook(app: Application, config: Config, stop: Optional[asyncio.Event] = None) -> None:
+    """Same lifecycle as ``Application.run_polling``, with the webhook listener as the update source."""
+    if stop is None:
+        stop = asyncio.Event()
+        install_stop_signals(stop)
+    server = WebhookServer.from_config(app, config)
+    try:
+        await start_application(app)
+        await server.start()
+        await register_webhook(app, config)
+        logger.info("Webhook mode: listening on %s:%s%s", config.webhook_listen, server.port, config.webhook_path)
+        await stop.wait()
+    finally:
+        await server.stop()
+        await stop_application(app)
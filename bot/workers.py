@@ -0,0 +1,278 @@
+"""Scale-out mode: one ingress process talks to Telegram, N worker processes handle updates.
+
+The ingress is the only getUpdates consumer (or webhook listener), so there are no 409 Conflicts.
+Each update is routed by consistent hashing on the sender id, so a user's ``user_data`` and
+conversation state always live in the same worker. Workers share the SQLite file (WAL +
+busy_timeout) and a cache-generation counter, so an admin edit in one worker invalidates the
+caches of all of them.
+
+Enabled with ``WORKERS=N`` (N >= 1); ``WORKERS=0`` keeps the classic single-process mode.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import queue
+import signal
+from typing import Any, Dict, List, Optional, Sequence
+
+from telegram import Update
+from telegram.error import NetworkError, RetryAfter, TelegramError, TimedOut
+
+from .config import Config
+from .lifecycle import install_stop_signals, start_application, stop_application
+from .sharding import HashRing, shard_key
+from .update_processor import KeyedUpdateProcessor
+from .utils.cache import use_shared_generation
+
+logger = logging.getLogger(__name__)
+
+POLL_TIMEOUT = 30
+POLL_BACKOFF_MAX = 30.0
+# Longest a put blocks an executor thread before re-checking stop and the target worker.
+PUT_ATTEMPT_SECONDS = 1.0
+WORKER_JOIN_TIMEOUT = 15
+
+
+class ShardRouter:
+    """Route raw update payloads to per-worker queues."""
+
+    def __init__(self, queues: Sequence[Any], processes: Optional[Sequence[Any]] = None):
+        self.queues = list(queues)
+        # Worker processes by queue index, to notice a dead consumer while waiting for room.
+        self.processes = list(processes) if processes is not None else None
+        self.ring: HashRing[int] = HashRing(range(len(self.queues)))
+        self._round_robin = itertools.count()
+        self.routed = [0] * len(self.queues)
+
+    def route(self, update: Dict[str, Any]) -> int:
+        key = shard_key(update)
+        if key is None:
+            # No sender (e.g. poll updates): nothing to keep sticky, spread them evenly.
+            return next(self._round_robin) % len(self.queues)
+        return self.ring.node_for(key)
+
+    def put_nowait(self, update: Dict[str, Any]) -> None:
+        """Raises ``queue.Full`` when the target worker is saturated (webhook answers 503)."""
+        idx = self.route(update)
+        self.queues[idx].put_nowait(update)
+        self.routed[idx] += 1
+
+    async def put(self, update: Dict[str, Any], stop: Optional[asyncio.Event] = None) -> bool:
+        """Wait for room in the target worker's queue (polling simply stops fetching meanwhile).
+
+        Each attempt holds an executor thread for at most ``PUT_ATTEMPT_SECONDS``, so a worker that
+        died with a full queue cannot leave a thread blocked forever. Returns False without routing
+        the update when ``stop`` is set or the worker is gone; the caller leaves it unconfirmed and
+        Telegram delivers it again after the restart.
+        """
+        idx = self.route(update)
+        loop = asyncio.get_running_loop()
+        while not (stop is not None and stop.is_set()):
+            if self.processes is not None and self.processes[idx].exitcode is not None:
+                logger.warning("Worker %s is gone, update %s left for redelivery", idx, update.get("update_id"))
+                return False
+            try:
+                await loop.run_in_executor(None, self.queues[idx].put, update, True, PUT_ATTEMPT_SECONDS)
+            except queue.Full:
+                continue
+            self.routed[idx] += 1
+            return True
+        return False
+
+
+def _worker_main(index: int, inbox: Any, generation: Any) -> None:
+    # The ingress coordinates shutdown through the queue; a terminal Ctrl+C must not kill workers
+    # mid-update.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    use_shared_generation(generation)
+    from .main import build_application
+
+    app = build_application(worker_index=index)
+    asyncio.run(_run_worker(app, inbox))
+
+
+async def _run_worker(app, inbox: Any) -> None:
+    loop = asyncio.get_running_loop()
+    parent = multiprocessing.parent_process()
+    limit = app.bot_data["config"].worker_queue_size
+    try:
+        await start_application(app)
+        logger.info("Worker %s ready", app.bot_data.get("worker_index"))
+        while True:
+            # Leave updates in the shared queue while this worker is saturated, so the ingress
+            # feels the backpressure instead of the worker buffering unbounded tasks.
+            if isinstance(app.update_processor, KeyedUpdateProcessor):
+                await app.update_processor.wait_for_room(limit)
+            try:
+                data = await loop.run_in_executor(None, inbox.get, True, 1.0)
+            except queue.Empty:
+                if parent is not None and not parent.is_alive():
+                    logger.warning("Ingress process is gone, worker exits")
+                    break
+                continue
+            if data is None:
+                break
+            update = Update.de_json(data, app.bot)
+            if update is not None:
+                await app.update_queue.put(update)
+    finally:
+        # Application.stop() still processes everything already in update_queue.
+        await stop_application(app)
+
+
+class UpdatePoller:
+    """The only getUpdates consumer; ``offset`` is the first update id not yet handed to a worker."""
+
+    def __init__(self, app, router: ShardRouter, stop: asyncio.Event):
+        self.bot = app.bot
+        self.router = router
+        self.stop = stop
+        self.offset: Optional[int] = None
+        # True while parked in the long poll, the only place where cancelling loses nothing.
+        self.fetching = False
+
+    async def run(self) -> None:
+        webhook_deleted = False
+        failures = 0
+        while not self.stop.is_set():
+            try:
+                if not webhook_deleted:
+                    await self.bot.delete_webhook()
+                    webhook_deleted = True
+                self.fetching = True
+                try:
+                    updates = await self.bot.get_updates(
+                        offset=self.offset, timeout=POLL_TIMEOUT, allowed_updates=Update.ALL_TYPES
+                    )
+                finally:
+                    self.fetching = False
+            except RetryAfter as exc:
+                await _wait(self.stop, float(exc.retry_after))
+                continue
+            except (TimedOut, NetworkError) as exc:
+                logger.warning("getUpdates failed: %s", exc)
+                await _wait(self.stop, 1)
+                continue
+            except TelegramError as exc:
+                # Conflict (another instance polls this token), Forbidden, InvalidToken...: keep
+                # retrying loudly instead of letting the ingress die while the workers idle.
+                failures += 1
+                delay = min(POLL_BACKOFF_MAX, 2.0 ** failures)
+                logger.error("Polling failed (%s), retrying in %.0fs: %s", type(exc).__name__, delay, exc)
+                await _wait(self.stop, delay)
+                continue
+            failures = 0
+            for update in updates:
+                if not await self.router.put(update.to_dict(), self.stop):
+                    return
+                self.offset = update.update_id + 1
+
+    async def confirm(self) -> None:
+        """Acknowledge the routed updates like PTB's ``Updater`` on stop, so a restart skips them."""
+        if self.offset is None:
+            return
+        try:
+            await self.bot.get_updates(offset=self.offset, timeout=0, allowed_updates=Update.ALL_TYPES)
+        except TelegramError as exc:
+            logger.warning("Could not confirm updates up to %s: %s", self.offset, exc)
+
+
+async def _wait(stop: asyncio.Event, seconds: float) -> None:
+    try:
+        await asyncio.wait_for(stop.wait(), seconds)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def _watch_workers(processes: List[multiprocessing.Process], stop: asyncio.Event) -> Optional[int]:
+    """Return the exit code of the first worker that dies (e.g. the admin restart button)."""
+    while not stop.is_set():
+        for proc in processes:
+            if proc.exitcode is not None:
+                logger.warning("Worker %s exited with code %s, stopping all processes", proc.name, proc.exitcode)
+                stop.set()
+                return proc.exitcode
+        try:
+            await asyncio.wait_for(stop.wait(), 1.0)
+        except asyncio.TimeoutError:
+            pass
+    return None
+
+
+async def run_sharded(app, config: Config, stop: Optional[asyncio.Event] = None) -> int:
+    """Run the ingress in this process; returns the exit code for the supervisor."""
+    ctx = multiprocessing.get_context("spawn")
+    generation = ctx.Value("q", 0)
+    use_shared_generation(generation)
+    queues = [ctx.Queue(maxsize=config.worker_queue_size) for _ in range(config.workers)]
+
+    if stop is None:
+        stop = asyncio.Event()
+        install_stop_signals(stop)
+    # Bootstrap the shared database once here, before any worker touches it.
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+
+    processes = [
+        ctx.Process(target=_worker_main, args=(idx, queues[idx], generation), name=f"bot-worker-{idx}")
+        for idx in range(config.workers)
+    ]
+    for proc in processes:
+        proc.start()
+    logger.info("Started %s workers", len(processes))
+    router = ShardRouter(queues, processes)
+
+    server = None
+    if config.webhook_enabled:
+        from .webhook import WebhookServer, register_webhook
+
+        async def sink(update: Dict[str, Any]) -> None:
+            router.put_nowait(update)
+
+        server = WebhookServer.from_config(app, config, sink=sink)
+        await server.start()
+        await register_webhook(app, config)
+        poller = ingress = None
+    else:
+        poller = UpdatePoller(app, router, stop)
+        ingress = asyncio.create_task(poller.run())
+
+        def on_ingress_done(task: asyncio.Task) -> None:
+            if not task.cancelled() and task.exception() is not None:
+                logger.error("Update ingress crashed, stopping all processes", exc_info=task.exception())
+                stop.set()
+
+        ingress.add_done_callback(on_ingress_done)
+
+    exit_code = await _watch_workers(processes, stop)
+
+    if ingress is not None:
+        # Mid-batch the poller notices stop by itself within PUT_ATTEMPT_SECONDS; only the long
+        # poll is worth cancelling, nothing has been routed from it yet.
+        if poller.fetching:
+            ingress.cancel()
+        await asyncio.gather(ingress, return_exceptions=True)
+        await poller.confirm()
+        if exit_code is None and not ingress.cancelled() and ingress.exception() is not None:
+            # Let the supervisor restart the whole process tree.
+            exit_code = config.restart_exit_code
+    if server is not None:
+        await server.stop()
+    for q in queues:
+        try:
+            q.put(None, timeout=1)
+        except queue.Full:
+            pass
+    loop = asyncio.get_running_loop()
+    for proc in processes:
+        await loop.run_in_executor(None, proc.join, WORKER_JOIN_TIMEOUT)
+        if proc.is_alive():
+            proc.terminate()
+    logger.info("Updates routed per worker: %s", router.routed)
+    await stop_application(app)
+    return exit_code or 0
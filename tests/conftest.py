@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass, field
 from types import SimpleNamespace
 from typing import Any, Optional
@@ -11,6 +12,7 @@ from bot.constants import Role
 from bot.models import Event, Node, User
 from bot.services.content import ContentService
 from bot.services.events import EventService
+from bot.services.exports import ExportService
 from bot.services.nodes import NodeService
 from bot.services.profiles import ProfileService
 from bot.services.restart import RestartService
@@ -84,6 +86,12 @@ class FakeUpdate:
     message: Optional[FakeMessage] = None
     callback_query: Optional[FakeCallbackQuery] = None
 
+    @property
+    def effective_message(self) -> Optional[FakeMessage]:
+        if self.message is not None:
+            return self.message
+        return self.callback_query.message if self.callback_query else None
+
 
 class FakeBot:
     def __init__(self):
@@ -110,6 +118,12 @@ class FakeBot:
 class FakeApplication:
     def __init__(self, bot_data: dict[str, Any]):
         self.bot_data = bot_data
+        self.tasks: list[asyncio.Task] = []
+
+    def create_task(self, coroutine: Any, update: Any = None) -> asyncio.Task:
+        task = asyncio.create_task(coroutine)
+        self.tasks.append(task)
+        return task
 
     async def stop(self):
         return None
@@ -179,6 +193,7 @@ async def services(repos):
         event=EventService(repos.event, repos.reg),
         content=ContentService(repos.content),
         node=NodeService(repos.node),
+        export=ExportService(repos.user, repos.reg),
     )
 
 
@@ -207,6 +222,7 @@ async def bot_data(services, db: Database):
         "event_service": services.event,
         "content_service": services.content,
         "node_service": services.node,
+        "export_service": services.export,
         "role_service": role_service,
         "restart_service": RestartService(enabled=False),
     }
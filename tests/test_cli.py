@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+
+from bot.cli import main
+
+
+def test_cli_import_export_backup_stats(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    db_path = str(tmp_path / "data" / "bot.db")
+    with open("bot_users.json", "w", encoding="utf-8") as f:
+        json.dump({str(uid): {"username": f"u{uid}", "name": f"User {uid}"} for uid in range(1, 21)}, f)
+    _write_sheet(
+        "events.xlsx",
+        ["event_id", "name", "datetime_str", "desc", "max_seats"],
+        [["e1", "One", "2099-01-01 10:00", "D", 10], ["e2", "Two", "2099-02-01 10:00", "D", 10]],
+    )
+    _write_sheet(
+        "registrations.xlsx",
+        ["user_id", "event_id", "status", "reg_time"],
+        [[1, "e1", "registered", None], [2, "e1", "confirmed", None], [3, "e2", "registered", None]],
+    )
+
+    assert main(["--db", db_path, "import-legacy"]) == 0
+    # Marker written: a second run is a no-op unless forced.
+    assert main(["--db", db_path, "import-legacy"]) == 1
+    assert main(["--db", db_path, "import-legacy", "--force", "--live"]) == 0
+
+    assert main(["--db", db_path, "export", "users", "--format", "csv", "--out", "out"]) == 0
+    with gzip.open(os.path.join("out", "users.csv.gz"), "rt", encoding="utf-8") as f:
+        assert len(f.read().splitlines()) == 21
+
+    # URI metacharacters in the path must not change which file stats opens.
+    backup = os.path.join("odd?dir#50%", "backup.db")
+    assert main(["--db", db_path, "backup", backup]) == 0
+    capsys.readouterr()
+    assert main(["--db", backup, "stats"]) == 0
+    counts = {}
+    for line in capsys.readouterr().out.splitlines():
+        label, _, value = line.rpartition(" ")
+        counts[label.strip()] = int(value)
+    assert counts["users"] == 20
+    assert counts["events"] == 2
+    assert counts["registrations"] == 3
+    assert counts["registered"] == 2 and counts["confirmed"] == 1
+
+
+def _write_sheet(path, header, rows):
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    ws = wb.active
+    ws.append(header)
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+
+
+def test_cli_refuses_missing_database(tmp_path):
+    assert main(["--db", str(tmp_path / "missing.db"), "stats"]) == 2
+    assert not os.path.exists(tmp_path / "missing.db")
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import asyncio
+
 import pytest
 
 from bot.constants import Role, Conversation
@@ -107,3 +109,100 @@ async def test_admin_can_add_admin_by_id(context, services):
     end_state = await admin_handlers.admin_add_admin_apply(apply_update, context)
     assert end_state == ConversationHandler.END
     assert (await services.profile.get_role(42)) == Role.ADMIN
+
+
+@pytest.mark.asyncio
+async def test_export_regs_picker_and_csv_document(context, services, seeded_event):
+    await services.profile.ensure_user(1, "u", "User One")
+    await services.profile.assign_role(1, Role.MODERATOR)
+    await services.event.register_user(1, seeded_event.event_id)
+
+    picker = make_callback_update(1, data="admin_export_regs")
+    await admin_handlers.export_regs(picker, context)
+    kb = picker.callback_query.edits[-1]["reply_markup"]
+    datas = [btn.callback_data for row in kb.inline_keyboard for btn in row]
+    assert "admin_export_regs_csv" in datas and "admin_export_regs_jsonl" in datas
+
+    update = make_callback_update(1, data="admin_export_regs_csv")
+    await admin_handlers.export_regs_format(update, context)
+    docs = context.bot.sent_documents
+    assert [d["filename"] for d in docs] == ["registrations.csv.gz"]
+
+
+@pytest.mark.asyncio
+async def test_admin_queries_shows_top_statements_and_resets(context, services, db):
+    await services.profile.ensure_user(1, "u", "User One")
+    await services.profile.assign_role(1, Role.MODERATOR)
+    for _ in range(3):
+        await db.fetchone("SELECT COUNT(*) AS c FROM events")
+
+    update = make_message_update(1, text="/admin_queries 10 calls")
+    context.args = ["10", "calls"]
+    await admin_handlers.admin_queries_cmd(update, context)
+    text = update.message.replies[-1]["text"]
+    assert text.startswith("✅ admin_queries (top 10 by calls")
+    assert "SELECT COUNT(*) AS c FROM events" in text
+
+    context.args = ["reset"]
+    await admin_handlers.admin_queries_cmd(update, context)
+    # Only the role lookup made by require_role since the reset.
+    assert all("FROM events" not in s.sql for s in db.query_stats.top(50))
+
+
+@pytest.mark.asyncio
+async def test_admin_profile_and_tracemalloc_send_reports(context, services):
+    await services.profile.ensure_user(1, "u", "User One")
+    await services.profile.assign_role(1, Role.MODERATOR)
+    update = make_message_update(1, text="/admin_profile 1")
+    context.args = ["1"]
+    with pytest.raises(PermissionDenied):
+        await admin_handlers.admin_profile_cmd(update, context)
+
+    await services.profile.assign_role(1, Role.ADMIN)
+    await admin_handlers.admin_profile_cmd(update, context)
+    # The handler returns at once; the report comes from a background task.
+    assert not context.bot.sent_documents
+    await admin_handlers.admin_profile_cmd(update, context)
+    assert "уже идёт" in update.message.replies[-1]["text"]
+    await asyncio.gather(*context.application.tasks)
+    report = context.bot.sent_documents[-1]
+    assert report["filename"].startswith("profile-")
+    assert b"Collapsed stacks" in report["document"]
+    assert "sampling_profiler" not in context.application.bot_data
+
+    context.args = []
+    await admin_handlers.admin_tracemalloc_cmd(update, context)
+    assert "tracemalloc включён" in update.message.replies[-1]["text"]
+    try:
+        await admin_handlers.admin_tracemalloc_cmd(update, context)
+        report = context.bot.sent_documents[-1]
+        assert report["filename"].startswith("tracemalloc-")
+        assert b"Top allocation sites" in report["document"]
+    finally:
+        context.args = ["stop"]
+        await admin_handlers.admin_tracemalloc_cmd(update, context)
+    assert "выключен" in update.message.replies[-1]["text"]
+
+
+@pytest.mark.asyncio
+async def test_admin_logs_filters_records(context, services, tmp_path):
+    await services.profile.ensure_user(1, "u", "User One")
+    await services.profile.assign_role(1, Role.MODERATOR)
+    log_file = tmp_path / "bot.log"
+    log_file.write_text(
+        "2026-01-01 10:00:00,000 [INFO] bot.main: started\n"
+        "2026-01-01 10:00:01,000 [ERROR] bot.main: Failed to send user_id=5\n",
+        encoding="utf-8",
+    )
+    context.application.bot_data["config"].log_file = str(log_file)
+    update = make_message_update(1, text="/admin_logs level=error")
+
+    context.args = ["level=error"]
+    await admin_handlers.admin_logs_cmd(update, context)
+    text = update.message.replies[-1]["text"]
+    assert text.startswith("✅ admin_logs: найдено 1")
+    assert "Failed to send user_id=5" in text and "started" not in text
+
+    context.args = ["since=soon"]
+    await admin_handlers.admin_logs_cmd(update, context)
+    assert update.message.replies[-1]["text"].startswith("❌ since=")
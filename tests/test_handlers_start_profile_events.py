@@ -6,7 +6,8 @@ from bot.constants import Conversation
 from bot.handlers import events as events_handlers
 from bot.handlers import profile as profile_handlers
 from bot.handlers import start as start_handlers
-from bot.services.messaging import MENU_LABEL_EVENTS, MENU_LABEL_PROFILE
+from bot.models import Event
+from bot.services.messaging import MENU_LABEL_EVENTS, MENU_LABEL_MY_REGS, MENU_LABEL_PROFILE
 from bot.utils.errors import ValidationError
 
 from .conftest import make_callback_update, make_message_update
@@ -116,3 +117,38 @@ async def test_confirm_registration_callback_registers_and_confirms(context, ser
     assert reg is not None
     assert reg.status == "confirmed"
     assert any("запись" in m["text"].lower() for m in context.bot.sent_messages)
+
+
+@pytest.mark.asyncio
+async def test_my_registrations_pages_upcoming_events_only(context, services):
+    await services.profile.ensure_user(1, "u", "User One")
+    await services.profile.set_consent(1, True)
+    past = await services.event.add_event("Past", "2099-01-01 10:00", "D", seats=5)
+    await services.event.register_user(1, past.event_id)
+    await services.event.event_repo.update(Event(past.event_id, "Past", "2000-01-01 10:00", "D", 5))
+    # Added out of date order: the list goes by start time.
+    upcoming = [await services.event.add_event(f"Ev {d}", f"2099-02-{d:02d} 10:00", "D", 5) for d in range(12, 0, -1)]
+    for ev in upcoming:
+        await services.event.register_user(1, ev.event_id)
+    await services.event.cancel_registration(1, upcoming[-1].event_id)
+
+    update = make_message_update(1, text=MENU_LABEL_MY_REGS)
+    await events_handlers.list_my_registrations(update, context)
+    rows = update.message.replies[-1]["reply_markup"].inline_keyboard
+    assert [r[0].text for r in rows[:10]] == [
+        f"📝 Ожидает подтверждения: Ev {d} (2099-02-{d:02d} 10:00)" for d in range(2, 12)
+    ]
+    assert [b.text for b in rows[10]] == ["Далее ➡️"]
+
+    nxt = make_callback_update(1, data=rows[10][0].callback_data)
+    await events_handlers.my_registrations_page(nxt, context)
+    rows = nxt.callback_query.edits[-1]["reply_markup"].inline_keyboard
+    assert [r[0].text for r in rows] == ["📝 Ожидает подтверждения: Ev 12 (2099-02-12 10:00)", "⏮ В начало", "↩️ Назад"]
+
+    # The cursor event is deleted before "Далее" is pressed: back to the first page, not "no registrations".
+    await services.event.delete_event(upcoming[1].event_id)
+    stale = make_callback_update(1, data=f"myregs_{upcoming[1].event_id}")
+    await events_handlers.my_registrations_page(stale, context)
+    rows = stale.callback_query.edits[-1]["reply_markup"].inline_keyboard
+    assert rows[0][0].text == "📝 Ожидает подтверждения: Ev 2 (2099-02-02 10:00)"
+    assert rows[9][0].text == "📝 Ожидает подтверждения: Ev 12 (2099-02-12 10:00)"
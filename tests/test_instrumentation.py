@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+
+import pytest
+from telegram import Update
+from telegram.ext import ApplicationBuilder, ConversationHandler, MessageHandler, filters
+
+from bot.instrumentation import UPDATE, UpdateInstrumentation
+from bot.utils.tracing import note_api_call
+
+
+def _message(update_id: int, text: str) -> Update:
+    return Update.de_json(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 1700000000,
+                "chat": {"id": 7, "type": "private"},
+                "from": {"id": 7, "is_bot": False, "first_name": "U"},
+                "text": text,
+            },
+        },
+        None,
+    )
+
+
+def _application():
+    app = ApplicationBuilder().token("123:TEST").updater(None).build()
+    # Application.initialize() would call getMe; process_update only needs the flag.
+    app._initialized = True  # noqa: SLF001
+    return app
+
+
+@pytest.mark.asyncio
+async def test_records_handler_time_db_and_api_counts(db, caplog):
+    app = _application()
+
+    async def report(update, context):
+        await db.fetchone("SELECT COUNT(*) FROM users")
+        await db.fetchall("SELECT * FROM events")
+        note_api_call(0.001)
+        await asyncio.sleep(0.02)
+
+    app.add_handler(MessageHandler(filters.Regex("^/report"), report))
+    instrumentation = UpdateInstrumentation(slow_update_ms=10)
+    instrumentation.install(app)
+
+    with caplog.at_level(logging.WARNING, logger="bot.instrumentation"):
+        await app.process_update(_message(1, "/report"))
+
+    stats = dict(instrumentation.report())
+    handler = stats["test_records_handler_time_db_and_api_counts.<locals>.report"]
+    assert handler["calls"] == 1 and handler["db_avg"] == 2 and handler["api_avg"] == 1
+    assert handler["p50_ms"] >= 20
+    assert stats[UPDATE]["db_avg"] == 2
+    assert instrumentation.slow_updates == 1
+    assert "update_id=1 user_id=7" in caplog.text and "report" in caplog.text and "db=2" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_wraps_conversation_callbacks_once():
+    app = _application()
+    seen = []
+
+    async def begin(update, context):
+        seen.append("begin")
+        return 1
+
+    async def step(update, context):
+        seen.append("step")
+        return ConversationHandler.END
+
+    app.add_handler(
+        ConversationHandler(
+            entry_points=[MessageHandler(filters.Regex("^/go$"), begin)],
+            states={1: [MessageHandler(filters.TEXT, step)]},
+            fallbacks=[],
+        )
+    )
+    instrumentation = UpdateInstrumentation(slow_update_ms=0)
+    instrumentation.install(app)
+    # A second install (soft reload over the same handler objects) must not double-wrap.
+    instrumentation._wrap_all(h for group in app.handlers.values() for h in group)  # noqa: SLF001
+
+    await app.process_update(_message(1, "/go"))
+    await app.process_update(_message(2, "/go again"))
+
+    assert seen == ["begin", "step"]
+    names = {name for name, _ in instrumentation.report()}
+    assert {UPDATE, "test_wraps_conversation_callbacks_once.<locals>.begin"} <= names
+    assert all(row["calls"] == 1 for name, row in instrumentation.report() if name != UPDATE)
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from bot.leader import LeaderLease
+from bot.main import _bootstrap_database
+from bot.services.migrations import MigrationService
+from bot.storage.db import Database
+from bot.utils.startup import StartupProfiler
+
+
+@pytest.fixture
+async def second_db(db: Database):
+    # A separate connection to the same file stands in for a second bot process.
+    other = Database(db.path)
+    try:
+        yield other
+    finally:
+        await other.close()
+
+
+@pytest.mark.asyncio
+async def test_only_one_leader_and_standby_takes_over_after_expiry(db, second_db):
+    leader = LeaderLease(db, ttl=0.2)
+    standby = LeaderLease(second_db, ttl=0.2)
+
+    assert await leader.try_acquire()
+    assert not await standby.try_acquire()
+    assert await leader.try_acquire()  # renewal
+    assert await standby.current_holder() == leader.holder
+
+    # The leader dies (no more heartbeats): the standby wins once the lease expires.
+    stop = asyncio.Event()
+    elected = await asyncio.wait_for(standby.wait_for_leadership(stop), timeout=2)
+    assert elected and standby.is_leader
+    assert not await leader.try_acquire()
+
+
+@pytest.mark.asyncio
+async def test_release_hands_over_and_lost_lease_stops_the_old_leader(db, second_db):
+    leader = LeaderLease(db, ttl=0.3)
+    standby = LeaderLease(second_db, ttl=0.3)
+    assert await leader.try_acquire()
+    await leader.release()
+    assert await standby.try_acquire()
+
+    # A stalled process that comes back after losing the lease steps down on its next heartbeat.
+    stop = asyncio.Event()
+    leader.is_leader = True
+    await asyncio.wait_for(leader.keep_alive(stop), timeout=2)
+    assert leader.lost and stop.is_set()
+
+
+@pytest.mark.asyncio
+async def test_slow_legacy_import_does_not_cost_the_leader_its_lease(
+    db, second_db, bot_data, repos, tmp_path, monkeypatch
+):
+    monkeypatch.chdir(tmp_path)
+    with open("bot_users.json", "w", encoding="utf-8") as f:
+        json.dump({str(uid): {"username": f"u{uid}", "name": f"User {uid}"} for uid in range(1, 201)}, f)
+    migrator = MigrationService(repos.user, repos.role, repos.event, repos.reg, repos.content, chunk_size=10)
+    upsert_many = repos.user.upsert_many
+
+    async def slow_upsert_many(users):
+        await asyncio.sleep(0.03)
+        await upsert_many(users)
+
+    monkeypatch.setattr(repos.user, "upsert_many", slow_upsert_many)
+    bot_data["config"].leader_election = True
+    bot_data["migrator"] = migrator
+    app = SimpleNamespace(bot_data=bot_data)
+
+    leader = LeaderLease(db, ttl=0.2)
+    standby = LeaderLease(second_db, ttl=0.2)
+    assert await leader.try_acquire()
+    stop = asyncio.Event()
+    heartbeat = asyncio.create_task(leader.keep_alive(stop))
+    started = asyncio.get_running_loop().time()
+    # 20 chunks at 30ms each: the import outlasts the lease TTL several times over.
+    await _bootstrap_database(app, StartupProfiler())
+    assert asyncio.get_running_loop().time() - started > 3 * leader.ttl
+    assert not await standby.try_acquire()
+    stop.set()
+    await heartbeat
+
+    assert not leader.lost
+    assert len(await repos.user.list_users()) == 200
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+
+import pytest
+
+from bot.utils.errors import ValidationError
+from bot.utils.log_search import INDEX_DIR, load_index, log_files, parse_query, search_logs
+
+
+def _text(ts: float, level: str, message: str) -> str:
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+    return f"{stamp},000 [{level}] bot.test: {message}\n"
+
+
+def _write(path, lines) -> None:
+    with open(path, "a", encoding="utf-8") as f:
+        f.writelines(lines)
+
+
+def test_parse_query_reads_filters_and_multiword_grep():
+    query = parse_query(["level=warn", "since=2h", "grep=Connection", "reset", "user=42"], now=10_000.0)
+    assert query.level == "WARNING"
+    assert query.since == 10_000.0 - 7200
+    assert query.grep == "connection reset"
+    assert query.user_id == 42
+    with pytest.raises(ValidationError):
+        parse_query(["level=LOUD"])
+    with pytest.raises(ValidationError):
+        parse_query(["since=yesterday"])
+
+
+def test_search_spans_rotated_and_worker_files_and_skips_old_buckets(tmp_path):
+    now = time.time()
+    day_ago = now - 86400
+    log_file = tmp_path / "bot.log"
+    _write(tmp_path / "bot.log.2", [_text(day_ago, "ERROR", "old failure user_id=42")])
+    _write(
+        tmp_path / "bot.log.1",
+        [_text(day_ago + 60, "INFO", f"filler {i}") for i in range(500)]
+        + [_text(now - 600, "ERROR", "Broadcast failed user_id=42"), "Traceback (most recent call last):\n"],
+    )
+    _write(log_file, [_text(now - 300, "INFO", "Consent accepted user_id=42"), _text(now - 60, "WARNING", "slow")])
+    worker = {"ts": "", "level": "ERROR", "logger": "bot.test", "msg": "worker failure", "user_id": 42}
+    worker["ts"] = time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime(now - 120))
+    _write(tmp_path / "bot.worker0.log", [json.dumps(worker) + "\n"])
+
+    assert [os.path.basename(p) for p in log_files(str(log_file))] == [
+        "bot.log.2",
+        "bot.log.1",
+        "bot.log",
+        "bot.worker0.log",
+    ]
+
+    result = search_logs(str(log_file), parse_query(["level=ERROR", "since=1h", "user=42"]))
+    texts = [match.text for match in result.matches]
+    assert texts[0].endswith("Broadcast failed user_id=42\nTraceback (most recent call last):")
+    assert '"msg": "worker failure"' in texts[1]
+    assert result.total == 2
+    # The day-old buckets of the backups were never read.
+    assert result.scanned_bytes < os.path.getsize(tmp_path / "bot.log.1") / 10
+
+    result = search_logs(str(log_file), parse_query(["grep=CONSENT"]))
+    assert [m.text.rsplit(": ", 1)[1] for m in result.matches] == ["Consent accepted user_id=42"]
+
+
+def test_index_is_extended_and_survives_rotation(tmp_path):
+    log_file = tmp_path / "bot.log"
+    now = time.time()
+    _write(log_file, [_text(now - 30, "INFO", "first")])
+    first = load_index(str(log_file))
+    assert first.indexed == os.path.getsize(log_file)
+
+    _write(log_file, [_text(now, "ERROR", "second"), "partial line without newline"])
+    extended = load_index(str(log_file))
+    assert extended.indexed == os.path.getsize(log_file) - len("partial line without newline")
+    assert extended.buckets[0][1] == 0
+
+    os.replace(log_file, tmp_path / "bot.log.1")
+    _write(log_file, [_text(now, "INFO", "new file")])
+    rotated = load_index(str(tmp_path / "bot.log.1"))
+    assert rotated.index_path == extended.index_path
+
+    result = search_logs(str(log_file), parse_query(["level=ERROR"]))
+    assert [m.text.rsplit(": ", 1)[1] for m in result.matches] == ["second"]
+    assert len(os.listdir(tmp_path / INDEX_DIR)) == 2
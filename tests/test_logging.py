@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import json
+import logging
+import logging.handlers
+import threading
+
+import pytest
+
+from bot.logging_config import setup_logging, stop_logging
+from bot.utils.tracing import begin_trace, end_trace
+
+
+@pytest.fixture
+def restore_logging():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    try:
+        yield
+    finally:
+        stop_logging()
+        root.handlers[:] = handlers
+        root.setLevel(level)
+
+
+def test_queued_json_records_carry_update_ids_and_tracebacks(tmp_path, restore_logging):
+    log_file = tmp_path / "bot.log"
+    setup_logging("INFO", log_file=str(log_file), fmt="json")
+    written_by = set()
+    original_emit = logging.handlers.RotatingFileHandler.emit
+
+    def emit(self, record):
+        written_by.add(threading.current_thread().name)
+        original_emit(self, record)
+
+    logging.handlers.RotatingFileHandler.emit = emit
+    try:
+        trace = begin_trace(update_id=42, user_id=7)
+        payload = {"n": 1}
+        logging.getLogger("bot.test").info("registered %s", payload, extra={"event_id": "e1"})
+        # Mutating an argument after the call must not change what gets written.
+        payload["n"] = 2
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logging.getLogger("bot.test").exception("failed")
+        end_trace()
+        logging.getLogger("bot.test").warning("outside")
+        stop_logging()
+    finally:
+        logging.handlers.RotatingFileHandler.emit = original_emit
+
+    assert trace.update_id == 42
+    assert threading.current_thread().name not in written_by
+    lines = [json.loads(line) for line in log_file.read_text(encoding="utf-8").splitlines()]
+    info, error, outside = (line for line in lines if line["logger"] == "bot.test")
+    assert info["msg"] == "registered {'n': 1}"
+    assert info["update_id"] == 42 and info["user_id"] == 7 and info["event_id"] == "e1"
+    assert error["correlation_id"] == info["correlation_id"]
+    assert "ValueError: boom" in error["exc"]
+    assert "update_id" not in outside and "correlation_id" not in outside
+
+
+def test_text_format_is_unchanged(tmp_path, restore_logging):
+    log_file = tmp_path / "bot.log"
+    setup_logging("INFO", log_file=str(log_file), queued=False)
+    logging.getLogger("bot.test").info("hello %s", "world")
+    stop_logging()
+    logging.getLogger().handlers[-1].flush()
+    assert log_file.read_text(encoding="utf-8").rstrip().endswith("[INFO] bot.test: hello world")
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+import pytest
+from telegram.ext import ApplicationHandlerStop
+
+from bot.loop_monitor import BUSY_TEXT, LoadShedder, LoopLagMonitor
+
+from .conftest import make_message_update
+
+
+def _block_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+@pytest.mark.asyncio
+async def test_stall_is_logged_with_running_handler_and_blocking_stack(caplog):
+    monitor = LoopLagMonitor(interval=0.02, stall_ms=60, running=lambda: ["events.register (update_id=7, 65ms)"])
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        with caplog.at_level(logging.WARNING, logger="bot.loop_monitor"):
+            _block_loop(0.3)
+            await asyncio.sleep(0.05)
+    finally:
+        await monitor.stop()
+
+    assert monitor.stalls == 1
+    assert monitor.max_lag >= 0.25
+    [record] = [r for r in caplog.records if r.getMessage().startswith("Event loop stalled")]
+    message = record.getMessage()
+    assert "running: events.register (update_id=7, 65ms)" in message
+    assert "in _block_loop" in message
+
+
+def test_watchdog_idles_at_probe_interval_when_stall_reports_are_off():
+    assert LoopLagMonitor(interval=0.5, stall_ms=0)._watch_interval() == 0.5
+    assert LoopLagMonitor(interval=0.5, stall_ms=500)._watch_interval() == 0.25
+
+
+@pytest.mark.asyncio
+async def test_shedder_turns_users_away_while_lagging(context):
+    monitor = LoopLagMonitor(interval=0.01, window=3)
+    shedder = LoadShedder(monitor, lag_ms=200, max_defer=5)
+    context.application.bot_data["config"].admin_ids = [99]
+    update = make_message_update(1, text="/start")
+    await shedder.shed_update(update, context)
+    assert not update.message.replies
+
+    monitor.record(0.5)
+    assert shedder.overloaded
+    with pytest.raises(ApplicationHandlerStop):
+        await shedder.shed_update(update, context)
+    assert update.message.replies[-1]["text"] == BUSY_TEXT
+    # Admins are never turned away.
+    await shedder.shed_update(make_message_update(99, text="/admin_status"), context)
+    assert shedder.shed == 1
+
+    async def recover():
+        for _ in range(3):
+            await asyncio.sleep(0.02)
+            monitor.record(0.001)
+
+    started = time.perf_counter()
+    await asyncio.gather(shedder.defer(), recover())
+    assert time.perf_counter() - started < 1
+    assert shedder.deferred == 1 and not shedder.overloaded
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from telegram.ext import ApplicationBuilder
+
+from bot.metrics import MetricsServer
+from bot.utils.metrics import Registry
+
+
+def test_histogram_renders_cumulative_buckets_and_escapes_labels():
+    registry = Registry()
+    latency = registry.histogram("t_seconds", "Test latency.", ("handler",), buckets=(0.1, 1.0))
+    latency.observe(0.1, 'say "hi"')
+    latency.observe(0.5, 'say "hi"')
+    latency.observe(7, 'say "hi"')
+    calls = registry.counter("t_calls_total", "Test calls.")
+    calls.inc(amount=2)
+
+    text = "\n".join(registry.render())
+    assert 't_seconds_bucket{handler="say \\"hi\\"",le="0.1"} 1' in text
+    assert 't_seconds_bucket{handler="say \\"hi\\"",le="1"} 2' in text
+    assert 't_seconds_bucket{handler="say \\"hi\\"",le="+Inf"} 3' in text
+    assert 't_seconds_sum{handler="say \\"hi\\""} 7.6' in text
+    assert 't_seconds_count{handler="say \\"hi\\""} 3' in text
+    assert "# TYPE t_calls_total counter\nt_calls_total 2" in text
+
+
+async def _scrape(port: int) -> tuple[str, str]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /metrics HTTP/1.1\r\nHost: local\r\nConnection: close\r\n\r\n")
+    raw = await reader.read()
+    writer.close()
+    head, _, body = raw.decode("utf-8").partition("\r\n\r\n")
+    return head, body
+
+
+@pytest.mark.asyncio
+async def test_local_scrape_exposes_recorded_and_live_series(bot_data, db):
+    app = ApplicationBuilder().token("123:TEST").updater(None).build()
+    app.bot_data.update(bot_data)
+    await bot_data["event_service"].list_active_events()
+    await db.fetchone("SELECT 1")
+
+    server = MetricsServer(app, "127.0.0.1", 0)
+    await server.start()
+    try:
+        head, body = await _scrape(server.port)
+    finally:
+        await server.stop()
+
+    assert head.startswith("HTTP/1.1 200") and "text/plain; version=0.0.4" in head
+    assert 'bot_db_query_duration_seconds_count{op="select"}' in body
+    assert 'bot_cache_misses_total{cache="event_service"} 1' in body
+    assert "bot_update_queue_size 0" in body
+    assert "bot_broadcast_pending_messages 0" in body
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import time
+
+import pytest
+from telegram.ext._utils.trackingdict import TrackingDict
+
+from bot.constants import Conversation
+from bot.storage.persistence import SQLitePersistence
+
+
+class _App:
+    def __init__(self):
+        self.dropped: list[int] = []
+        self.user_data: dict = {}
+        self._conversation_handler_conversations: dict[str, TrackingDict] = {}
+
+    def drop_user_data(self, user_id: int) -> None:
+        self.dropped.append(user_id)
+
+
+async def _count(db, table: str) -> int:
+    row = await db.fetchone(f"SELECT COUNT(*) AS c FROM {table}")
+    return int(row["c"])
+
+
+@pytest.mark.asyncio
+async def test_user_data_survives_restart_and_unchanged_data_is_not_rewritten(db):
+    persistence = SQLitePersistence(db)
+    assert await persistence.get_user_data() == {}
+    draft = {"new_event_name": "Meetup", "new_event_dt": dt.datetime(2030, 5, 1, 18, 30)}
+    await persistence.refresh_user_data(42, {})
+    await persistence.update_user_data(42, draft)
+    await persistence.update_user_data(7, {})
+    await persistence.flush()
+    assert persistence.rows_written == 1
+
+    await persistence.update_user_data(42, dict(draft))
+    await persistence.flush()
+    assert persistence.rows_written == 1
+
+    restarted = SQLitePersistence(db)
+    await restarted.get_user_data()
+    user_data: dict = {}
+    await restarted.refresh_user_data(42, user_data)
+    assert user_data == draft
+
+
+@pytest.mark.asyncio
+async def test_updates_are_batched_into_one_flush(db):
+    persistence = SQLitePersistence(db)
+    await persistence.get_user_data()
+    # Application.update_persistence() gathers all update_* calls like this.
+    await asyncio.gather(*(persistence.update_user_data(uid, {"step": uid}) for uid in range(1, 51)))
+    await persistence.flush()
+    assert persistence.flushes == 1
+    assert await _count(db, "persisted_data") == 50
+
+
+@pytest.mark.asyncio
+async def test_idle_entries_are_evicted_from_memory_but_kept_in_sqlite(db):
+    persistence = SQLitePersistence(db, idle_ttl=0.01)
+    app = _App()
+    persistence.attach(app)  # type: ignore[arg-type]
+    await persistence.get_user_data()
+    await persistence.refresh_user_data(42, {})
+    await persistence.update_user_data(42, {"broadcast_text": "hi"})
+    await persistence.flush()
+
+    await asyncio.sleep(0.02)
+    await persistence.update_user_data(42, {"broadcast_text": "hi"})
+    await persistence.flush()
+    await asyncio.sleep(0)
+    assert app.dropped == [42]
+    assert persistence.stats()["in_memory"] == 0
+
+    # The application reports the drop back; an evicted entry keeps its row.
+    await persistence.drop_user_data(42)
+    await persistence.flush()
+    user_data: dict = {}
+    await persistence.refresh_user_data(42, user_data)
+    assert user_data == {"broadcast_text": "hi"}
+
+    # A real drop deletes it.
+    await persistence.drop_user_data(42)
+    await persistence.flush()
+    assert await _count(db, "persisted_data") == 0
+
+
+@pytest.mark.asyncio
+async def test_user_back_before_the_drop_is_reported_keeps_new_data(db):
+    persistence = SQLitePersistence(db, idle_ttl=0.01)
+    app = _App()
+    persistence.attach(app)  # type: ignore[arg-type]
+    await persistence.get_user_data()
+    await persistence.refresh_user_data(42, {})
+    await persistence.update_user_data(42, {"step": 1})
+    await persistence.flush()
+    await asyncio.sleep(0.02)
+    await persistence.update_user_data(7, {"step": 1})
+    await persistence.flush()
+    await asyncio.sleep(0)
+    assert app.dropped == [42]
+
+    # The user writes again before update_persistence: PTB reloads them, then skips their
+    # update_user_data because the id is still queued for deletion, and only reports the drop.
+    app.user_data[42] = {}
+    await persistence.refresh_user_data(42, app.user_data[42])
+    app.user_data[42]["step"] = 2
+    await persistence.drop_user_data(42)
+    await persistence.flush()
+
+    restarted = SQLitePersistence(db)
+    await restarted.get_user_data()
+    user_data: dict = {}
+    await restarted.refresh_user_data(42, user_data)
+    assert user_data == {"step": 2}
+
+
+@pytest.mark.asyncio
+async def test_conversation_states_round_trip_and_end(db):
+    persistence = SQLitePersistence(db)
+    assert await persistence.get_conversations("event_registration") == {}
+    await persistence.update_conversation("event_registration", (42, 42), Conversation.INPUT_EMAIL)
+    await persistence.update_conversation("event_registration", (7, 7), Conversation.INPUT_NAME)
+    await persistence.flush()
+
+    restored = await SQLitePersistence(db).get_conversations("event_registration")
+    assert restored == {(42, 42): Conversation.INPUT_EMAIL, (7, 7): Conversation.INPUT_NAME}
+
+    await persistence.update_conversation("event_registration", (42, 42), None)
+    await persistence.flush()
+    assert await SQLitePersistence(db).get_conversations("event_registration") == {(7, 7): 1}
+
+
+@pytest.mark.asyncio
+async def test_abandoned_conversations_are_not_loaded_and_expire_in_memory(db):
+    await db.executemany(
+        "INSERT INTO persisted_conversations (name, key, state, updated_at) VALUES ('event_registration', ?, '2', ?)",
+        [("[1, 1]", 0), ("[2, 2]", time.time())],
+    )
+    persistence = SQLitePersistence(db, conversation_timeout=0.05)
+    app = _App()
+    persistence.attach(app)  # type: ignore[arg-type]
+    live: TrackingDict = TrackingDict()
+    # What ConversationHandler does with the loaded states.
+    live.update_no_track(await persistence.get_conversations("event_registration"))
+    app._conversation_handler_conversations["event_registration"] = live
+    assert dict(live) == {(2, 2): 2}
+    assert await _count(db, "persisted_conversations") == 1
+
+    live[(3, 3)] = 1
+    await persistence.update_conversation("event_registration", (3, 3), 1)
+    await persistence.flush()
+    await asyncio.sleep(0.06)
+    live[(3, 3)] = 2
+    await persistence.update_conversation("event_registration", (3, 3), 2)
+    await persistence.flush()
+    await asyncio.sleep(0)
+    # (2, 2) had no step within the timeout; (3, 3) just moved on.
+    assert dict(live) == {(3, 3): 2}
+    assert persistence.stats()["conversations_expired"] == 1
+
+    # Application.update_persistence reports the tracked pop as an ended conversation.
+    for key, state in live.pop_accessed_write_items():
+        ended = state is TrackingDict.DELETED
+        await persistence.update_conversation("event_registration", key, None if ended else state)
+    await persistence.flush()
+    assert await SQLitePersistence(db, conversation_timeout=0).get_conversations("event_registration") == {
+        (3, 3): 2
+    }
+
+
+@pytest.mark.asyncio
+async def test_stale_rows_are_purged_on_startup(db):
+    await db.execute(
+        "INSERT INTO persisted_data (kind, id, data, updated_at) VALUES ('user', 1, '{\"a\": 1}', 0)"
+    )
+    persistence = SQLitePersistence(db, retention_days=7)
+    await persistence.get_user_data()
+    assert await _count(db, "persisted_data") == 0
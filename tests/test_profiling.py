@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from bot.utils.profiling import IDLE, SamplingProfiler
+
+
+def _spin(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_sampling_profiler_separates_busy_code_from_idle_loop():
+    profiler = SamplingProfiler(interval=0.002)
+    profiler.start()
+    try:
+        _spin(0.2)
+        await asyncio.sleep(0.2)
+    finally:
+        profiler.stop()
+
+    assert profiler.samples > 20
+    assert profiler.idle > 0
+    own, inclusive = profiler.top_functions()
+    assert own[0][0].startswith("_spin (tests/test_profiling.py:")
+    assert any(label.startswith("test_sampling_profiler_separates") for label, _ in inclusive)
+
+    report = profiler.report()
+    assert "Top functions by own time" in report
+    collapsed = profiler.collapsed()
+    assert any(line.startswith(IDLE + " ") for line in collapsed)
+    assert any(";_spin (tests/test_profiling.py:" in line for line in collapsed)
@@ -0,0 +1,130 @@
+"""SQL statements per handler, checked against a budget on a database with realistic volume.
+
+A handler that runs a query per row (an N+1) passes every functional test on a handful of rows;
+here the user has dozens of registrations and the event hundreds, so it blows its budget instead.
+Budgets count statements for one update with cold caches, as ``UpdateTrace`` does in production.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterator
+
+import pytest
+
+from bot.handlers import content as content_handlers
+from bot.handlers import events as events_handlers
+from bot.handlers import menu as menu_handlers
+from bot.handlers import profile as profile_handlers
+from bot.handlers import start as start_handlers
+from bot.models import Event
+from bot.services.messaging import MENU_LABEL_EVENTS, MENU_LABEL_MY_REGS, MENU_LABEL_PROFILE
+from bot.utils.tracing import UpdateTrace, begin_trace, end_trace
+
+from .conftest import make_callback_update, make_message_update
+
+USER_ID = 1
+EVENTS = 300
+USERS = 1000
+USER_REGISTRATIONS = 60
+POPULAR_EVENT = "ev_0000"
+
+BUDGETS = {
+    # Upsert of the user, profile, role and the menu tree.
+    "start": 6,
+    "list_events": 1,
+    "view_event": 1,
+    "list_my_registrations": 2,
+    "show_profile": 2,
+    "main_menu_node": 1,
+    "node_view": 1,
+}
+# Handlers over budget until fixed, name -> reason; strict xfail, so the fix has to take them off.
+KNOWN_OVER_BUDGET: Dict[str, str] = {}
+
+
+@contextmanager
+def count_statements() -> Iterator[UpdateTrace]:
+    """Trace the block like one processed update; ``db_statements`` holds the count afterwards."""
+    trace = begin_trace(update_id=0, user_id=USER_ID)
+    try:
+        yield trace
+    finally:
+        end_trace()
+
+
+@pytest.fixture
+async def large_dataset(db, services):
+    now = datetime.now()
+    stamp = now.strftime("%Y-%m-%d %H:%M:%S")
+    await db.executemany(
+        "INSERT INTO users (user_id, username, full_name, email, consent, consent_time, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, 1, ?, ?, ?)",
+        [(uid, f"u{uid}", f"User {uid}", f"u{uid}@example.test", stamp, stamp, stamp) for uid in range(1, USERS + 1)],
+    )
+    await services.event.event_repo.add_many(
+        Event(
+            event_id=f"ev_{i:04d}",
+            name=f"Event {i}",
+            # Half already over: the catalog has to filter them out.
+            datetime_str=(now + timedelta(days=i - EVENTS // 2)).strftime("%Y-%m-%d %H:%M"),
+            description="Desc",
+            max_seats=USERS,
+        )
+        for i in range(EVENTS)
+    )
+    upcoming = [f"ev_{i:04d}" for i in range(EVENTS // 2, EVENTS // 2 + USER_REGISTRATIONS)]
+    rows = [(USER_ID, event_id, "registered", stamp) for event_id in upcoming]
+    rows += [(uid, POPULAR_EVENT, "confirmed", stamp) for uid in range(2, USERS + 1)]
+    await db.executemany("INSERT INTO registrations (user_id, event_id, status, reg_time) VALUES (?, ?, ?, ?)", rows)
+    await services.node.ensure_defaults()
+    return upcoming
+
+
+def _budgeted(name: str):
+    marks = []
+    if name in KNOWN_OVER_BUDGET:
+        marks.append(pytest.mark.xfail(reason=KNOWN_OVER_BUDGET[name], strict=True))
+    return pytest.param(name, marks=marks, id=name)
+
+
+async def _run(name: str, context, services, upcoming) -> int:
+    if name == "start":
+        update = make_message_update(USER_ID, text="/start", username="u1", full_name="User 1")
+        call = start_handlers.start(update, context)
+    elif name == "list_events":
+        call = menu_handlers.main_menu_router(make_message_update(USER_ID, text=MENU_LABEL_EVENTS), context)
+    elif name == "view_event":
+        call = events_handlers.view_event(make_callback_update(USER_ID, f"event_view_{upcoming[0]}"), context)
+    elif name == "list_my_registrations":
+        call = menu_handlers.main_menu_router(make_message_update(USER_ID, text=MENU_LABEL_MY_REGS), context)
+    elif name == "show_profile":
+        call = profile_handlers.show_profile(make_message_update(USER_ID, text=MENU_LABEL_PROFILE), context)
+    elif name == "main_menu_node":
+        root = (await services.node.get_children(None))[0]
+        call = menu_handlers.main_menu_router(make_message_update(USER_ID, text=root.title), context)
+    else:
+        root = (await services.node.get_children(None))[0]
+        call = content_handlers.node_view(make_callback_update(USER_ID, f"node_{root.id}"), context)
+    services.event.invalidate_cache()
+    services.node.invalidate_cache()
+    with count_statements() as trace:
+        await call
+    return trace.db_statements
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", [_budgeted(name) for name in BUDGETS])
+async def test_handler_stays_within_query_budget(name, context, services, large_dataset):
+    statements = await _run(name, context, services, large_dataset)
+    assert statements <= BUDGETS[name], f"{name}: {statements} statements, budget {BUDGETS[name]}"
+
+
+@pytest.mark.asyncio
+async def test_counter_sees_every_statement(db):
+    with count_statements() as trace:
+        await db.fetchone("SELECT 1")
+        await db.fetchall("SELECT 2")
+        await db.execute("CREATE TABLE IF NOT EXISTS budget_probe (x)")
+    assert trace.db_statements == 3
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import asyncio
+
 import pytest
 
 from bot.constants import Role
@@ -128,3 +130,65 @@ async def test_node_repository_tree_and_main_menu(repos):
     main = await repos.node.get_main_menu_nodes()
     assert [n.id for n in main] == [root_id]
 
+
+@pytest.mark.asyncio
+async def test_node_insert_waits_for_an_open_transaction_instead_of_committing_it(db, repos):
+    opened = asyncio.Event()
+
+    async def half_done_import():
+        async with db.transaction():
+            await db.execute("INSERT INTO content_sections (key, title, body) VALUES ('draft', 'Draft', '')")
+            opened.set()
+            await asyncio.sleep(0.05)
+            raise RuntimeError("import failed")
+
+    importer = asyncio.create_task(half_done_import())
+    await opened.wait()
+    node_id = await repos.node.upsert_node(Node(id=None, parent_id=None, key="n", title="N", content=""))
+    with pytest.raises(RuntimeError):
+        await importer
+
+    assert (await repos.node.get_node(node_id)).title == "N"  # type: ignore[union-attr]
+    assert await db.fetchone("SELECT key FROM content_sections WHERE key = 'draft'") is None
+    assert any(stat.sql.startswith("INSERT INTO nodes") for stat in db.query_stats.top(50))
+
+
+@pytest.mark.asyncio
+async def test_init_db_skips_ddl_when_schema_is_current(db):
+    from bot.storage.db import SCHEMA_VERSION
+
+    assert await db.schema_version() == SCHEMA_VERSION
+    assert await db.init_db() is False
+
+    assert await db.get_meta("defaults_version") is None
+    await db.set_meta("defaults_version", "1")
+    await db.set_meta("defaults_version", "2")
+    assert await db.get_meta("defaults_version") == "2"
+
+
+@pytest.mark.asyncio
+async def test_query_stats_group_by_normalized_sql_and_log_slow_plans(db, repos, caplog):
+    import asyncio
+    import logging
+
+    from bot.storage.query_stats import normalize_sql
+
+    assert normalize_sql("SELECT *  FROM t\n WHERE id IN (1, 2, 3) AND name = 'x'") == (
+        "SELECT * FROM t WHERE id IN (?, ...) AND name = ?"
+    )
+
+    db.query_stats.reset()
+    for user_id in (1, 2, 3):
+        await repos.user.upsert_user(user_id, "u", "User")
+    for user_id in (1, 2, 3, 4):
+        await repos.user.get_user(user_id)
+    lookups = [s for s in db.query_stats.top(50, key="calls") if s.sql.startswith("SELECT") and "FROM users" in s.sql]
+    assert lookups and lookups[0].calls >= 4 and lookups[0].rows >= 3
+
+    db.slow_query_ms = 0.000001
+    with caplog.at_level(logging.WARNING, logger="bot.storage.db"):
+        await db.fetchall("SELECT * FROM registrations WHERE event_id = ?", ("e1",))
+        await asyncio.gather(*db._explain_tasks)  # noqa: SLF001
+    stat = db.query_stats.entries["SELECT * FROM registrations WHERE event_id = ?"]
+    assert stat.slow_calls == 1 and "idx_registrations_event_status" in stat.plan
+    assert "Slow query" in caplog.text and "idx_registrations_event_status" in caplog.text
@@ -1,8 +1,17 @@
 from __future__ import annotations
 
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+from datetime import datetime
+
 import pytest
 
-from bot.models import Event
+from bot.models import Event, Registration
+from bot.services.migrations import MigrationService
 from bot.utils.errors import ValidationError
 
 
@@ -82,6 +91,69 @@ async def test_event_service_registration_flow_and_capacity(services):
     assert reg2.user_id == 2
 
 
+@pytest.mark.asyncio
+async def test_event_service_concurrent_registrations_respect_seats(services, db):
+    for uid in range(1, 41):
+        await services.profile.ensure_user(uid, f"u{uid}", f"User {uid}")
+    ev = await services.event.add_event("Event", "2099-01-01 10:00", "D", seats=3)
+
+    calls = [services.event.register_user(uid, ev.event_id) for uid in range(1, 21)]
+    calls += [services.event.confirm_or_register(uid, ev.event_id) for uid in range(11, 41)]
+    results = await asyncio.gather(*calls, return_exceptions=True)
+
+    assert all(isinstance(r, (Registration, ValidationError)) for r in results)
+    row = await db.fetchone(
+        "SELECT COUNT(*) AS n, COUNT(DISTINCT user_id) AS users FROM registrations WHERE event_id = ?",
+        (ev.event_id,),
+    )
+    assert row["n"] == row["users"] == 3
+
+
+@pytest.mark.asyncio
+async def test_event_service_reactivation_needs_a_free_seat(services):
+    for uid in (1, 2):
+        await services.profile.ensure_user(uid, f"u{uid}", f"User {uid}")
+    ev = await services.event.add_event("Event", "2099-01-01 10:00", "D", seats=1)
+
+    await services.event.register_user(1, ev.event_id)
+    await services.event.cancel_registration(1, ev.event_id)
+    await services.event.register_user(2, ev.event_id)
+
+    with pytest.raises(ValidationError, match="Свободных мест нет"):
+        await services.event.confirm_or_register(1, ev.event_id)
+    with pytest.raises(ValidationError, match="Свободных мест нет"):
+        await services.event.register_user(1, ev.event_id)
+    assert (await services.event.get_user_registration(1, ev.event_id)).status == "cancelled"
+
+    await services.event.cancel_registration(2, ev.event_id)
+    again = await services.event.confirm_or_register(1, ev.event_id)
+    assert again.status == "confirmed"
+
+
+@pytest.mark.asyncio
+async def test_event_service_event_card_shares_seat_count_between_users(services, db):
+    for uid in (1, 2, 3):
+        await services.profile.ensure_user(uid, f"u{uid}", f"User {uid}")
+    ev = await services.event.add_event("Event", "2099-01-01 10:00", "D", seats=3)
+    await services.event.register_user(1, ev.event_id)
+    await services.event.register_user(2, ev.event_id)
+    await services.event.cancel_registration(2, ev.event_id)
+
+    assert await services.event.get_event_card("missing", 1) is None
+    card = await services.event.get_event_card(ev.event_id, 1)
+    assert (card.event.name, card.taken, card.free, card.registration.status) == ("Event", 1, 2, "registered")
+
+    # Another user within the TTL: the shared part comes from the cache, only their registration is read.
+    await services.event.register_user(3, ev.event_id)
+    db.query_stats.reset()
+    card = await services.event.get_event_card(ev.event_id, 3)
+    assert card.registration.status == "registered" and card.taken == 1
+    assert sum(s.calls for s in db.query_stats.entries.values()) == 1
+
+    services.event.invalidate_cache()
+    assert (await services.event.get_event_card(ev.event_id, 2)).taken == 2
+
+
 @pytest.mark.asyncio
 async def test_event_service_list_user_registrations_only_active(services):
     await services.profile.ensure_user(1, "u", "User One")
@@ -120,3 +192,222 @@ async def test_node_service_ensure_defaults_creates_tree(services):
     main = await services.node.get_main_menu_nodes()
     assert any(n.is_main_menu for n in main)
 
+
+@pytest.mark.asyncio
+async def test_export_service_csv_gz_splits_into_parts(services):
+    ev = await services.event.add_event("Event", "2099-01-01 10:00", "D", seats=5000)
+    for uid in range(1, 2001):
+        await services.profile.user_repo.upsert_user(uid, f"u{uid}", f"User {uid}")
+        await services.event.reg_repo.create(Registration(id=None, user_id=uid, event_id=ev.event_id))
+
+    services.export.batch_size = 100
+    services.export.max_part_bytes = 4096
+    parts = await services.export.export_registrations("csv")
+    assert len(parts) > 1
+    assert all(p.filename.endswith(".csv.gz") and ".part" in p.filename for p in parts)
+
+    rows = []
+    for part in parts:
+        text = gzip.decompress(part.data.getvalue()).decode("utf-8")
+        reader = list(csv.DictReader(io.StringIO(text)))
+        assert reader and reader[0]["event_id"] == ev.event_id
+        rows.extend(reader)
+    assert len(rows) == 2000 == sum(p.rows for p in parts)
+    assert {int(r["user_id"]) for r in rows} == set(range(1, 2001))
+
+
+@pytest.mark.asyncio
+async def test_export_service_xlsx_splits_into_parts_under_the_size_limit(services):
+    import pandas as pd
+
+    for uid in range(1, 301):
+        await services.profile.user_repo.upsert_user(uid, f"u{uid}", f"User {uid}")
+
+    services.export.batch_size = 50
+    services.export.max_part_bytes = 12000
+    parts = await services.export.export_users("xlsx")
+    assert len(parts) > 1
+    assert [p.filename for p in parts] == [f"users.part{idx:03d}.xlsx" for idx in range(1, len(parts) + 1)]
+    assert all(p.size <= 12000 for p in parts)
+
+    frames = [pd.read_excel(part.data, sheet_name="users") for part in parts]
+    assert sum(len(df) for df in frames) == 300 == sum(p.rows for p in parts)
+    assert sorted(uid for df in frames for uid in df["user_id"]) == list(range(1, 301))
+
+
+@pytest.mark.asyncio
+async def test_export_service_jsonl_single_part_and_unknown_format(services):
+    await services.profile.ensure_user(1, "u", "User One")
+    await services.profile.set_consent(1, True)
+
+    parts = await services.export.export_users("jsonl")
+    assert [p.filename for p in parts] == ["users.jsonl"]
+    records = [json.loads(line) for line in parts[0].data.getvalue().decode("utf-8").splitlines()]
+    assert records[0]["user_id"] == 1
+    assert records[0]["consent"] is True
+
+    with pytest.raises(ValidationError):
+        await services.export.export_users("pdf")
+
+
+def _write_sheet(path, header, rows):
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    ws = wb.active
+    ws.append(header)
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+
+
+@pytest.mark.asyncio
+async def test_migration_bulk_import_is_idempotent_and_skips_orphans(repos, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open("bot_users.json", "w", encoding="utf-8") as f:
+        json.dump({str(uid): {"username": f"u{uid}", "name": f"User {uid}", "email": ""} for uid in range(1, 51)}, f)
+    _write_sheet(
+        "events.xlsx",
+        ["event_id", "name", "datetime_str", "desc", "max_seats"],
+        [["e1", "One", datetime(2099, 1, 1, 10, 0), "D", 100], [2, "Two", "2099-02-01 10:00", None, 10]],
+    )
+    _write_sheet(
+        "registrations.xlsx",
+        ["user_id", "event_id", "status", "reg_time"],
+        [[uid, "e1", "registered", None] for uid in range(1, 51)]
+        + [[1, "e1", "confirmed", None], [999, "e1", "registered", None], [2, 2, None, None]],
+    )
+
+    migrator = MigrationService(repos.user, repos.role, repos.event, repos.reg, repos.content, chunk_size=7)
+    await migrator.migrate_from_files()
+
+    assert (await repos.event.get("e1")).datetime_str == "2099-01-01 10:00"  # type: ignore[union-attr]
+    assert (await repos.event.get("2")).description == ""  # type: ignore[union-attr]
+    assert len(await repos.reg.list_by_event("e1")) == 50  # duplicate and orphan rows ignored
+    assert (await repos.reg.get(2, "2")).status == "registered"  # type: ignore[union-attr]
+    assert len(await repos.user.list_users()) == 50
+    assert os.path.exists(os.path.join("data", ".legacy_migration_done"))
+
+    os.remove(os.path.join("data", ".legacy_migration_done"))
+    await migrator.migrate_from_files()
+    assert len(await repos.reg.list_by_event("e1")) == 50
+
+
+@pytest.mark.asyncio
+async def test_ensure_admins_only_writes_missing_roles(services, repos):
+    from bot.constants import Role
+
+    await repos.user.upsert_user(7, "real", "Real Name")
+    assert sorted(await services.profile.ensure_admins([7, 8])) == [7, 8]
+    assert await repos.role.get_roles([7, 8, 9]) == {7: Role.ADMIN, 8: Role.ADMIN}
+    assert (await repos.user.get_user(7)).full_name == "Real Name"  # type: ignore[union-attr]
+
+    assert await services.profile.ensure_admins([7, 8]) == []
+
+
+@pytest.mark.asyncio
+async def test_warm_up_preloads_caches_and_writes_invalidate(bot_data, services, repos, seeded_nodes, seeded_event):
+    from bot.constants import Role
+    from bot.services.warmup import warm_up
+
+    await repos.user.upsert_user(5, "mod", "Moderator")
+    await repos.role.set_role(5, Role.MODERATOR)
+
+    steps = await warm_up(bot_data, timeout=5)
+    assert [s.name for s in steps] == ["node_tree", "events", "roles", "main_menu"]
+    assert all(s.ok for s in steps)
+    assert (await services.node.get_main_menu_node("ℹ️ Информация")).key == "info"  # type: ignore[union-attr]
+    assert await services.profile.get_role(5) == Role.MODERATOR
+    assert [e.event_id for e in await services.event.list_active_events()] == [seeded_event.event_id]
+
+    # Reads are served from memory until a write goes through the service.
+    await repos.role.set_role(5, Role.USER)
+    assert await services.profile.get_role(5) == Role.MODERATOR
+    await services.profile.assign_role(5, Role.USER)
+    assert await services.profile.get_role(5) == Role.USER
+
+    info = await services.node.get_node_by_key("info")
+    await services.node.save_node(title="New", content="C", parent_id=info.id, key="new")  # type: ignore[union-attr]
+    assert "new" in [n.key for n in await services.node.get_children(info.id)]  # type: ignore[union-attr]
+
+    await services.event.add_event("Second", "2099-02-01 10:00", "", 5)
+    assert len(await services.event.list_active_events()) == 2
+
+
+@pytest.mark.asyncio
+async def test_warm_up_reports_timeouts_without_raising(bot_data, monkeypatch):
+    import asyncio
+
+    from bot.services import warmup
+
+    async def slow(_bot_data):
+        await asyncio.sleep(10)
+        return "never"
+
+    monkeypatch.setitem(warmup.WARMUP_STEPS, "events", slow)
+    steps = await warmup.warm_up(bot_data, timeout=0.2)
+    failed = {s.name: s.detail for s in steps if not s.ok}
+    assert failed == {"events": "timed out"}
+
+
+@pytest.mark.asyncio
+async def test_restart_drains_heavy_jobs_and_refuses_new_ones():
+    import asyncio
+
+    from bot.services.restart import RestartService
+    from bot.utils.errors import RestartInProgress
+
+    service = RestartService(drain_timeout=5)
+    release = asyncio.Event()
+
+    async def broadcast():
+        async with service.heavy_job("рассылка всем"):
+            await release.wait()
+
+    job = asyncio.create_task(broadcast())
+    await asyncio.sleep(0)
+    assert service.active_jobs() == ["рассылка всем"]
+
+    drain = asyncio.create_task(service.drain(timeout=5))
+    await asyncio.sleep(0)
+    with pytest.raises(RestartInProgress):
+        async with service.heavy_job("экспорт пользователей"):
+            pass
+    assert not drain.done()
+
+    release.set()
+    await job
+    assert await drain == []
+    assert await RestartService().drain(timeout=0) == []
+
+
+@pytest.mark.asyncio
+async def test_soft_reload_swaps_config_handlers_and_keeps_conversations(bot_data, monkeypatch):
+    from dataclasses import replace
+
+    from telegram.ext import ApplicationBuilder, ConversationHandler
+
+    from bot.constants import Conversation
+    from bot.handlers import register_handlers
+    from bot.services import restart
+
+    app = ApplicationBuilder().token("123:TEST").build()
+    app.bot_data.update(bot_data)
+    register_handlers(app)
+    old_handlers = app.handlers
+    admin_conv = next(h for h in app.handlers[0] if isinstance(h, ConversationHandler) and h.name == "admin")
+    admin_conv._conversations[(42, 42)] = Conversation.WAITING_BROADCAST_MESSAGE  # noqa: SLF001
+
+    new_config = replace(bot_data["config"], admin_password="rotated", bot_token="OTHER", export_max_part_bytes=1024)
+    monkeypatch.setattr(restart, "load_config", lambda reload_env=False: new_config)
+    report = await bot_data["restart_service"].soft_reload(app)
+
+    config = app.bot_data["config"]
+    assert config.admin_password == "rotated" and config.bot_token == "TEST_TOKEN"
+    assert bot_data["export_service"].max_part_bytes == 1024
+    assert any("нужен перезапуск для: bot_token" in line for line in report)
+    assert app.handlers is not old_handlers
+    assert sum(map(len, app.handlers.values())) == sum(map(len, old_handlers.values()))
+    new_conv = next(h for h in app.handlers[0] if isinstance(h, ConversationHandler) and h.name == "admin")
+    assert new_conv is not admin_conv
+    assert new_conv._conversations[(42, 42)] == Conversation.WAITING_BROADCAST_MESSAGE  # noqa: SLF001
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import queue
+from types import SimpleNamespace
+
+import pytest
+from telegram import Update
+from telegram.error import Conflict
+
+from bot.sharding import HashRing, shard_key
+from bot.utils.cache import TTLCache, use_shared_generation
+from bot.workers import ShardRouter, UpdatePoller
+
+
+def _message(user_id: int, update_id: int = 1) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1700000000,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "U"},
+            "text": "hi",
+        },
+    }
+
+
+def test_hash_ring_is_stable_and_remaps_only_a_share_of_keys():
+    ring = HashRing(range(4))
+    before = {key: ring.node_for(key) for key in range(2000)}
+    assert before == {key: HashRing(range(4)).node_for(key) for key in range(2000)}
+    assert set(before.values()) == {0, 1, 2, 3}
+
+    ring.add(4)
+    moved = [key for key in before if ring.node_for(key) != before[key]]
+    assert all(ring.node_for(key) == 4 for key in moved)
+    assert 0.1 < len(moved) / len(before) < 0.3
+
+    with pytest.raises(LookupError):
+        HashRing([]).node_for(1)
+
+
+def test_shard_key_uses_sender_then_chat():
+    assert shard_key(_message(42)) == 42
+    callback = {
+        "update_id": 2,
+        "callback_query": {"id": "1", "from": {"id": 7, "is_bot": False, "first_name": "U"}, "data": "x"},
+    }
+    assert shard_key(callback) == 7
+    channel = {"update_id": 3, "channel_post": {"message_id": 1, "date": 0, "chat": {"id": -100, "type": "channel"}}}
+    assert shard_key(channel) == -100
+    assert shard_key({"update_id": 4, "poll": {"id": "p"}}) is None
+
+
+def test_router_keeps_users_sticky_and_reports_full_queues():
+    queues = [queue.Queue(maxsize=1), queue.Queue(maxsize=1)]
+    router = ShardRouter(queues)
+    target = router.route(_message(42))
+    assert router.route(_message(42, update_id=2)) == target
+
+    router.put_nowait(_message(42))
+    with pytest.raises(queue.Full):
+        router.put_nowait(_message(42, update_id=2))
+    assert router.routed[target] == 1
+    assert queues[target].get_nowait()["message"]["from"]["id"] == 42
+
+
+@pytest.mark.asyncio
+async def test_router_gives_up_on_a_dead_worker_with_a_full_queue(monkeypatch):
+    monkeypatch.setattr("bot.workers.PUT_ATTEMPT_SECONDS", 0.01)
+    worker = SimpleNamespace(exitcode=None)
+    router = ShardRouter([queue.Queue(maxsize=1)], [worker])
+    assert await router.put(_message(42))
+    blocked = asyncio.create_task(router.put(_message(42, update_id=2)))
+    await asyncio.sleep(0.05)
+    assert not blocked.done()
+    worker.exitcode = -15
+    assert await asyncio.wait_for(blocked, 1) is False
+    assert router.routed == [1]
+
+
+class _FlakyBot:
+    """getUpdates answers 409 Conflict once, then one batch, then stops the poller."""
+
+    def __init__(self, stop: asyncio.Event):
+        self.stop = stop
+        self.calls = []
+
+    async def delete_webhook(self):
+        return True
+
+    async def get_updates(self, offset=None, timeout=None, allowed_updates=None):
+        self.calls.append((offset, timeout))
+        if len(self.calls) == 1:
+            raise Conflict("terminated by other getUpdates request")
+        if len(self.calls) == 2:
+            return [Update.de_json(_message(7, update_id=10), None), Update.de_json(_message(8, update_id=11), None)]
+        self.stop.set()
+        return []
+
+
+@pytest.mark.asyncio
+async def test_poller_survives_telegram_errors_and_confirms_offset_on_stop(monkeypatch):
+    monkeypatch.setattr("bot.workers.POLL_BACKOFF_MAX", 0.01)
+    stop = asyncio.Event()
+    bot = _FlakyBot(stop)
+    queues = [queue.Queue(), queue.Queue()]
+    poller = UpdatePoller(SimpleNamespace(bot=bot), ShardRouter(queues), stop)
+    await asyncio.wait_for(poller.run(), 2)
+    assert poller.offset == 12
+    assert sum(q.qsize() for q in queues) == 2
+
+    await poller.confirm()
+    assert bot.calls[-1] == (12, 0)
+
+
+def test_shared_generation_invalidates_other_caches():
+    use_shared_generation(multiprocessing.get_context("spawn").Value("q", 0))
+    try:
+        mine, other = TTLCache(ttl=60), TTLCache(ttl=60)
+        other.set("menu", [1, 2])
+        mine.invalidate("unrelated")
+        assert other.get("menu") is None
+    finally:
+        use_shared_generation(None)
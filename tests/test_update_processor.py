@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import asyncio
+from typing import List, Tuple
+
+import pytest
+from telegram import Update
+
+from bot.update_processor import KeyedUpdateProcessor, update_key
+
+
+def _update(update_id: int, user_id: int) -> Update:
+    return Update.de_json(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 1700000000,
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": user_id, "is_bot": False, "first_name": "U"},
+                "text": "hi",
+            },
+        },
+        None,
+    )
+
+
+async def _feed(processor: KeyedUpdateProcessor, items: List[Tuple[int, int, float]], log: list) -> None:
+    # Same shape as Application: one task per update, created in arrival order.
+    async def handle(update_id: int, user_id: int, seconds: float) -> None:
+        log.append(("start", user_id, update_id))
+        await asyncio.sleep(seconds)
+        log.append(("end", user_id, update_id))
+
+    tasks = [
+        asyncio.create_task(processor.process_update(_update(uid, user), handle(uid, user, seconds)))
+        for uid, user, seconds in items
+    ]
+    await asyncio.gather(*tasks)
+
+
+@pytest.mark.asyncio
+async def test_same_user_is_serial_other_users_run_alongside():
+    processor = KeyedUpdateProcessor(8)
+    log: list = []
+    await _feed(processor, [(1, 10, 0.05), (2, 10, 0.01), (3, 20, 0.01), (4, 10, 0.0)], log)
+
+    user_10 = [entry for entry in log if entry[1] == 10]
+    assert user_10 == [
+        ("start", 10, 1),
+        ("end", 10, 1),
+        ("start", 10, 2),
+        ("end", 10, 2),
+        ("start", 10, 4),
+        ("end", 10, 4),
+    ]
+    # The other user did not wait for the slow update.
+    assert log.index(("end", 20, 3)) < log.index(("end", 10, 1))
+    assert processor.pending == 0 and processor.stats()["users"] == 0
+
+
+@pytest.mark.asyncio
+async def test_global_cap_and_no_starvation_by_one_busy_user():
+    processor = KeyedUpdateProcessor(2)
+    log: list = []
+    burst = [(i, 10, 0.02) for i in range(1, 11)]
+    await _feed(processor, burst + [(11, 20, 0.0), (12, 30, 0.0), (13, 40, 0.0)], log)
+
+    assert processor.peak_active == 2
+    assert processor.processed == 13
+    # Queued updates of user 10 wait on their own lock, not on global slots.
+    assert log.index(("end", 40, 13)) < log.index(("end", 10, 3))
+
+
+def test_update_key_falls_back_to_chat():
+    assert update_key(_update(1, 42)) == 42
+    channel = Update.de_json(
+        {"update_id": 2, "channel_post": {"message_id": 1, "date": 0, "chat": {"id": -100, "type": "channel"}}},
+        None,
+    )
+    assert update_key(channel) == ("chat", -100)
+    assert update_key(object()) is None
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from telegram import Bot, Update
+
+from bot.webhook import SECRET_HEADER, WebhookServer
+
+RECORDED_UPDATE = {
+    "update_id": 1001,
+    "message": {
+        "message_id": 7,
+        "date": 1700000000,
+        "chat": {"id": 42, "type": "private"},
+        "from": {"id": 42, "is_bot": False, "first_name": "Test"},
+        "text": "/start",
+    },
+}
+
+
+@pytest.fixture
+async def webhook():
+    app = SimpleNamespace(update_queue=asyncio.Queue(), bot=Bot("123:TEST"))
+    server = WebhookServer(app, secret_token="s3cret", port=0, max_queue=2)  # type: ignore[arg-type]
+    await server.start()
+    try:
+        yield server
+    finally:
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_webhook_enqueues_verified_updates_and_pushes_back(webhook):
+    url = f"http://127.0.0.1:{webhook.port}/telegram"
+    async with httpx.AsyncClient() as client:
+        assert (await client.post(url, json=RECORDED_UPDATE)).status_code == 403
+        assert (await client.post(url, json=RECORDED_UPDATE, headers={SECRET_HEADER: "wrong"})).status_code == 403
+        ok = {SECRET_HEADER: "s3cret"}
+        assert (await client.post(url, content=b"{not json", headers=ok)).status_code == 400
+        assert (await client.get(url)).status_code == 405
+        assert (await client.post(url + "/other", json=RECORDED_UPDATE, headers=ok)).status_code == 404
+
+        # Same keep-alive connection for the happy path.
+        assert (await client.post(url, json=RECORDED_UPDATE, headers=ok)).status_code == 200
+        assert (await client.post(url, json=RECORDED_UPDATE, headers=ok)).status_code == 200
+        full = await client.post(url, json=RECORDED_UPDATE, headers=ok)
+        assert full.status_code == 503
+        assert full.headers["retry-after"] == "1"
+
+    update = webhook.app.update_queue.get_nowait()
+    assert isinstance(update, Update)
+    assert update.update_id == 1001 and update.message.text == "/start"
+    assert (webhook.accepted, webhook.rejected) == (2, 1)